@@ -8,6 +8,7 @@ load_dotenv()
 
 # Database
 DB_URL = os.getenv('DATABASE_URL', 'sqlite:///district_fetch.db')
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))  # Wait this long for a write lock
 
 # LLM Provider Selection
 LLM_PROVIDER = os.getenv('LLM_PROVIDER', 'groq')  # 'groq' or 'ollama'
@@ -18,12 +19,24 @@ GROQ_API_KEY = os.getenv('GROQ_API_KEY')
 #     raise ValueError("GROQ_API_KEY environment variable must be set")
 GROQ_MODEL = os.getenv('GROQ_MODEL', 'llama-3.3-70b-versatile')
 GROQ_TEMPERATURE = float(os.getenv('GROQ_TEMPERATURE', '0.3'))
+GROQ_RPM = int(os.getenv('GROQ_RPM', '30'))  # Requests/minute allowed by your Groq tier
+GROQ_TPM = int(os.getenv('GROQ_TPM', '12000'))  # Tokens/minute allowed by your Groq tier
 
 # Ollama API
 OLLAMA_URL = os.getenv('OLLAMA_URL', 'http://privatechat.setseg.org:11434/api/generate')
 OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'gpt-oss:120b')
 OLLAMA_TEMPERATURE = float(os.getenv('OLLAMA_TEMPERATURE', '0.3'))
 
+# LLM output token budgets per template (decode time is linear in output tokens)
+LLM_MAX_TOKENS = {
+    'superintendent_extraction': 256,
+    'link_identification': 256,
+    'url_filtering': 1024,
+    'health_plan_extraction': 4096,
+}
+LLM_DEFAULT_MAX_TOKENS = 1024
+LLM_BATCH_CONCURRENCY = int(os.getenv('LLM_BATCH_CONCURRENCY', '8'))  # In-flight calls per batch (RPM/TPM caps still apply)
+
 # SSH Tunnel for Remote LLM (optional - for accessing remote servers)
 SSH_TUNNEL_ENABLED = os.getenv('SSH_TUNNEL_ENABLED', 'false').lower() == 'true'
 SSH_HOST = os.getenv('SSH_HOST', 'jrasche-ai')
@@ -32,8 +45,29 @@ SSH_LOCAL_PORT = int(os.getenv('SSH_LOCAL_PORT', '8000'))
 SSH_USERNAME = os.getenv('SSH_USERNAME')  # Optional if using SSH config
 SSH_KEY_PATH = os.getenv('SSH_KEY_PATH')  # Optional if using SSH config
 
+# LLM Response Cache (skip repeat extractions of identical prompts)
+CACHE_LLM = os.getenv('CACHE_LLM', 'false').lower() in ('1', 'true')
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', '.llm_cache/responses.db')
+# Transparency link picks are deterministic per (district, link list), so they're cached by default
+CACHE_LINK_IDENTIFICATION = os.getenv('CACHE_LINK_IDENTIFICATION', 'true').lower() in ('1', 'true')
+# ...and reused across homepages from the same site template (anchor texts within N SimHash bits)
+LINK_TEMPLATE_CACHE_PATH = os.getenv('LINK_TEMPLATE_CACHE_PATH', '.llm_cache/link_templates.db')
+LINK_TEMPLATE_MAX_DISTANCE = int(os.getenv('LINK_TEMPLATE_MAX_DISTANCE', '3'))
+
+# Playwright script cache (reused across renders and runs; images/fonts/styles are blocked)
+CACHE_BROWSER_ASSETS = os.getenv('CACHE_BROWSER_ASSETS', 'true').lower() in ('1', 'true')
+BROWSER_CACHE_PATH = os.getenv('BROWSER_CACHE_PATH', '.browser_cache/assets.db')
+BROWSER_CACHE_DEFAULT_TTL = 86400  # seconds, when the response sets no max-age
+
+# Debug Logging (set DEBUG_RAW_HTML=0 to log only a hash + length of raw pages)
+DEBUG_RAW_HTML = os.getenv('DEBUG_RAW_HTML', 'true').lower() in ('1', 'true')
+# Raw HTML dumps are zstd-compressed (*_raw.html.zst) when zstandard is installed; 0 writes plain HTML
+DEBUG_COMPRESS_RAW = os.getenv('DEBUG_COMPRESS_RAW', 'true').lower() in ('1', 'true')
+
 # HTTP Settings
 REQUEST_TIMEOUT = 10  # seconds
+MAX_PARALLEL_FETCHES = 16  # Concurrent HTTP fetches in fetch_pages batches
+MAX_PDF_BYTES = 50 * 1024 * 1024  # Larger PDF downloads are aborted with an error result
 USER_AGENT = 'Mozilla/5.0 (compatible; /1.0)'
 
 # Suppress SSL warnings when we intentionally bypass verification
@@ -41,9 +75,15 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 # HTML Parsing
 MAX_TEXT_LENGTH = 15000  # Increased to capture more content for complex pages
+STREAM_LINK_LIMIT = 500  # Anchors collected before a streamed homepage download stops
+SUPERINTENDENT_WINDOW_CHARS = 2000  # Context sent to LLM on each side of first "superintendent" mention
+HEALTH_PLAN_WINDOW_CHARS = 200  # Context kept on each side of every carrier/plan-type mention
+HEALTH_PLAN_MAX_CHARS = 8000  # Cap on filtered health plan text sent to LLM
 
 # Discovery
 MAX_URLS_TO_FILTER = 10  # Top N URLs after LLM filtering
+MAX_PARALLEL_PAGES = 4  # Concurrent browser pages during batch transparency discovery
+HEALTH_PLAN_PIPELINE_WORKERS = int(os.getenv('HEALTH_PLAN_PIPELINE_WORKERS', '4'))  # Districts fetched/extracted concurrently in bulk checks
 
 # Project Structure
 BASE_DIR = Path(__file__).parent
\ No newline at end of file
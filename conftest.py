@@ -0,0 +1,43 @@
+"""
+Shared pytest setup.
+
+The live connection scripts (test_ssh_tunnel.py, test_llm_providers.py) need an
+LLM client, whose creation opens the SSH tunnel and makes Ollama load the model.
+When they are part of the run, start that in the background at configure time
+so it overlaps test collection instead of stalling the first test.
+"""
+import threading
+from pathlib import Path
+
+import pytest
+
+_LIVE_SCRIPTS = {'test_ssh_tunnel.py', 'test_llm_providers.py'}
+_CLIENT = []
+_prefetch = None
+
+
+def _collects_live_scripts(args) -> bool:
+    """True if any pytest arg is (or contains) one of the live scripts"""
+    paths = [Path(arg.split('::')[0]).resolve() for arg in args] or [Path.cwd()]
+    root = Path(__file__).parent.resolve()
+    return any(path.name in _LIVE_SCRIPTS or (path.is_dir() and path == root) for path in paths)
+
+
+def pytest_configure(config):
+    global _prefetch
+    if not _collects_live_scripts(config.args):
+        return
+    from utils.llm_client import get_client
+    _prefetch = threading.Thread(target=lambda: _CLIENT.append(get_client()), daemon=True)
+    _prefetch.start()
+
+
+@pytest.fixture(scope='session')
+def client():
+    """The LLM client, prefetched during collection when possible"""
+    if _prefetch is not None:
+        _prefetch.join()
+    if not _CLIENT:  # Not prefetched, or the prefetch raised: create it here so the error surfaces
+        from utils.llm_client import get_client
+        _CLIENT.append(get_client())
+    return _CLIENT[0]
@@ -2,12 +2,12 @@ from datetime import datetime
 from typing import Optional, List
 
 from sqlalchemy import (
-    create_engine, String, Integer, DateTime, Boolean, Text, ForeignKey,
+    create_engine, event, String, Integer, DateTime, Boolean, Text, ForeignKey,
     Index, UniqueConstraint
 )
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship, sessionmaker
 
-from config import DB_URL
+from config import DB_URL, SQLITE_BUSY_TIMEOUT_MS
 
 
 class Base(DeclarativeBase):
@@ -185,11 +185,28 @@ class HealthPlan(Base):
         return f"<HealthPlan(id={self.id}, plan_name='{self.plan_name}', provider='{self.provider}')>"
 
 
-# Database engine and session factory
-engine = create_engine(DB_URL, echo=False)
+# Database engine and session factory (one pooled engine shared by every session)
+engine = create_engine(DB_URL, echo=False, pool_pre_ping=True)
 SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
 
 
+def _sqlite_pragmas(dbapi_connection, _):
+    """
+    WAL lets readers run alongside the single writer, and with synchronous=NORMAL
+    a commit appends to the log without an fsync each time; busy_timeout waits
+    out a held write lock instead of failing with 'database is locked'.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+if engine.dialect.name == 'sqlite':
+    event.listen(engine, 'connect', _sqlite_pragmas)
+
+
 def init_db():
     """Create all tables"""
     Base.metadata.create_all(engine)
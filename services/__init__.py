@@ -1,13 +1,19 @@
 from .extraction import (
     extract_superintendent,
+    extract_superintendent_batch,
+    iter_superintendent_batch,
     filter_urls,
+    filter_urls_batch,
     identify_transparency_link,
     extract_health_plans
 )
 
 __all__ = [
     'extract_superintendent',
+    'extract_superintendent_batch',
+    'iter_superintendent_batch',
     'filter_urls',
+    'filter_urls_batch',
     'identify_transparency_link',
     'extract_health_plans'
 ]
@@ -21,6 +21,23 @@ extract_superintendent = lambda text, district_name: get_client().call(
     district_name=district_name
 )
 
+# Superintendent extraction for many (text, district_name) pairs at once;
+# results in input order, a failed item is its exception
+extract_superintendent_batch = lambda items: get_client().call_many(
+    'superintendent_extraction',
+    SuperintendentExtraction,
+    [{'text': text, 'district_name': district_name} for text, district_name in items],
+    costs=[len(text) for text, _ in items]  # Prompt length predicts call time
+)
+
+# Same batch, each result yielded (in input order) as soon as it is ready
+iter_superintendent_batch = lambda items: get_client().iter_many(
+    'superintendent_extraction',
+    SuperintendentExtraction,
+    [{'text': text, 'district_name': district_name} for text, district_name in items],
+    costs=[len(text) for text, _ in items]
+)
+
 # URL filtering
 filter_urls = lambda urls, district_name: get_client().call(
     'url_filtering',
@@ -29,6 +46,12 @@ filter_urls = lambda urls, district_name: get_client().call(
     district_name=district_name
 )
 
+filter_urls_batch = lambda items: get_client().call_many(
+    'url_filtering',
+    URLFilterResult,
+    [{'urls': urls, 'district_name': district_name} for urls, district_name in items]
+)
+
 # Transparency link identification
 identify_transparency_link = lambda links, district_name=None: get_client().call(
     'link_identification',
@@ -1,10 +1,12 @@
-import requests
+import httpx
 from urllib.parse import urljoin, urlparse
 from bs4 import BeautifulSoup
+from selectolax.lexbor import LexborHTMLParser
 from typing import List
 
-from config import REQUEST_TIMEOUT, USER_AGENT, MAX_URLS_TO_FILTER
+from config import MAX_URLS_TO_FILTER
 from services.extraction import filter_urls as llm_filter_urls
+from tasks.fetcher import http_client
 
 
 def discover_urls(domain: str) -> List[str]:
@@ -22,7 +24,7 @@ def discover_urls(domain: str) -> List[str]:
         domain = f'https://{domain}'
     
     urls = set()
-    headers = {'User-Agent': USER_AGENT}
+    client = http_client(verify=False)  # Pooled HTTP/2 client (User-Agent and timeout set on it)
     base_netloc = urlparse(domain).netloc
     
     print(f"\n[DISCOVERY] Starting URL discovery for {domain}")
@@ -33,7 +35,7 @@ def discover_urls(domain: str) -> List[str]:
     print(f"[DISCOVERY] Trying sitemap: {sitemap_url}")
     
     try:
-        response = requests.get(sitemap_url, headers=headers, timeout=REQUEST_TIMEOUT, verify=False)
+        response = client.get(sitemap_url)
         print(f"[DISCOVERY] Sitemap status: {response.status_code}")
         
         if response.status_code == 200:
@@ -60,18 +62,16 @@ def discover_urls(domain: str) -> List[str]:
     # Fall back to homepage scraping
     print(f"[DISCOVERY] Scraping homepage: {domain}")
     try:
-        response = requests.get(domain, headers=headers, timeout=REQUEST_TIMEOUT, verify=False)
+        response = client.get(domain)
         response.raise_for_status()
         print(f"[DISCOVERY] Homepage status: {response.status_code}")
         
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Extract all links
-        all_links = soup.find_all('a', href=True)
+        # Extract all links (lexbor, like page text parsing; sitemaps above are lxml XML)
+        all_links = LexborHTMLParser(response.text).css('a[href]')
         print(f"[DISCOVERY] Found {len(all_links)} <a> tags on homepage")
         
         for link in all_links:
-            href = link['href']
+            href = link.attributes['href'] or ''
             
             # Convert to absolute URL
             absolute_url = urljoin(domain, href)
@@ -96,7 +96,7 @@ def discover_urls(domain: str) -> List[str]:
             for path in common_paths:
                 test_url = urljoin(domain, path)
                 try:
-                    r = requests.head(test_url, headers=headers, timeout=5, verify=False)
+                    r = client.head(test_url, timeout=5, follow_redirects=False)
                     if r.status_code == 200:
                         print(f"[DISCOVERY] Common path exists: {test_url}")
                         urls.add(test_url)
@@ -108,7 +108,7 @@ def discover_urls(domain: str) -> List[str]:
         
         return list(urls)
         
-    except requests.RequestException as e:
+    except (httpx.HTTPError, httpx.InvalidURL) as e:
         raise ConnectionError(f"Failed to reach {domain}: {str(e)}")
 
 _normalize_domain = lambda domain: domain.lower().removeprefix('www.')
@@ -1,12 +1,20 @@
-from typing import Optional
+import re
+from typing import Iterator, List, Optional, Tuple
 from dataclasses import dataclass
+from config import SUPERINTENDENT_WINDOW_CHARS
 from utils.html_parser import parse_html_to_text
 from services.extraction import extract_superintendent as llm_extract
+from services.extraction import iter_superintendent_batch as llm_iter_batch
 from utils.debug_logger import get_logger
 from repositories.extraction import ExtractionRepository
 from models.enums import ExtractionType
 from models.database import SuperintendentContact
 
+_SUPERINTENDENT_RE = re.compile(r'superintendent', re.IGNORECASE)
+
+_superintendent_window = lambda text, match: text[max(0, match.start() - SUPERINTENDENT_WINDOW_CHARS):
+                                                  match.end() + SUPERINTENDENT_WINDOW_CHARS]
+
 @dataclass
 class ExtractionContext:
     """Context for superintendent extraction"""
@@ -40,33 +48,76 @@ def extract_superintendent(
     Returns:
         SuperintendentContact object (or None if extraction completely failed)
     """
-    logger = get_logger()
+    context = ExtractionContext(html, district_name, url, district_id, repo, fetched_page)
+    cleaned_text, window, reasoning = _prepare_text(html)
+    if reasoning:
+        return _save_empty(context, cleaned_text, reasoning)
+
+    # Call LLM extraction service on the window around the first mention
+    try:
+        result = llm_extract(window, district_name)
+    except Exception as e:
+        result = e
+    return _finish_extraction(context, cleaned_text, result)
+
+
+def iter_superintendents(contexts: List[ExtractionContext]) -> Iterator[Optional[SuperintendentContact]]:
+    """
+    Batch extract_superintendent over many fetched pages, yielding as pages finish.
+
+    Pages are parsed and pre-validated first and the LLM calls for all pages
+    that pass start concurrently; each page is then saved and yielded in
+    input order as soon as its result is in (saves stay on the caller's
+    thread, the repo session is not thread-safe).
+
+    Yields:
+        SuperintendentContact per context, in input order
+    """
+    prepared = [_prepare_text(context.html) for context in contexts]
+    llm_results = llm_iter_batch([(window, context.district_name)
+                                  for context, (_, window, _) in zip(contexts, prepared) if window])
+
+    for context, (cleaned_text, _, reasoning) in zip(contexts, prepared):
+        yield (_save_empty(context, cleaned_text, reasoning) if reasoning
+               else _finish_extraction(context, cleaned_text, next(llm_results)))
+
 
+def _prepare_text(html: str) -> Tuple[str, Optional[str], Optional[str]]:
+    """Parse HTML and pre-validate: (cleaned_text, LLM window, reason it is empty); exactly one of the last two is set"""
     # Parse HTML to clean text
     cleaned_text = parse_html_to_text(html)
 
     # Quick validation: empty content
     if len(cleaned_text.strip()) < 50:
-        reasoning = 'Page content too short (less than 50 characters)'
-        _save_empty_extraction(fetched_page.id, repo, cleaned_text, reasoning, logger, district_name, url, html)
-        return _save_empty_contact(district_id, repo, reasoning)
+        return cleaned_text, None, 'Page content too short (less than 50 characters)'
+
+    # Quick validation: no superintendent mentioned (title must contain it)
+    match = _SUPERINTENDENT_RE.search(cleaned_text)
+    if not match:
+        return cleaned_text, None, "Page content does not mention 'Superintendent'"
+
+    # Only the window around the first mention goes to the LLM
+    # (full cleaned_text is still saved with the extraction for auditing)
+    return cleaned_text, _superintendent_window(cleaned_text, match), None
 
-    # Call LLM extraction service
-    try:
-        result = llm_extract(cleaned_text, district_name)
 
+def _finish_extraction(context: ExtractionContext, cleaned_text: str, result) -> SuperintendentContact:
+    """Validate and save one LLM result (or the exception the call raised)"""
+    logger = get_logger()
+    if isinstance(result, Exception):
+        return _save_empty(context, cleaned_text, f'LLM extraction failed: {str(result)}')
+
+    try:
         # Post-validation: title must contain "superintendent"
         if not result.is_empty and result.title:
             title_lower = result.title.lower()
             if 'superintendent' not in title_lower:
-                reasoning = f"Title '{result.title}' does not contain 'Superintendent'"
-                _save_empty_extraction(fetched_page.id, repo, cleaned_text, reasoning, logger, district_name, url, html)
-                return _save_empty_contact(district_id, repo, reasoning)
+                return _save_empty(context, cleaned_text, f"Title '{result.title}' does not contain 'Superintendent'")
 
         # Track extraction (HTML→Text→LLM pipeline)
-        extraction_repo = ExtractionRepository(repo.session)
+        extraction_repo = ExtractionRepository(context.repo.session)
         extraction = extraction_repo.create_extraction(
-            fetched_page_id=fetched_page.id,
+            fetched_page_id=context.fetched_page.id,
             extraction_type=ExtractionType.SUPERINTENDENT.value,
             parsed_text=cleaned_text,
             parsing_method='html_parser',
@@ -77,23 +128,28 @@ def extract_superintendent(
         extraction_repo.save_extraction(extraction)
 
         # Save domain-specific contact
-        contact = repo.save_contact(repo.create_contact(
-            district_id,
+        contact = context.repo.save_contact(context.repo.create_contact(
+            context.district_id,
             {'name': result.name, 'title': result.title, 'email': result.email, 'phone': result.phone},
             extraction.id
         ))
 
         # Log for debugging
-        logger.log_page_fetch(district_name, url, html, cleaned_text,
+        logger.log_page_fetch(context.district_name, context.url, context.html, cleaned_text,
                              {'name': result.name, 'title': result.title, 'email': result.email,
                               'phone': result.phone, 'llm_reasoning': result.reasoning, 'is_empty': result.is_empty})
 
         return contact
 
     except Exception as e:
-        reasoning = f'LLM extraction failed: {str(e)}'
-        _save_empty_extraction(fetched_page.id, repo, cleaned_text, reasoning, logger, district_name, url, html)
-        return _save_empty_contact(district_id, repo, reasoning)
+        return _save_empty(context, cleaned_text, f'LLM extraction failed: {str(e)}')
+
+
+def _save_empty(context: ExtractionContext, text: str, reason: str) -> SuperintendentContact:
+    """Save empty extraction tracking and an empty contact for one page"""
+    _save_empty_extraction(context.fetched_page.id, context.repo, text, reason, get_logger(),
+                           context.district_name, context.url, context.html)
+    return _save_empty_contact(context.district_id, context.repo, reason)
 
 
 def _save_empty_extraction(fetched_page_id: int, repo, text: str, reason: str, logger, district_name: str, url: str, html: str):
@@ -121,4 +177,4 @@ def _save_empty_contact(district_id: int, repo, reason: str) -> SuperintendentCo
     contact_data = {'name': None, 'title': None, 'email': None, 'phone': None}
     contact = repo.create_contact(district_id, contact_data, extraction_id=None)
     repo.save_contact(contact)
-    return contact
\ No newline at end of file
+    return contact
@@ -1,9 +1,53 @@
-import requests
-from typing import Dict
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeout
+import re
+import ssl
+import atexit
+import httpx
+import asyncio
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional
+from concurrent.futures import Future
+from cachetools import TTLCache
+from playwright.sync_api import TimeoutError as PlaywrightTimeout
 from models.enums import FetchStatus, ContentType, FileExtension
-from config import REQUEST_TIMEOUT, USER_AGENT
+from config import (
+    REQUEST_TIMEOUT, USER_AGENT, STREAM_LINK_LIMIT, MAX_PARALLEL_FETCHES, MAX_PDF_BYTES
+)
+from utils.html_parser import stream_html_links
+from utils.browser import render_page, arender_page, abrowser_session
 
+# Optional: browser-impersonating HTTP client (gets past TLS-fingerprint
+# bot checks without spinning up a browser)
+try:
+    from curl_cffi import requests as curl_requests
+    from curl_cffi.requests.exceptions import SSLError as CurlSSLError
+except ImportError:
+    curl_requests = CurlSSLError = None
+
+
+# Shared pooled HTTP/2 clients: concurrent and repeat hits to the same district
+# host multiplex over one TLS connection (second client for the no-verify retry)
+_client_options = lambda verify, transport_cls: dict(
+    http2=True, follow_redirects=True, timeout=REQUEST_TIMEOUT, headers={'User-Agent': USER_AGENT},
+    transport=transport_cls(http2=True, verify=verify, retries=2,
+                            limits=httpx.Limits(max_connections=100, max_keepalive_connections=32))
+)
+_make_client = lambda verify: httpx.Client(**_client_options(verify, httpx.HTTPTransport))
+_make_async_client = lambda verify: httpx.AsyncClient(**_client_options(verify, httpx.AsyncHTTPTransport))
+_CLIENT, _CLIENT_NOVERIFY = _make_client(True), _make_client(False)
+atexit.register(_CLIENT.close)
+atexit.register(_CLIENT_NOVERIFY.close)
+http_client = lambda verify=True: _CLIENT if verify else _CLIENT_NOVERIFY  # For other tasks' one-off requests
+
+def _is_ssl_error(error: BaseException) -> bool:
+    """True if an ssl.SSLError is anywhere in the exception's cause/context chain"""
+    # httpx.ConnectError wraps httpcore.ConnectError, which wraps the SSLError
+    seen = set()
+    while error is not None and id(error) not in seen:
+        if isinstance(error, ssl.SSLError) or 'CERTIFICATE_VERIFY_FAILED' in str(error): return True
+        seen.add(id(error))
+        error = error.__cause__ or error.__context__
+    return False
 
 # Helper functions for DRY
 _success_result = lambda url, content, content_type: {
@@ -16,51 +60,122 @@ _error_result = lambda url, content_type, status, message: {
     'status': status.value, 'error_message': message
 }
 
-_is_pdf_url = lambda url: url.lower().endswith(FileExtension.PDF.value)
-_is_pdf_content = lambda content_type, url: 'application/pdf' in content_type.lower() or _is_pdf_url(url)
+# Only the 4-char tail is case-folded, not the whole URL; servers send a handful of
+# distinct Content-Type strings, so their check is memoized
+_PDF_EXT = FileExtension.PDF.value
+_is_pdf_url = lambda url: url[-len(_PDF_EXT):].lower() == _PDF_EXT
+_is_pdf_content_type = lru_cache(maxsize=64)(lambda content_type: 'application/pdf' in content_type.lower())
+_is_pdf_content = lambda content_type, is_pdf_url: is_pdf_url or _is_pdf_content_type(content_type)
 _has_valid_content = lambda text: text and len(text.strip()) > 100
 
-def _process_response(response, url, is_pdf):
-    """Process HTTP response and return result dict"""
-    content_type = response.headers.get('Content-Type', '').lower()
-    is_pdf_response = _is_pdf_content(content_type, url)
+# JS-rendered shell detection: scripts present but almost no visible body text
+_SCRIPT_RE = re.compile(r'<script\b', re.IGNORECASE)
+_BODY_RE = re.compile(r'<body\b[^>]*>(.*)</body>', re.IGNORECASE | re.DOTALL)
+_MARKUP_RE = re.compile(r'<(script|style|noscript)\b.*?</\1>|<[^>]+>', re.IGNORECASE | re.DOTALL)
+_visible_text = lambda html: _MARKUP_RE.sub('', (lambda body: body.group(1) if body else html)(_BODY_RE.search(html)))
+_needs_browser = lambda html: not _has_valid_content(html) or (
+    bool(_SCRIPT_RE.search(html)) and not _has_valid_content(_visible_text(html))
+)
+
+# Request coalescing: concurrent callers for the same URL share one fetch,
+# and successful results are reused for an hour within a run
+_FETCH_CACHE = TTLCache(maxsize=2048, ttl=3600)
+_INFLIGHT: Dict[str, Future] = {}
+_FETCH_LOCK = threading.Lock()
 
-    if is_pdf_response:
+# TTLCache isn't thread-safe, and callers may mutate what they get back: every
+# read and write holds the lock, and each side gets its own shallow copy
+def _cache_get(url: str) -> Optional[Dict]:
+    with _FETCH_LOCK:
+        cached = _FETCH_CACHE.get(url)
+    return dict(cached) if cached else None
+
+def _cache_put(url: str, result: Dict):
+    if result['status'] == FetchStatus.SUCCESS.value:
+        with _FETCH_LOCK: _FETCH_CACHE[url] = dict(result)
+
+def _process_response(response, url, is_pdf):
+    """Process HTTP response and return result dict (is_pdf: URL already ends in .pdf)"""
+    # PDFs never touch .text, which would charset-detect and decode the whole body
+    if _is_pdf_content(response.headers.get('Content-Type', ''), is_pdf):
         return _success_result(url, response.content, ContentType.PDF)
-    elif _has_valid_content(response.text):
-        return _success_result(url, response.text, ContentType.HTML)
-    return None
+    text = response.text
+    return _success_result(url, text, ContentType.HTML) if _has_valid_content(text) else None
+
+# PDFs are streamed in chunks and capped: a pathological download fails fast
+# instead of buffering an unbounded body before anyone looks at its size
+_PDF_CHUNK_BYTES = 65536
+_pdf_too_large = lambda url: _error_result(url, ContentType.PDF, FetchStatus.ERROR,
+                                           f'PDF exceeds {MAX_PDF_BYTES // (1024 * 1024)}MB limit')
+_declares_too_large = lambda response: int(response.headers.get('Content-Length') or 0) > MAX_PDF_BYTES
+_is_pdf_response = lambda response, url: _is_pdf_content(response.headers.get('Content-Type', ''), _is_pdf_url(url))
 
-def _try_requests(url, verify=True):
-    """Try fetching with requests library"""
+def _read_pdf(response, url):
+    """Read a streamed PDF response chunk by chunk, giving up past MAX_PDF_BYTES"""
+    if _declares_too_large(response): return _pdf_too_large(url)
+    body = bytearray()
+    for chunk in response.iter_bytes(_PDF_CHUNK_BYTES):
+        body += chunk
+        if len(body) > MAX_PDF_BYTES: return _pdf_too_large(url)
+    return _success_result(url, bytes(body), ContentType.PDF)
+
+async def _aread_pdf(response, url):
+    """Async _read_pdf"""
+    if _declares_too_large(response): return _pdf_too_large(url)
+    body = bytearray()
+    async for chunk in response.aiter_bytes(_PDF_CHUNK_BYTES):
+        body += chunk
+        if len(body) > MAX_PDF_BYTES: return _pdf_too_large(url)
+    return _success_result(url, bytes(body), ContentType.PDF)
+
+def _try_http(url, verify=True):
+    """Try fetching with the pooled httpx client (PDF bodies streamed under a size cap)"""
     try:
-        response = requests.get(url, headers={'User-Agent': USER_AGENT},
-                              timeout=REQUEST_TIMEOUT, verify=verify)
-        response.raise_for_status()
-        return _process_response(response, url, _is_pdf_url(url))
-    except requests.exceptions.SSLError:
-        return None if verify else False  # None = retry without verify, False = failed
-    except (requests.Timeout, requests.RequestException):
+        with (_CLIENT if verify else _CLIENT_NOVERIFY).stream('GET', url) as response:
+            response.raise_for_status()
+            if _is_pdf_response(response, url): return _read_pdf(response, url)
+            response.read()
+            return _process_response(response, url, False)
+    except httpx.ConnectError as e:
+        return None if verify and _is_ssl_error(e) else False  # None = retry without verify, False = failed
+    except (httpx.HTTPError, httpx.InvalidURL):
         return False
 
+def _try_curl_cffi(url, verify=True):
+    """
+    Try fetching with a browser TLS fingerprint; None if unavailable, failed, or JS-rendered.
+
+    Certificates are checked first; verification is only dropped after a TLS
+    failure, like the httpx retry (not for 403s, timeouts, or bot blocks).
+    """
+    if curl_requests is None: return None
+    try:
+        response = curl_requests.get(url, impersonate='chrome', timeout=REQUEST_TIMEOUT, verify=verify)
+        response.raise_for_status()
+        result = _process_response(response, url, _is_pdf_url(url))
+        is_usable = result and (result['content_type'] == ContentType.PDF.value or not _needs_browser(result['html']))
+        return result if is_usable else None
+    except CurlSSLError:
+        return _try_curl_cffi(url, verify=False) if verify else None
+    except Exception:
+        return None
+
+_rendered_result = lambda url, html: (
+    _success_result(url, html, ContentType.HTML) if _has_valid_content(html)
+    else _error_result(url, ContentType.HTML, FetchStatus.ERROR, 'Empty page content')
+)
+
+_render_error_result = lambda url, error: (
+    _error_result(url, ContentType.HTML, FetchStatus.TIMEOUT, f'Page load timeout after {REQUEST_TIMEOUT}s')
+    if isinstance(error, PlaywrightTimeout) else _error_result(url, ContentType.HTML, FetchStatus.ERROR, str(error))
+)
+
 def _try_playwright(url):
-    """Try fetching with Playwright for JS-rendered content"""
+    """Try fetching with Playwright (shared browser) for JS-rendered content"""
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            context = browser.new_context(user_agent=USER_AGENT, ignore_https_errors=True)
-            page = context.new_page()
-            page.goto(url, timeout=REQUEST_TIMEOUT * 1000, wait_until='networkidle')
-            html = page.content()
-            browser.close()
-
-            return (_success_result(url, html, ContentType.HTML) if _has_valid_content(html)
-                   else _error_result(url, ContentType.HTML, FetchStatus.ERROR, 'Empty page content'))
-    except PlaywrightTimeout:
-        return _error_result(url, ContentType.HTML, FetchStatus.TIMEOUT,
-                           f'Page load timeout after {REQUEST_TIMEOUT}s')
+        return _rendered_result(url, render_page(url))
     except Exception as e:
-        return _error_result(url, ContentType.HTML, FetchStatus.ERROR, str(e))
+        return _render_error_result(url, e)
 
 def fetch_page(url: str) -> Dict:
     """
@@ -74,18 +189,66 @@ def fetch_page(url: str) -> Dict:
             'status': str,  # "success" | "error" | "timeout"
             'error_message': str | None
         }
+
+    Concurrent calls for the same URL wait on a single in-flight fetch, and
+    successful results are served from a TTL cache on repeat calls.
     """
-    is_pdf = _is_pdf_url(url)
+    with _FETCH_LOCK:
+        cached, inflight = _FETCH_CACHE.get(url), _INFLIGHT.get(url)
+        is_owner = not cached and not inflight
+        if is_owner:
+            inflight = _INFLIGHT[url] = Future()
+
+    if cached: return dict(cached)
+    if not is_owner: return dict(inflight.result())
 
-    # Try requests with SSL verification
-    result = _try_requests(url, verify=True)
+    try:
+        result = _fetch_page_uncached(url)
+        _cache_put(url, result)
+        inflight.set_result(dict(result))
+        return result
+    except BaseException as e:
+        inflight.set_exception(e)
+        raise
+    finally:
+        with _FETCH_LOCK: _INFLIGHT.pop(url, None)
+
+def _fetch_static(url: str):
+    """HTTP (retrying without SSL verification), then curl_cffi; result dict or None"""
+    # Try HTTP with SSL verification
+    result = _try_http(url, verify=True)
     if result: return result
 
     # Retry without SSL verification if SSL error
     if result is None:
-        result = _try_requests(url, verify=False)
+        result = _try_http(url, verify=False)
         if result: return result
 
+    # Retry impersonating a real browser's TLS/HTTP2 fingerprint (no browser engine)
+    return _try_curl_cffi(url)
+
+def fetch_page_static(url: str) -> Dict:
+    """
+    fetch_page without the browser fallback (uncached).
+
+    JS-rendered shells come back as errors so the caller can decide whether
+    the page is worth rendering.
+    """
+    result = _fetch_static(url)
+    if not result:
+        return _error_result(url, ContentType.PDF if _is_pdf_url(url) else ContentType.HTML,
+                             FetchStatus.ERROR, 'Failed to fetch content')
+    if result['content_type'] == ContentType.HTML.value and _needs_browser(result['html']):
+        return _error_result(url, ContentType.HTML, FetchStatus.ERROR, 'Page needs JavaScript rendering')
+    return result
+
+def _fetch_page_uncached(url: str) -> Dict:
+    """Fetch over HTTP (retrying without SSL verification), then curl_cffi, then Playwright"""
+    is_pdf = _is_pdf_url(url)
+
+    result = _fetch_static(url)
+    if result: return result
+
     # Fall back to Playwright for HTML (not PDF)
     if not is_pdf:
         result = _try_playwright(url)
@@ -96,4 +259,97 @@ def fetch_page(url: str) -> Dict:
                         FetchStatus.ERROR, 'Failed to fetch content')
 
 
-fetch_with_playwright = lambda url: _try_playwright(url)
\ No newline at end of file
+fetch_with_playwright = lambda url: _try_playwright(url)
+
+def fetch_links_streaming(url: str, max_links: int = STREAM_LINK_LIMIT) -> Dict:
+    """
+    Fetch an HTML page and collect its anchors as they stream in (uncached).
+
+    Only <a> tags are kept, no HTML string or tree is built, and the download
+    stops once max_links anchors are found. Retries without SSL verification
+    like fetch_page; there is no browser fallback.
+
+    Returns:
+        fetch_page dict ('html' is '') with an added 'links' list of
+        {text, alt, raw_href, href} (href resolved against the final URL)
+    """
+    for verify in (True, False):
+        try:
+            with (_CLIENT if verify else _CLIENT_NOVERIFY).stream('GET', url) as response:
+                response.raise_for_status()
+                if _is_pdf_response(response, url): break
+                links = stream_html_links(response.iter_bytes(8192), str(response.url), max_links,
+                                          response.charset_encoding)
+                return {**_success_result(url, '', ContentType.HTML), 'links': links}
+        except httpx.ConnectError as e:
+            if not (verify and _is_ssl_error(e)): break
+        except (httpx.HTTPError, httpx.InvalidURL):
+            break
+    return {**_error_result(url, ContentType.HTML, FetchStatus.ERROR, 'Failed to fetch content'), 'links': []}
+
+
+# Async batch API
+async def _try_http_async(client, url, verify=True):
+    """Async _try_http on a caller-provided AsyncClient (same None/False contract)"""
+    try:
+        async with client.stream('GET', url) as response:
+            response.raise_for_status()
+            if _is_pdf_response(response, url): return await _aread_pdf(response, url)
+            await response.aread()
+            return _process_response(response, url, False)
+    except httpx.ConnectError as e:
+        return None if verify and _is_ssl_error(e) else False
+    except (httpx.HTTPError, httpx.InvalidURL):
+        return False
+
+async def _try_playwright_async(url, session=None):
+    """Async _try_playwright (renders on the shared browser; a page on the batch's context given a session)"""
+    try:
+        return _rendered_result(url, await arender_page(url, session=session))
+    except Exception as e:
+        return _render_error_result(url, e)
+
+async def _fetch_page_async(url: str, client, client_noverify, session=None) -> Dict:
+    """Async _fetch_page_uncached: HTTP, no-verify retry, curl_cffi, then Playwright"""
+    is_pdf = _is_pdf_url(url)
+
+    result = await _try_http_async(client, url, verify=True)
+    if result: return result
+
+    if result is None:
+        result = await _try_http_async(client_noverify, url, verify=False)
+        if result: return result
+
+    result = await asyncio.to_thread(_try_curl_cffi, url)
+    if result: return result
+
+    if not is_pdf:
+        result = await _try_playwright_async(url, session)
+        if result: return result
+
+    return _error_result(url, ContentType.PDF if is_pdf else ContentType.HTML,
+                        FetchStatus.ERROR, 'Failed to fetch content')
+
+async def fetch_pages(urls: List[str], concurrency: int = MAX_PARALLEL_FETCHES) -> List[Dict]:
+    """
+    Fetch many pages concurrently; returns fetch_page dicts in input order.
+
+    At most `concurrency` fetches run at once. Duplicate URLs are fetched once,
+    and results share fetch_page's TTL cache in both directions. Pages that
+    need the browser render as pages on one shared context for the batch.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    unique_urls = list(dict.fromkeys(urls))
+
+    async with _make_async_client(True) as client, _make_async_client(False) as client_noverify, \
+            abrowser_session() as session:
+        async def _bounded(url):
+            if (cached := _cache_get(url)): return cached
+            async with semaphore:
+                result = await _fetch_page_async(url, client, client_noverify, session)
+            _cache_put(url, result)
+            return result
+
+        results = dict(zip(unique_urls, await asyncio.gather(*[_bounded(url) for url in unique_urls])))
+
+    return [dict(results[url]) for url in urls]  # Duplicate URLs get separate dicts too
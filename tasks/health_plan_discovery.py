@@ -1,23 +1,97 @@
-from typing import Optional, List, Dict
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeout
+import re
+import json
+import asyncio
+import threading
+from functools import partial, lru_cache
+from typing import Optional, List, Dict, Literal
+from urllib.parse import urlsplit
+from cachetools import LRUCache
+from selectolax.lexbor import LexborHTMLParser
+from playwright.async_api import TimeoutError as PlaywrightTimeout
 
-from config import USER_AGENT, REQUEST_TIMEOUT
+from config import (
+    REQUEST_TIMEOUT, MAX_PARALLEL_PAGES, CACHE_LINK_IDENTIFICATION, LLM_CACHE_PATH,
+    LINK_TEMPLATE_CACHE_PATH, LINK_TEMPLATE_MAX_DISTANCE
+)
 from services.extraction import identify_transparency_link as llm_identify_link
-from models.enums import WorkflowMode, FetchStatus, ExtractionType
+from models.extraction_results import TransparencyLinkResult
+from models.enums import WorkflowMode, FetchStatus, ExtractionType, ContentType
 from repositories.extraction import ExtractionRepository
+from tasks.fetcher import fetch_page_static, fetch_links_streaming
+from utils.browser import arender_links, abrowser_session
+from utils.html_parser import url_resolver
+from utils.logging import get_queue_logger
+from utils.disk_cache import DiskCache, content_key
+from utils.semantic_cache import SemanticCache
 
+_log = get_queue_logger(__name__)
 
-def find_transparency_link(domain: str, district_name: str = None, district_id: int = None, repo=None) -> Dict:
+
+# Document links are kept even without anchor text
+_DOC_EXTS = ('.pdf', '.doc', '.docx', '.xlsx')
+
+# Link titles Michigan districts use for the required transparency page; a hit skips the LLM.
+# One compiled alternation scans each string once instead of once per keyword.
+_TRANSPARENCY_TEXT_RE = re.compile(
+    r'(?:budget|salary|compensation|financial) transparency|transparency reporting'
+    r'|budget\s*[&/]?\s*(?:and\s+)?salary',
+    re.IGNORECASE
+)
+_TRANSPARENCY_URL_RE = re.compile(r'^(?=.*transparency)(?=.*(?:budget|salary|compensation))', re.IGNORECASE)
+
+_with_protocol = lambda domain: domain if domain.startswith(('http://', 'https://')) else f'https://{domain}'
+
+_no_link_result = lambda reasoning: {'url': None, 'reasoning': reasoning, 'all_links': []}
+
+# Without a pattern match, only the most promising links go to the LLM: scored by
+# keyword hits in text + URL, ties kept in page order
+_LINK_KEYWORD_WEIGHTS = {
+    'transparency': 5, 'budget': 3, 'salary': 3, 'compensation': 2, 'financ': 2,
+    'business': 1, 'report': 1, 'board': 1, 'district': 1, 'about': 1,
+}
+_LLM_LINK_LIMIT = 20
+_link_score = lambda link: (lambda haystack: sum(weight for keyword, weight in _LINK_KEYWORD_WEIGHTS.items()
+                                                 if keyword in haystack))(f"{link['text']} {link['href']}".lower())
+_top_links = lambda links: sorted(links, key=_link_score, reverse=True)[:_LLM_LINK_LIMIT]
+
+# LLM link picks reused across runs and template-built sites with identical link lists
+_link_cache = lru_cache(maxsize=1)(lambda: DiskCache(LLM_CACHE_PATH))
+_link_cache_key = lambda links, district_name: content_key(
+    'link_identification', district_name or '', json.dumps(links, sort_keys=True)
+)
+
+# Homepages built from the same CMS template share their anchor texts; a positive
+# pick is remembered by the template's anchor-text SimHash as the chosen link's text
+# and path, then re-applied to a matching homepage's own links without the LLM
+_template_cache = lru_cache(maxsize=1)(lambda: SemanticCache(LINK_TEMPLATE_CACHE_PATH, LINK_TEMPLATE_MAX_DISTANCE))
+_MIN_TEMPLATE_ANCHORS = 10  # Smaller link sets are too generic to call a template match
+_anchor_texts = lambda links: sorted({link['text'].lower() for link in links if link['text']})
+_link_path = lambda href: urlsplit(href).path.rstrip('/').lower()
+
+# 'auto': plain HTTP first, rendering only pages that fail or are JS-only shells
+FetchMode = Literal['auto', 'http', 'playwright']
+_MIN_STATIC_LINKS = 3  # Fewer anchors in the static HTML means the menu is built by JavaScript
+
+# Per-run memo of homepage decisions: districts sharing a domain (ISD/local pairs,
+# multi-building districts) reuse the first one's homepage load and link pick.
+# Only homepages that loaded (and got an LLM answer) are kept, so failures are retried.
+_DOMAIN_RESULTS = LRUCache(maxsize=1024)
+_DOMAIN_LOCK = threading.Lock()
+_is_reusable = lambda result: not result['reasoning'].startswith('LLM identification failed')
+_normalize_domain = lambda domain: re.sub(r'^(?:https?://)?(?:www\.)?', '', domain.strip().lower()).rstrip('/')
+
+
+def find_transparency_link(domain: str, district_name: str = None, district_id: int = None, repo=None,
+                           fetch_mode: FetchMode = 'auto') -> Dict:
     """
-    Find Budget/Salary Transparency link on district homepage using Playwright.
+    Find Budget/Salary Transparency link on district homepage.
 
     Args:
         domain: District domain (e.g., "exampledistrict.edu")
         district_name: Optional district name for context
         district_id: District ID for tracking
         repo: Repository for saving fetch/extraction records
+        fetch_mode: 'auto' (HTTP, Playwright for JS-only pages), 'http', or 'playwright'
 
     Returns:
         {
@@ -26,88 +100,146 @@ def find_transparency_link(domain: str, district_name: str = None, district_id:
             'all_links': List[Dict]
         }
     """
-    # Ensure domain has protocol
-    if not domain.startswith(('http://', 'https://')):
-        domain = f'https://{domain}'
+    return asyncio.run(_find_transparency_link_async(domain, district_name, district_id, repo, fetch_mode))
 
-    print(f"\n[TRANSPARENCY DISCOVERY] Searching homepage with Playwright: {domain}")
 
-    fetched_page = None
+async def find_transparency_links_batch(domains: List[str], district_names: List[str] = None,
+                                        concurrency: int = MAX_PARALLEL_PAGES,
+                                        fetch_mode: FetchMode = 'auto') -> List[Dict]:
+    """
+    Discover transparency links for many domains concurrently (untracked, no repo).
+
+    At most `concurrency` homepages load at once (renders run as pages on one
+    shared browser context); results keep input order.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with abrowser_session() as session:
+        async def _bounded(domain, district_name):
+            async with semaphore:
+                return await _find_transparency_link_async(domain, district_name, fetch_mode=fetch_mode, session=session)
+
+        return await asyncio.gather(*[_bounded(domain, name)
+                                      for domain, name in zip(domains, district_names or [None] * len(domains))])
+
+
+async def _find_transparency_link_async(domain: str, district_name: str = None, district_id: int = None, repo=None,
+                                        fetch_mode: FetchMode = 'auto', session=None) -> Dict:
+    """Async find_transparency_link: awaits the homepage load, then identifies the link (session: BrowserSession)"""
+    domain = _with_protocol(domain)
+    memo_key = _normalize_domain(domain)
+    with _DOMAIN_LOCK:
+        memo = _DOMAIN_RESULTS.get(memo_key)
+    if memo:
+        _log.info("[TRANSPARENCY DISCOVERY] Reusing this run's decision for %s", memo_key)
+        _track_reused_decision(domain, *memo, district_id, repo)
+        return memo[0]
+
+    _log.info("[TRANSPARENCY DISCOVERY] Searching homepage (%s): %s", fetch_mode, domain)
+
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            context = browser.new_context(
-                user_agent=USER_AGENT,
-                ignore_https_errors=True
-            )
-            page = context.new_page()
-
-            # Navigate and wait for network to be idle
-            page.goto(domain, timeout=REQUEST_TIMEOUT * 1000, wait_until='networkidle')
-
-            # Get the rendered HTML
-            html = page.content()
-            browser.close()
-
-        # Track homepage fetch
-        if repo and district_id:
-            fetched_page = repo.save_page(repo.create_page(
-                district_id, domain, WorkflowMode.HOMEPAGE_DISCOVERY.value,
-                FetchStatus.SUCCESS.value, None,
-                raw_html=html, content_type='html'
-            ))
-
-        # Extract all links from rendered HTML
-        links = _extract_links_from_homepage(html, domain)
-        print(f"[TRANSPARENCY DISCOVERY] Found {len(links)} links on homepage")
-
-        if not links:
-            return {
-                'url': None,
-                'reasoning': 'No links found on homepage',
-                'all_links': []
-            }
-
-        # Use LLM to identify transparency link
-        llm_result = _llm_identify_transparency_link(links, district_name, fetched_page, repo if district_id else None)
-        
-        if llm_result['url']:
-            print(f"[TRANSPARENCY DISCOVERY] LLM found: {llm_result['url']}")
-        else:
-            print(f"[TRANSPARENCY DISCOVERY] No transparency link identified")
-        
-        return {
-            'url': llm_result['url'],
-            'reasoning': llm_result['reasoning'],
-            'all_links': links
-        }
-        
+        page = await _load_homepage(domain, fetch_mode, with_html=bool(repo and district_id), session=session)
+        links = _clean_links(page['links'])
+
+        # Untracked (batch) calls identify off the event loop so other renders keep going;
+        # tracked calls stay on this thread since the DB session is not thread-safe
+        identify = partial(_identify_from_homepage, domain, links, page['html'], district_name, district_id, repo)
+        result = identify() if repo else await asyncio.to_thread(identify)
+        if _is_reusable(result):
+            with _DOMAIN_LOCK:
+                _DOMAIN_RESULTS[memo_key] = (result, page['html'])
+        return result
+
     except PlaywrightTimeout:
-        print(f"[TRANSPARENCY DISCOVERY] Timeout loading homepage")
-        # Track failed fetch
-        if repo and district_id:
-            repo.save_page(repo.create_page(
-                district_id, domain, WorkflowMode.HOMEPAGE_DISCOVERY.value,
-                FetchStatus.TIMEOUT.value, f'Timeout after {REQUEST_TIMEOUT}s'
-            ))
-        return {
-            'url': None,
-            'reasoning': f'Timeout loading homepage after {REQUEST_TIMEOUT}s',
-            'all_links': []
-        }
+        _log.info("[TRANSPARENCY DISCOVERY] Timeout loading homepage")
+        _track_failed_fetch(domain, FetchStatus.TIMEOUT, f'Timeout after {REQUEST_TIMEOUT}s', district_id, repo)
+        return _no_link_result(f'Timeout loading homepage after {REQUEST_TIMEOUT}s')
     except Exception as e:
-        print(f"[TRANSPARENCY DISCOVERY] Failed to fetch homepage: {str(e)}")
-        # Track failed fetch
-        if repo and district_id:
-            repo.save_page(repo.create_page(
-                district_id, domain, WorkflowMode.HOMEPAGE_DISCOVERY.value,
-                FetchStatus.ERROR.value, str(e)
-            ))
-        return {
-            'url': None,
-            'reasoning': f'Failed to fetch homepage: {str(e)}',
-            'all_links': []
-        }
+        _log.info("[TRANSPARENCY DISCOVERY] Failed to fetch homepage: %s", e)
+        _track_failed_fetch(domain, FetchStatus.ERROR, str(e), district_id, repo)
+        return _no_link_result(f'Failed to fetch homepage: {str(e)}')
+
+
+async def _load_homepage(domain: str, fetch_mode: FetchMode, with_html: bool, session=None) -> Dict:
+    """Raw homepage anchors ({text, alt, raw_href, href}) and the page HTML (None unless with_html)"""
+    if fetch_mode != 'playwright':
+        # Tracked runs save the homepage HTML; untracked ones only need anchors, parsed as the bytes stream in
+        result = await asyncio.to_thread(fetch_page_static if with_html else fetch_links_streaming, domain)
+        is_html = result['status'] == FetchStatus.SUCCESS.value and result['content_type'] == ContentType.HTML.value
+        links = (_raw_links(result['html'], domain) if with_html else result['links']) if is_html else []
+        if len(links) >= _MIN_STATIC_LINKS or (is_html and fetch_mode == 'http'):
+            _log.info("[TRANSPARENCY DISCOVERY] Homepage loaded over HTTP (no browser)")
+            return {'links': links, 'html': result['html'] or None}
+        if fetch_mode == 'http':
+            raise RuntimeError(result['error_message'] or 'Homepage is not HTML')
+        _log.info("[TRANSPARENCY DISCOVERY] HTTP fetch unusable (%s), rendering with Playwright",
+                  result['error_message'] or f'only {len(links)} links')
+
+    # Anchors exist at DOM-ready (networkidle would wait on ads/analytics for seconds);
+    # the full HTML is only pulled over when it has to be saved
+    return await arender_links(domain, wait_until='domcontentloaded', with_html=with_html, session=session)
+
+
+def _identify_from_homepage(domain: str, links: List[Dict], html: Optional[str], district_name: str = None,
+                            district_id: int = None, repo=None) -> Dict:
+    """Track the homepage fetch and pick the transparency link (pattern match, then LLM)"""
+    # Track homepage fetch
+    fetched_page = None
+    if repo and district_id:
+        fetched_page = repo.save_page(repo.create_page(
+            district_id, domain, WorkflowMode.HOMEPAGE_DISCOVERY.value,
+            FetchStatus.SUCCESS.value, None,
+            raw_html=html, content_type='html'
+        ))
+
+    _log.info("[TRANSPARENCY DISCOVERY] Found %d links on homepage", len(links))
+
+    if not links:
+        return _no_link_result('No links found on homepage')
+
+    # Unambiguous link titles need no LLM call
+    matched_url = _pattern_match_transparency_link(links)
+    if matched_url:
+        _log.info("[TRANSPARENCY DISCOVERY] Pattern match found: %s", matched_url)
+        reasoning = 'Link text or URL matches a standard transparency reporting title'
+        if repo and fetched_page:
+            _save_link_identification(repo, fetched_page, links, matched_url, reasoning, template=None)
+        return {'url': matched_url, 'reasoning': reasoning, 'all_links': links}
+
+    # Use LLM to identify transparency link
+    llm_result = _llm_identify_transparency_link(links, district_name, fetched_page, repo if district_id else None)
+
+    if llm_result['url']:
+        _log.info("[TRANSPARENCY DISCOVERY] LLM found: %s", llm_result['url'])
+    else:
+        _log.info("[TRANSPARENCY DISCOVERY] No transparency link identified")
+
+    return {
+        'url': llm_result['url'],
+        'reasoning': llm_result['reasoning'],
+        'all_links': links
+    }
+
+
+def _track_failed_fetch(domain: str, status: FetchStatus, message: str, district_id: int = None, repo=None):
+    """Record a failed homepage fetch when tracking is enabled"""
+    if repo and district_id:
+        repo.save_page(repo.create_page(
+            district_id, domain, WorkflowMode.HOMEPAGE_DISCOVERY.value, status.value, message
+        ))
+
+
+def _track_reused_decision(domain: str, result: Dict, html: Optional[str], district_id: int = None, repo=None):
+    """Record a memoized homepage decision against this district's own homepage fetch"""
+    if repo and district_id:
+        fetched_page = repo.save_page(repo.create_page(
+            district_id, domain, WorkflowMode.HOMEPAGE_DISCOVERY.value,
+            FetchStatus.SUCCESS.value, None,
+            raw_html=html, content_type='html'
+        ))
+        if result['all_links']:
+            _save_link_identification(repo, fetched_page, result['all_links'], result['url'], result['reasoning'],
+                                      from_cache=True)
 
 
 def _extract_links_from_homepage(html: str, base_domain: str) -> List[Dict]:
@@ -121,72 +253,124 @@ def _extract_links_from_homepage(html: str, base_domain: str) -> List[Dict]:
     Returns:
         List of {'text': str, 'href': str} dicts
     """
-    soup = BeautifulSoup(html, 'html.parser')
+    return _clean_links(_raw_links(html, base_domain))
+
+
+def _raw_links(html: str, base_domain: str) -> List[Dict]:
+    """Anchors in HTML as {text, alt, raw_href, href} (the shape the browser's link collector returns)"""
+    resolve = url_resolver(base_domain)
+    return [
+        {'text': ' '.join(a.text(separator=' ', strip=True).split()), 'raw_href': a.attributes.get('href'),
+         'href': resolve(a.attributes.get('href') or ''),
+         'alt': (lambda img: img.attributes.get('alt') if img is not None else '')(a.css_first('img[alt]'))}
+        for a in LexborHTMLParser(html or '').css('a[href]')
+    ]
+
+
+def _clean_links(raw_links) -> List[Dict]:
+    """
+    Filter raw anchors ({text, alt, raw_href, href} with href absolute) to usable links.
+
+    Drops empty/fragment and non-http links, appends image alt text, and keeps
+    text-less links only when they point at documents.
+    """
     links = []
-    
-    for a in soup.find_all('a', href=True):
-        text = a.get_text(strip=True)
-        href = a['href']
-        
+
+    for link in raw_links:
+        raw_href, absolute_url = link['raw_href'], link['href']
+
         # Skip empty links
-        if not href or href.strip() in ['#', '']:
+        if not raw_href or raw_href.strip() in ['#', '']:
             continue
-        
-        # Convert to absolute URL
-        absolute_url = urljoin(base_domain, href)
-        
+
         # Skip non-http links
         if not absolute_url.startswith(('http://', 'https://')):
             continue
-        
+
         # Include alt text from images inside links
-        img = a.find('img')
-        if img and img.get('alt'):
-            text = f"{text} {img['alt']}".strip()
-        
+        text = f"{link['text']} {link['alt'] or ''}".strip()
+
         # Skip if no meaningful text and not a PDF/document link
-        if not text and not any(absolute_url.lower().endswith(ext) 
-                               for ext in ['.pdf', '.doc', '.docx', '.xlsx']):
+        if not text and not absolute_url.lower().endswith(_DOC_EXTS):
             continue
-        
+
         links.append({
             'text': text or '[No text]',
             'href': absolute_url
         })
-    
+
     return links
 
 
+def _pattern_match_transparency_link(links: List[Dict]) -> Optional[str]:
+    """Return href of the first link whose text or URL names the transparency page, else None"""
+    return next((link['href'] for link in links
+                 if _TRANSPARENCY_TEXT_RE.search(link['text']) or _TRANSPARENCY_URL_RE.search(link['href'])), None)
+
+
+def _save_link_identification(repo, fetched_page, links: List[Dict], url: Optional[str], reasoning: str,
+                              template: Optional[str] = 'link_identification', from_cache: bool = False):
+    """Track a link identification (LLM, cached LLM, or pattern match) against the homepage fetch"""
+    extraction_repo = ExtractionRepository(repo.session)
+    extraction_repo.save_extraction(extraction_repo.create_extraction(
+        fetched_page_id=fetched_page.id,
+        extraction_type=ExtractionType.LINK_IDENTIFICATION.value,
+        parsed_text=json.dumps(links[:10]),  # Sample of links
+        parsing_method=None if template else 'pattern_match',
+        llm_prompt_template=template,
+        llm_output=json.dumps({'url': url, 'reasoning': reasoning, 'from_cache': from_cache}),
+        llm_reasoning=reasoning,
+        is_empty=not bool(url)
+    ))
+
+
+def _template_decision(links: List[Dict], candidates: List[Dict]) -> Optional[Dict]:
+    """Re-apply the pick from a homepage with the same anchor texts to these candidates, else None"""
+    texts = _anchor_texts(links)
+    stored = len(texts) >= _MIN_TEMPLATE_ANCHORS and _template_cache().get('\n'.join(texts))
+    if not stored:
+        return None
+    match = (next((link for link in candidates if stored['text'] and link['text'].lower() == stored['text']), None)
+             or next((link for link in candidates if stored['path'] and _link_path(link['href']) == stored['path']), None))
+    return match and {'url': match['href'],
+                      'reasoning': f"Same link as a homepage with matching navigation ('{stored['text'] or stored['path']}')"}
+
+
+def _remember_template(links: List[Dict], candidates: List[Dict], url: Optional[str]):
+    """Store a positive pick under this homepage's anchor-text signature"""
+    texts = _anchor_texts(links)
+    chosen = url and next((link for link in candidates if link['href'] == url), None)
+    if chosen and len(texts) >= _MIN_TEMPLATE_ANCHORS:
+        _template_cache().set('\n'.join(texts), {'text': chosen['text'].lower(), 'path': _link_path(url)})
+
+
 def _llm_identify_transparency_link(links: List[Dict], district_name: str = None, fetched_page=None, repo=None) -> Dict:
-    """Use LLM to identify transparency link."""
+    """Use LLM to identify transparency link (answers cached per district and link list, and per site template)."""
     from utils.debug_logger import get_logger
-    import json
     logger = get_logger()
 
-    links_subset = links[:50]
+    links_subset = _top_links(links)
 
     try:
-        result = llm_identify_link(links_subset, district_name)
+        cache_key = CACHE_LINK_IDENTIFICATION and _link_cache_key(links_subset, district_name)
+        cached = cache_key and (_link_cache().get(cache_key) or _template_decision(links, links_subset))
+        result = TransparencyLinkResult(**cached) if cached else llm_identify_link(links_subset, district_name)
+        if cache_key and not cached:
+            _link_cache().set(cache_key, result.model_dump())
+            _remember_template(links, links_subset, result.url)
+        if cached:
+            _log.info("[TRANSPARENCY DISCOVERY] Reusing cached link identification")
 
         # Log the LLM call (simplified logging)
         identified_url = result.url
         reasoning = result.reasoning
 
-        print(f"[TRANSPARENCY DISCOVERY] LLM reasoning: {reasoning[:150]}...")
+        _log.info("[TRANSPARENCY DISCOVERY] LLM reasoning: %.150s...", reasoning)
 
         # Track LLM extraction
         if repo and fetched_page:
-            extraction_repo = ExtractionRepository(repo.session)
-            extraction = extraction_repo.create_extraction(
-                fetched_page_id=fetched_page.id,
-                extraction_type=ExtractionType.LINK_IDENTIFICATION.value,
-                parsed_text=json.dumps(links_subset[:10]),  # Sample of links
-                llm_prompt_template='link_identification',
-                llm_output=json.dumps({'url': identified_url, 'reasoning': reasoning}),
-                llm_reasoning=reasoning,
-                is_empty=not bool(identified_url)
-            )
-            extraction_repo.save_extraction(extraction)
+            _save_link_identification(repo, fetched_page, links_subset, identified_url, reasoning,
+                                      from_cache=bool(cached))
 
         # Validate that returned URL is actually in our list
         if identified_url:
@@ -197,7 +381,7 @@ def _llm_identify_transparency_link(links: List[Dict], district_name: str = None
                     'reasoning': reasoning
                 }
             else:
-                print(f"[TRANSPARENCY DISCOVERY] LLM returned invalid URL")
+                _log.info("[TRANSPARENCY DISCOVERY] LLM returned invalid URL")
                 return {
                     'url': None,
                     'reasoning': f'LLM returned invalid URL: {reasoning}'
@@ -209,7 +393,7 @@ def _llm_identify_transparency_link(links: List[Dict], district_name: str = None
         }
 
     except Exception as e:
-        print(f"[TRANSPARENCY DISCOVERY] LLM identification failed: {str(e)}")
+        _log.info("[TRANSPARENCY DISCOVERY] LLM identification failed: %s", e)
         return {
             'url': None,
             'reasoning': f'LLM identification failed: {str(e)}'
@@ -1,6 +1,31 @@
-from typing import List, Dict
+import re
+from typing import List, Dict, Optional
 
+from config import HEALTH_PLAN_WINDOW_CHARS, HEALTH_PLAN_MAX_CHARS
 from services.extraction import extract_health_plans as llm_extract_plans
+from models.extraction_results import HealthPlanData
+from utils.text_filter import extract_relevant_windows
+from utils.logging import get_queue_logger
+
+_log = get_queue_logger(__name__)
+
+# Pages with neither a known carrier nor a plan-type word (404s, generic pages,
+# sports calendars) are answered without the LLM
+_PROVIDER_RE = re.compile(
+    r'\b(?:messa|bcbsm?|blue\s*cross|priority\s*health|aetna|uhc|unitedhealthcare|mpsers|hap)\b', re.IGNORECASE
+)
+_PLAN_TYPE_RE = re.compile(r'\b(?:medical|dental|vision|ppo|hmo|disability|insurance)\b', re.IGNORECASE)
+_mentions_plans = lambda text: bool(_PROVIDER_RE.search(text) or _PLAN_TYPE_RE.search(text))
+
+# Only the text around carrier/plan-type mentions is sent to the LLM
+_PLAN_KEYWORD_RE = re.compile(f'{_PROVIDER_RE.pattern}|{_PLAN_TYPE_RE.pattern}', re.IGNORECASE)
+
+# Placeholder returned when a page yields no plans; each result gets its own copy
+_EMPTY_PLAN = {
+    'plan_name': None, 'provider': None, 'plan_type': None,
+    'coverage_details': None, 'source_url': None, 'is_empty': True
+}
+_empty_result = lambda reason: [dict(_EMPTY_PLAN, reasoning=reason)]
 
 
 def extract_health_plans(text_content: str, district_name: str) -> List[Dict]:
@@ -25,73 +50,62 @@ def extract_health_plans(text_content: str, district_name: str) -> List[Dict]:
             ...
         ]
     """
-    print(f"\n[HEALTH PLAN EXTRACTION] Extracting plans for {district_name}")
-    print(f"[HEALTH PLAN EXTRACTION] Content length: {len(text_content)} chars")
-    
-    _empty_result = lambda reason: [{
-        'plan_name': None, 'provider': None, 'plan_type': None,
-        'coverage_details': None, 'source_url': None,
-        'is_empty': True, 'reasoning': reason
-    }]
+    _log.info("[HEALTH PLAN EXTRACTION] Extracting plans for %s", district_name)
+    _log.info("[HEALTH PLAN EXTRACTION] Content length: %d chars", len(text_content))
 
     # Quick validation: empty content
     if len(text_content.strip()) < 100:
-        print("[HEALTH PLAN EXTRACTION] Content too short")
+        _log.info("[HEALTH PLAN EXTRACTION] Content too short")
         return _empty_result('Content too short (less than 100 characters)')
+
+    # Quick validation: nothing plan-related on the page
+    if not _mentions_plans(text_content):
+        _log.info("[HEALTH PLAN EXTRACTION] No insurance carrier or plan type mentioned")
+        return _empty_result('No plan-related tokens in content')
     
-    # Call LLM extraction service
-    try:
-        result = llm_extract_plans(text_content, district_name)
+    relevant_text = extract_relevant_windows(text_content, _PLAN_KEYWORD_RE, HEALTH_PLAN_WINDOW_CHARS, HEALTH_PLAN_MAX_CHARS)
+    _log.info("[HEALTH PLAN EXTRACTION] Filtered to %d of %d chars around plan keywords", len(relevant_text), len(text_content))
 
-        # Extract plans and reasoning from Pydantic model
-        plans = [plan.model_dump() for plan in result.plans]
+    # Call LLM extraction service (repeat prompts are served by the CACHE_LLM response cache)
+    try:
+        # Validate and clean plans straight off the Pydantic models
+        result = llm_extract_plans(relevant_text, district_name)
         reasoning = result.reasoning
+        validated_plans = [_validate_plan_from_model(plan) for plan in result.plans]
+        _log.info("[HEALTH PLAN EXTRACTION] LLM returned %d plans", len(validated_plans))
 
-        print(f"[HEALTH PLAN EXTRACTION] LLM returned {len(plans)} plans")
         if reasoning:
-            print(f"[HEALTH PLAN EXTRACTION] LLM reasoning: {reasoning[:200]}...")
+            _log.info("[HEALTH PLAN EXTRACTION] LLM reasoning: %.200s...", reasoning)
 
-        # Validate and clean results
-        validated_plans = [_validate_plan(plan) for plan in plans]
-
-        # Print valid plans
-        [print(f"[HEALTH PLAN EXTRACTION]   ✓ {p['plan_name']} ({p['provider']}) - {p['plan_type']}"
-               f"{' → ' + p['source_url'] if p['source_url'] else ''}")
-         for p in validated_plans if not p['is_empty']]
+        # Log valid plans (and note whether there were any) in one pass
+        has_valid = False
+        for p in validated_plans:
+            if not p['is_empty']:
+                has_valid = True
+                _log.info("[HEALTH PLAN EXTRACTION]   ✓ %s (%s) - %s%s", p['plan_name'], p['provider'], p['plan_type'],
+                          ' → ' + p['source_url'] if p['source_url'] else '')
 
         # If no valid plans found, return empty result
-        if not any(not p['is_empty'] for p in validated_plans):
-            print("[HEALTH PLAN EXTRACTION] No valid plans extracted")
+        if not has_valid:
+            _log.info("[HEALTH PLAN EXTRACTION] No valid plans extracted")
             return _empty_result(reasoning or 'No health insurance plans found in content')
 
         return validated_plans
 
     except Exception as e:
-        print(f"[HEALTH PLAN EXTRACTION] Extraction failed: {str(e)}")
+        _log.info("[HEALTH PLAN EXTRACTION] Extraction failed: %s", e)
         return _empty_result(f'LLM extraction failed: {str(e)}')
 
 
-def _validate_plan(plan: Dict) -> Dict:
-    """
-    Validate and clean a single plan result.
-    
-    Args:
-        plan: Raw plan dict from LLM
-    
-    Returns:
-        Validated plan dict
-    """
-    # Check if marked as empty
-    is_empty = plan.get('is_empty', False)
-    
-    # Extract fields
-    plan_name = plan.get('plan_name')
-    provider = plan.get('provider')
-    plan_type = plan.get('plan_type')
-    coverage_details = plan.get('coverage_details')
-    source_url = plan.get('source_url')
-    reasoning = plan.get('reasoning', '')
-    
+def _validate_plan_from_model(plan: HealthPlanData) -> Dict:
+    """Validate and clean a plan model straight from the LLM (reads fields, no model_dump)"""
+    return _clean_plan(plan.plan_name, plan.provider, plan.plan_type,
+                       plan.coverage_details, plan.source_url, plan.is_empty)
+
+
+def _clean_plan(plan_name, provider, plan_type, coverage_details, source_url, is_empty: bool,
+                reasoning: str = '') -> Dict:
+    """Standardize plan fields and build the validated plan dict"""
     # If any required field is missing, mark as empty
     if not is_empty and (not plan_name or not provider or not plan_type):
         is_empty = True
@@ -123,6 +137,43 @@ def _validate_plan(plan: Dict) -> Dict:
     }
 
 
+# Canonical names in priority order: an entry matches when all of its substrings
+# appear in the lowercased name, and the first match wins (HAP: whole name only)
+_PROVIDER_TABLE = (
+    (('messa',), 'MESSA'),
+    (('blue cross',), 'Blue Cross Blue Shield'),
+    (('bcbs',), 'Blue Cross Blue Shield'),  # Also covers 'bcbsm'
+    (('priority', 'health'), 'Priority Health'),
+    (('aetna',), 'Aetna'),
+    (('united',), 'UnitedHealthcare'),
+    (('uhc',), 'UnitedHealthcare'),
+    (('mpsers',), 'MPSERS'),
+)
+_PROVIDER_WHOLE_NAMES = {'hap': 'HAP', 'health alliance plan': 'HAP'}
+
+_PLAN_TYPE_TABLE = (
+    (('medical',), 'Medical'),
+    (('health',), 'Medical'),
+    (('dental',), 'Dental'),
+    (('vision',), 'Vision'),
+    (('disability',), 'Disability'),
+    (('life',), 'Life Insurance'),
+    (('long-term care',), 'Long-Term Care'),
+    (('ltc',), 'Long-Term Care'),
+)
+
+
+def _lookup(table, lowered: str) -> Optional[str]:
+    """Canonical name of the first table entry whose substrings all appear in lowered"""
+    for substrings, canonical in table:
+        for substring in substrings:
+            if substring not in lowered:
+                break
+        else:
+            return canonical
+    return None
+
+
 def _standardize_provider_name(provider: str) -> str:
     """
     Standardize insurance provider names.
@@ -131,40 +182,11 @@ def _standardize_provider_name(provider: str) -> str:
         provider: Raw provider name
     
     Returns:
-        Standardized provider name
+        Standardized provider name (original, stripped, if no match)
     """
     provider_lower = provider.lower()
-    
-    # MESSA variations
-    if 'messa' in provider_lower:
-        return 'MESSA'
-    
-    # Blue Cross Blue Shield variations
-    if 'blue cross' in provider_lower or 'bcbs' in provider_lower or 'bcbsm' in provider_lower:
-        return 'Blue Cross Blue Shield'
-    
-    # Priority Health
-    if 'priority' in provider_lower and 'health' in provider_lower:
-        return 'Priority Health'
-    
-    # HAP (Health Alliance Plan)
-    if provider_lower in ['hap', 'health alliance plan']:
-        return 'HAP'
-    
-    # Aetna
-    if 'aetna' in provider_lower:
-        return 'Aetna'
-    
-    # UnitedHealthcare
-    if 'united' in provider_lower or 'uhc' in provider_lower:
-        return 'UnitedHealthcare'
-    
-    # MPSERS (Michigan Public School Employees Retirement System)
-    if 'mpsers' in provider_lower:
-        return 'MPSERS'
-    
-    # Return original if no match
-    return provider.strip()
+    return (_PROVIDER_WHOLE_NAMES.get(provider_lower) or _lookup(_PROVIDER_TABLE, provider_lower)
+            or provider.strip())
 
 
 def _standardize_plan_type(plan_type: str) -> str:
@@ -175,22 +197,6 @@ def _standardize_plan_type(plan_type: str) -> str:
         plan_type: Raw plan type
     
     Returns:
-        Standardized plan type
+        Standardized plan type (original, stripped, if no match)
     """
-    plan_type_lower = plan_type.lower()
-    
-    if 'medical' in plan_type_lower or 'health' in plan_type_lower:
-        return 'Medical'
-    elif 'dental' in plan_type_lower:
-        return 'Dental'
-    elif 'vision' in plan_type_lower:
-        return 'Vision'
-    elif 'disability' in plan_type_lower:
-        return 'Disability'
-    elif 'life' in plan_type_lower:
-        return 'Life Insurance'
-    elif 'long-term care' in plan_type_lower or 'ltc' in plan_type_lower:
-        return 'Long-Term Care'
-    
-    # Return original if no match
-    return plan_type.strip()
\ No newline at end of file
+    return _lookup(_PLAN_TYPE_TABLE, plan_type.lower()) or plan_type.strip()
@@ -1,14 +1,33 @@
-from typing import Dict, List
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Tuple
+from cachetools import LRUCache
 from models.database import District
-from models.enums import FetchStatus, ExtractionStatus, ExtractionType
+from models.enums import FetchStatus, ExtractionStatus, ExtractionType, WorkflowMode, ContentType
 from .health_plan_discovery import find_transparency_link
 from .health_plan_extraction import extract_health_plans
 from .fetcher import fetch_with_playwright
 from utils.html_parser import parse_html_to_text
 from utils.pdf_parser import extract_text_from_pdf
 from utils.debug_logger import get_logger
+from utils.logging import get_queue_logger
 from repositories.extraction import ExtractionRepository
 
+_FETCH_OK = FetchStatus.SUCCESS.value
+_log = get_queue_logger(__name__)  # Same queue as discovery, so stage output stays in order
+
+# Per-run memo of fetched + parsed transparency pages: many districts link the same
+# insurer document, so repeats skip the browser load and PDF parse. Concurrent
+# pipeline workers asking for the same URL wait on one in-flight load.
+_URL_CONTENT_CACHE = LRUCache(maxsize=256)
+_URL_INFLIGHT: Dict[str, Future] = {}
+_URL_LOCK = threading.Lock()
+
+_stage_result = lambda transparency_url, status, error_message=None, plans=None: {
+    'transparency_url': transparency_url, 'plans': plans or [],
+    'status': status.value, 'error_message': error_message
+}
+
 
 def process_health_plans(repo, district: District) -> Dict:
     """
@@ -22,6 +41,20 @@ def process_health_plans(repo, district: District) -> Dict:
             'error_message': str | None
         }
     """
+    discovery = discover_transparency_page(repo, district)
+    if discovery['status'] is not None:
+        return discovery
+    transparency_url = discovery['transparency_url']
+    return save_health_plans(repo, district, transparency_url, fetch_and_extract_plans(transparency_url, district.name))
+
+
+def discover_transparency_page(repo, district: District) -> Dict:
+    """
+    Stage 1 (DB + network): find the transparency link and apply the skip rules.
+
+    Returns a final process_health_plans result, or one with status None and
+    the transparency_url when the page should be fetched.
+    """
     logger = get_logger()
 
     transparency_result = find_transparency_link(district.domain, district.name, district.id, repo)
@@ -34,69 +67,101 @@ def process_health_plans(repo, district: District) -> Dict:
     )
 
     if not transparency_result['url']:
-        print("✗ No transparency link found on homepage")
-        return {
-            'transparency_url': None,
-            'plans': [],
-            'status': ExtractionStatus.NO_LINK.value,
-            'error_message': None
-        }
+        _log.info("✗ No transparency link found on homepage")
+        return _stage_result(None, ExtractionStatus.NO_LINK)
 
     transparency_url = transparency_result['url']
-    print(f"✓ Found transparency page: {transparency_url}")
+    _log.info("✓ Found transparency page: %s", transparency_url)
 
     # Check if this URL should be skipped
     # Skip if: (1) recent failure, OR (2) recent success with no plans extracted
     recent_failure = repo.get_recent_failed_fetch(district.id, transparency_url, days=30)
     if recent_failure:
-        print(f"⊘ Skipping URL - failed recently on {recent_failure.fetched_at.strftime('%Y-%m-%d')} "
-              f"(status: {recent_failure.status}, error: {recent_failure.error_message[:50] if recent_failure.error_message else 'N/A'})")
-        return {
-            'transparency_url': transparency_url,
-            'plans': [],
-            'status': ExtractionStatus.ERROR.value,
-            'error_message': f"Skipped - failed recently ({recent_failure.status})"
-        }
+        _log.info("⊘ Skipping URL - failed recently on %s (status: %s, error: %.50s)",
+                  recent_failure.fetched_at.strftime('%Y-%m-%d'), recent_failure.status,
+                  recent_failure.error_message or 'N/A')
+        return _stage_result(transparency_url, ExtractionStatus.ERROR,
+                             f"Skipped - failed recently ({recent_failure.status})")
 
     recent_success = repo.get_recent_successful_fetch(district.id, transparency_url, days=30)
     if recent_success and not repo.has_plans_for_url(district.id, transparency_url):
-        print(f"⊘ Skipping URL - fetched recently on {recent_success.fetched_at.strftime('%Y-%m-%d')} "
-              f"but extracted 0 plans (likely 404/empty page)")
-        return {
-            'transparency_url': transparency_url,
-            'plans': [],
-            'status': ExtractionStatus.ERROR.value,
-            'error_message': f"Skipped - no plans found on previous fetch"
-        }
+        _log.info("⊘ Skipping URL - fetched recently on %s but extracted 0 plans (likely 404/empty page)",
+                  recent_success.fetched_at.strftime('%Y-%m-%d'))
+        return _stage_result(transparency_url, ExtractionStatus.ERROR, "Skipped - no plans found on previous fetch")
 
-    # Fetch the transparency page
-    fetch_result = fetch_with_playwright(transparency_url)
+    return {'transparency_url': transparency_url, 'plans': [], 'status': None, 'error_message': None}
 
-    # Save fetch result to track successes and failures
-    fetched_page = repo.save_fetch_result(district.id, transparency_url, WorkflowMode.HEALTH_PLAN.value, fetch_result)
 
-    if fetch_result['status'] != FetchStatus.SUCCESS.value:
-        print(f"✗ Failed to fetch: {fetch_result['error_message']}")
-        return {
-            'transparency_url': transparency_url,
-            'plans': [],
-            'status': ExtractionStatus.ERROR.value,
-            'error_message': fetch_result['error_message']
-        }
-    print("✓ Successfully fetched page")
+def fetch_and_extract_plans(transparency_url: str, district_name: str) -> Dict:
+    """
+    Stage 2 (network + CPU + LLM, no DB; safe to run on worker threads): fetch, parse, extract.
 
-    from models.enums import ContentType
+    Returns:
+        {'fetch_result': Dict, 'content_type': ContentType | None, 'text_content': str | None,
+         'plans': List[Dict] | None}
+    """
+    fetch_result, content_type, text_content = _load_content(transparency_url)
+    if fetch_result['status'] != _FETCH_OK:
+        return {'fetch_result': fetch_result, 'content_type': None, 'text_content': None, 'plans': None}
+
+    # Extract health plans with LLM
+    return {'fetch_result': fetch_result, 'content_type': content_type, 'text_content': text_content,
+            'plans': extract_health_plans(text_content, district_name)}
+
+
+def _load_content(url: str) -> Tuple[Dict, ContentType, str]:
+    """Fetch and parse url once per run: (fetch_result, content_type, text_content)"""
+    with _URL_LOCK:
+        cached, inflight = _URL_CONTENT_CACHE.get(url), _URL_INFLIGHT.get(url)
+        is_owner = not cached and not inflight
+        if is_owner:
+            inflight = _URL_INFLIGHT[url] = Future()
+
+    if cached:
+        _log.info("✓ Reusing content already fetched this run: %s", url)
+        return cached
+    if not is_owner: return inflight.result()
+
+    try:
+        content = _fetch_and_parse(url)
+        if content[0]['status'] == _FETCH_OK:
+            with _URL_LOCK: _URL_CONTENT_CACHE[url] = content
+        inflight.set_result(content)
+        return content
+    except BaseException as e:
+        inflight.set_exception(e)
+        raise
+    finally:
+        with _URL_LOCK: _URL_INFLIGHT.pop(url, None)
+
+
+def _fetch_and_parse(url: str) -> Tuple[Dict, ContentType, str]:
+    """Fetch the transparency page and parse HTML or PDF to text"""
+    fetch_result = fetch_with_playwright(url)
+    if fetch_result['status'] != _FETCH_OK:
+        return fetch_result, None, None
 
     content_type = ContentType(fetch_result.get('content_type', ContentType.HTML.value))
     raw_content = fetch_result['html']
+    text_content = (parse_html_to_text(raw_content, preserve_document_links=True, base_url=url)
+                    if content_type == ContentType.HTML else extract_text_from_pdf(raw_content))
+    return fetch_result, content_type, text_content
 
-    # Parse HTML to text
-    parsing_method = f'{content_type.value}_parser'
-    text_content = (parse_html_to_text(raw_content, preserve_document_links=True, base_url=transparency_url)
-                   if content_type == ContentType.HTML else extract_text_from_pdf(raw_content))
 
-    # Extract health plans with LLM
-    plans = extract_health_plans(text_content, district.name)
+def save_health_plans(repo, district: District, transparency_url: str, extracted: Dict) -> Dict:
+    """Stage 3 (DB): track the fetch and extraction, upsert plans, and log"""
+    logger = get_logger()
+    fetch_result = extracted['fetch_result']
+
+    # Save fetch result to track successes and failures
+    fetched_page = repo.save_fetch_result(district.id, transparency_url, WorkflowMode.HEALTH_PLAN.value, fetch_result)
+
+    if fetch_result['status'] != _FETCH_OK:
+        _log.info("✗ Failed to fetch: %s", fetch_result['error_message'])
+        return _stage_result(transparency_url, ExtractionStatus.ERROR, fetch_result['error_message'])
+    _log.info("✓ Successfully fetched page")
+
+    content_type, text_content, plans = extracted['content_type'], extracted['text_content'], extracted['plans']
 
     # Track extraction (HTML→Text→LLM pipeline)
     # Note: raw_html is already stored in fetched_page via save_fetch_result
@@ -105,7 +170,7 @@ def process_health_plans(repo, district: District) -> Dict:
         fetched_page_id=fetched_page.id,
         extraction_type=ExtractionType.HEALTH_PLAN.value,
         parsed_text=text_content,
-        parsing_method=parsing_method,
+        parsing_method=f'{content_type.value}_parser',
         llm_prompt_template='health_plan_extraction',
         llm_reasoning=plans[0].get('reasoning', '') if plans else '',
         is_empty=not any(not p.get('is_empty', True) for p in plans)
@@ -125,17 +190,12 @@ def process_health_plans(repo, district: District) -> Dict:
     logger.log_health_plan_fetch(
         district.name,
         transparency_url,
-        raw_content,
+        fetch_result['html'],
         text_content,
         extraction_result,
         content_type
     )
 
-    print(f"✓ Found {len(valid_plans)} health plan(s)")
+    _log.info("✓ Found %d health plan(s)", len(valid_plans))
 
-    return {
-        'transparency_url': transparency_url,
-        'plans': valid_plans if valid_plans else plans,
-        'status': ExtractionStatus.SUCCESS.value,
-        'error_message': None
-    }
+    return _stage_result(transparency_url, ExtractionStatus.SUCCESS, plans=valid_plans if valid_plans else plans)
@@ -2,18 +2,28 @@ from typing import List, Dict
 from models.enums import WorkflowMode, FetchStatus
 
 
-is_contact_empty = lambda contact: not contact or not any([contact.name, contact.email, contact.title])
+is_contact_empty = lambda contact: not contact or not (contact.name or contact.email or contact.title)
 
 def build_summary(district_id: int, mode: WorkflowMode, results: List[Dict]) -> Dict:
-    """Build workflow summary from results"""
-    _count = lambda condition: sum(1 for r in results if condition(r))
+    """Build workflow summary from results (one pass over results)"""
+    successful = empty = errors = 0
+    success = FetchStatus.SUCCESS.value
+    for result in results:
+        if result['fetch_result']['status'] != success:
+            errors += 1
+        contact = result.get('contact')
+        if contact:
+            if is_contact_empty(contact):
+                empty += 1
+            else:
+                successful += 1
 
     return {
         'district_id': district_id,
         'mode': mode.value,
         'urls_checked': len(results),
         'pages_fetched': len(results),
-        'successful_extractions': _count(lambda r: r.get('contact') and not is_contact_empty(r['contact'])),
-        'empty_extractions': _count(lambda r: r.get('contact') and is_contact_empty(r['contact'])),
-        'errors': _count(lambda r: r['fetch_result']['status'] != FetchStatus.SUCCESS.value)
+        'successful_extractions': successful,
+        'empty_extractions': empty,
+        'errors': errors
     }
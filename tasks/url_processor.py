@@ -1,27 +1,39 @@
-from typing import List, Dict, Optional
+import asyncio
+from typing import List, Dict
 from models.database import District
 from models.enums import FetchStatus
-from .fetcher import fetch_page
-from .extraction import extract_superintendent
+from .fetcher import fetch_pages
+from .extraction import ExtractionContext, iter_superintendents
 
+_FETCH_OK = FetchStatus.SUCCESS.value
 
-def _process_single_url(repo, district: District, url: str, mode: str, idx: int, total: int, observer):
-    """Process single URL: fetch, save, and extract"""
-    fetch_result = fetch_page(url)
-    fetched_page = repo.save_fetch_result(district.id, url, mode, fetch_result)
-
-    contact = (extract_superintendent(fetch_result['html'], district.name, url, district.id, repo, fetched_page)
-               if fetch_result['status'] == FetchStatus.SUCCESS.value else None)
-
-    result = {'fetch_result': fetch_result, 'contact': contact}
-    if observer:
-        observer.on_url_processed(idx, total, url, result)
-    return result
 
 def process_urls(repo, district: District, urls: List[str], mode: str, observer=None) -> List[Dict]:
-    """Process URLs: fetch and extract superintendent info"""
+    """
+    Process URLs: fetch and extract superintendent info.
+
+    All pages are fetched concurrently and their LLM extractions run as one
+    concurrent batch; fetch results and contacts are saved in URL order.
+    """
     if observer:
         observer.on_url_processing_start(len(urls))
 
-    return [_process_single_url(repo, district, url, mode, idx, len(urls), observer)
-            for idx, url in enumerate(urls, 1)]
+    fetch_results = asyncio.run(fetch_pages(urls))
+    fetched_pages = [repo.save_fetch_result(district.id, url, mode, fetch_result)
+                     for url, fetch_result in zip(urls, fetch_results)]
+
+    contacts = iter_superintendents([
+        ExtractionContext(fetch_result['html'], district.name, url, district.id, repo, fetched_page)
+        for url, fetch_result, fetched_page in zip(urls, fetch_results, fetched_pages)
+        if fetch_result['status'] == _FETCH_OK
+    ])
+
+    # Each URL is reported as soon as its extraction is saved, not after the whole batch
+    results = []
+    for idx, (url, fetch_result) in enumerate(zip(urls, fetch_results), 1):
+        result = {'fetch_result': fetch_result,
+                  'contact': next(contacts) if fetch_result['status'] == _FETCH_OK else None}
+        results.append(result)
+        if observer:
+            observer.on_url_processed(idx, len(urls), url, result)
+    return results
@@ -6,7 +6,7 @@ import os
 from utils.llm_client import get_client
 from models.extraction_results import URLFilterResult
 
-def test_llm_provider():
+def test_llm_provider(client):
     """Test the currently configured LLM provider"""
     from config import LLM_PROVIDER, GROQ_MODEL, OLLAMA_MODEL, OLLAMA_URL
 
@@ -34,7 +34,6 @@ def test_llm_provider():
     ]
 
     try:
-        client = get_client()
         result = client.call(
             'url_filtering',
             URLFilterResult,
@@ -58,4 +57,4 @@ def test_llm_provider():
     return True
 
 if __name__ == "__main__":
-    test_llm_provider()
+    test_llm_provider(get_client())
@@ -1,5 +1,7 @@
 """Simple SSH tunnel connectivity test"""
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from utils.ssh_tunnel import ssh_tunnel
 from config import SSH_HOST, SSH_REMOTE_PORT
 
@@ -17,9 +19,15 @@ def test_tunnel():
         # Remove /api/generate from the URL for this test
         base_url = local_url.replace('/api/generate', '')
 
+        # One pooled session so both calls reuse the keep-alive socket through the tunnel
+        session = requests.Session()
+        session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=4,
+                                             max_retries=Retry(total=2, backoff_factor=0.3)))
+        session.headers.update({'Connection': 'keep-alive'})
+
         try:
             # Test basic connectivity
-            response = requests.get(f"{base_url}/api/tags", timeout=10)
+            response = session.get(f"{base_url}/api/tags", timeout=10)
             response.raise_for_status()
 
             data = response.json()
@@ -36,7 +44,7 @@ def test_tunnel():
                 "format": "json"
             }
 
-            gen_response = requests.post(f"{base_url}/api/generate", json=test_payload, timeout=60)
+            gen_response = session.post(f"{base_url}/api/generate", json=test_payload, timeout=60)
             gen_response.raise_for_status()
 
             result = gen_response.json()
@@ -58,6 +66,9 @@ def test_tunnel():
             traceback.print_exc()
             return False
 
+        finally:
+            session.close()
+
 if __name__ == "__main__":
     import sys
     success = test_tunnel()
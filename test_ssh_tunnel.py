@@ -1,17 +1,23 @@
-"""Test script for SSH tunnel and LLM connection"""
+"""
+Test script for SSH tunnel and LLM connection
+
+Batched calls (LLMClient.call_many, e.g. the extraction test fixtures) keep up
+to LLM_BATCH_CONCURRENCY requests in flight. An Ollama server only runs them
+concurrently if it was started with OLLAMA_NUM_PARALLEL >= that value
+(e.g. OLLAMA_NUM_PARALLEL=8); otherwise they queue server-side.
+"""
 import sys
-from utils.llm_client import get_client
-from models.extraction_results import SuperintendentExtraction
 
-def test_connection():
+def test_connection(client):
     """Test SSH tunnel connection and LLM call"""
+    from models.extraction_results import SuperintendentExtraction
+
     print("=" * 60)
     print("Testing SSH Tunnel and LLM Connection")
     print("=" * 60)
 
     try:
-        print("\n1. Initializing LLM client with SSH tunnel...")
-        client = get_client()
+        print("\n1. LLM client with SSH tunnel...")
         print(f"   [OK] Client initialized")
         print(f"   Provider: {client.provider}")
         print(f"   Model: {client.model}")
@@ -61,5 +67,6 @@ def test_connection():
         return False
 
 if __name__ == "__main__":
-    success = test_connection()
+    from utils.llm_client import get_client
+    success = test_connection(get_client())
     sys.exit(0 if success else 1)
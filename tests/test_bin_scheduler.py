@@ -0,0 +1,13 @@
+"""Tests for cost-binned LLM batch ordering."""
+
+from utils.bin_scheduler import bin_order, cost_bin
+
+
+def test_cost_bins():
+    assert [cost_bin(c) for c in (0, 1999, 2000, 5999, 6000, 10 ** 6)] == [0, 0, 1, 1, 2, 2]
+
+
+def test_longest_bin_first_stable_within_bin():
+    costs = [100, 8000, 3000, 50, 7000, 2500]
+    assert bin_order(costs) == [1, 4, 2, 5, 0, 3]
+    assert bin_order([]) == []
@@ -0,0 +1,61 @@
+"""Tests for batch browser sessions (Playwright context/page objects faked)."""
+
+import asyncio
+
+from utils import browser
+
+
+class _FakePage:
+    def __init__(self, closed):
+        self.closed = closed
+
+    async def goto(self, url, **kwargs):
+        self.url = url
+
+    async def evaluate(self, script):
+        return [{'text': 'Home', 'alt': '', 'raw_href': '/', 'href': self.url}]
+
+    async def content(self):
+        return '<html></html>'
+
+    async def close(self):
+        self.closed.append('page')
+
+
+class _FakeContext:
+    def __init__(self, closed):
+        self.closed = closed
+
+    async def new_page(self):
+        return _FakePage(self.closed)
+
+    async def close(self):
+        self.closed.append('context')
+
+
+def test_session_shares_one_context(monkeypatch):
+    """A batch opens one context, closes each page, and closes the context at the end"""
+    opened, closed = [], []
+
+    async def new_context():
+        opened.append(1)
+        return _FakeContext(closed)
+    monkeypatch.setattr(browser, '_new_context', new_context)
+
+    async def batch():
+        async with browser.abrowser_session() as session:
+            return await asyncio.gather(*[browser.arender_links(f'https://d{i}.org', session=session) for i in range(3)])
+
+    results = asyncio.run(batch())
+    assert [r['links'][0]['href'] for r in results] == [f'https://d{i}.org' for i in range(3)]
+    assert len(opened) == 1 and closed == ['page'] * 3 + ['context']
+
+
+def test_unused_session_opens_nothing(monkeypatch):
+    """A batch that never renders never opens a context"""
+    monkeypatch.setattr(browser, '_new_context', lambda: (_ for _ in ()).throw(AssertionError('opened')))
+
+    async def batch():
+        async with browser.abrowser_session():
+            pass
+    asyncio.run(batch())
@@ -0,0 +1,17 @@
+"""Tests for SQLite connection setup."""
+
+from sqlalchemy import create_engine, event, text
+
+from config import SQLITE_BUSY_TIMEOUT_MS
+from models.database import _sqlite_pragmas
+
+
+def test_sqlite_connections_use_wal(tmp_path):
+    """Every new connection is in WAL mode with relaxed sync and a busy timeout"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'wal.db'}")
+    event.listen(engine, 'connect', _sqlite_pragmas)
+    with engine.connect() as conn:
+        pragmas = [conn.execute(text(f"PRAGMA {name}")).scalar()
+                   for name in ('journal_mode', 'synchronous', 'busy_timeout')]
+    assert pragmas == ['wal', 1, SQLITE_BUSY_TIMEOUT_MS]  # synchronous 1 = NORMAL
+    engine.dispose()
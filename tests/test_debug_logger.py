@@ -0,0 +1,104 @@
+"""Tests for the queued debug log writer."""
+
+import json
+
+import pytest
+
+from utils import debug_logger
+from utils.debug_logger import DebugLogger
+
+_RESULT = {'name': 'Phil Jankowski', 'llm_reasoning': 'Named on staff page', 'is_empty': False}
+
+
+class TestDebugLogger:
+    """Test background writes and raw HTML handling"""
+
+    def test_page_fetch_files_written_after_flush(self, tmp_path, monkeypatch):
+        """Raw, parsed and extraction files all land in the district folder"""
+        monkeypatch.setattr(debug_logger, 'DEBUG_COMPRESS_RAW', False)
+        logger = DebugLogger(base_dir=str(tmp_path))
+        logger.log_page_fetch('Adams Township', 'https://a.org/staff', '<html>hi</html>', 'hi', _RESULT)
+        logger.flush()
+
+        files = sorted(p.name.split('_', 2)[-1] for p in (logger.run_dir / 'Adams_Township').iterdir())
+        assert files == ['extraction.json', 'parsed.txt', 'raw.html']
+
+    def test_same_page_logged_twice_keeps_both(self, tmp_path):
+        """Two logs of one URL within the same second get distinct, ordered file names"""
+        logger = DebugLogger(base_dir=str(tmp_path))
+        for _ in range(2):
+            logger.log_page_fetch('Adams Township', 'https://a.org/staff', '<html>hi</html>', 'hi', _RESULT)
+        logger.flush()
+
+        names = sorted(p.name for p in (logger.run_dir / 'Adams_Township').glob('*_extraction.json'))
+        assert names == ['staff_000000_extraction.json', 'staff_000001_extraction.json']
+
+    def test_raw_html_compressed_with_zstd(self, tmp_path):
+        """With zstandard installed, the raw dump is a .zst that decompresses to the page"""
+        zstandard = pytest.importorskip('zstandard')
+        logger = DebugLogger(base_dir=str(tmp_path))
+        logger.log_page_fetch('Adams Township', 'https://a.org/staff', '<html>hi</html>', 'hi', _RESULT)
+        logger.flush()
+
+        raw_file = next((logger.run_dir / 'Adams_Township').glob('*_raw.html.zst'))
+        assert zstandard.ZstdDecompressor().decompress(raw_file.read_bytes()) == b'<html>hi</html>'
+
+    def test_raw_html_plain_without_zstandard(self, tmp_path, monkeypatch):
+        """Without zstandard the raw dump falls back to a plain .html file"""
+        monkeypatch.setattr(debug_logger, '_ZSTD', None)
+        logger = DebugLogger(base_dir=str(tmp_path))
+        logger.log_page_fetch('Adams Township', 'https://a.org/staff', '<html>hi</html>', 'hi', _RESULT)
+        logger.flush()
+
+        raw_file = next((logger.run_dir / 'Adams_Township').glob('*_raw.html'))
+        assert raw_file.read_text() == '<html>hi</html>'
+
+    def test_raw_html_digest_only_when_disabled(self, tmp_path, monkeypatch):
+        """DEBUG_RAW_HTML=0 skips the raw dump and records a hash + length"""
+        monkeypatch.setattr(debug_logger, 'DEBUG_RAW_HTML', False)
+        logger = DebugLogger(base_dir=str(tmp_path))
+        logger.log_page_fetch('Adams Township', 'https://a.org/staff', '<html>hi</html>', 'hi', _RESULT)
+        logger.flush()
+
+        district_dir = logger.run_dir / 'Adams_Township'
+        assert not list(district_dir.glob('*_raw.html'))
+        data = json.loads(next(district_dir.glob('*_extraction.json')).read_text())
+        assert data['raw_html_length'] == len('<html>hi</html>')
+        assert len(data['raw_blake2b']) == 128
+
+    def test_health_plan_pdf_requires_bytes(self, tmp_path, monkeypatch):
+        """PDFs are written byte-for-byte; a PDF passed as text is rejected instead of re-encoded"""
+        logger = DebugLogger(base_dir=str(tmp_path))
+        with pytest.raises(ValueError):
+            logger.log_health_plan_fetch('Adams Township', 'https://a.org/t.pdf', '%PDF-1.4', 'x', {}, 'pdf')
+        logger.log_health_plan_fetch('Adams Township', 'https://a.org/t.pdf', b'%PDF-1.4\xe2', 'x', {}, 'pdf')
+        logger.flush()
+
+        assert next((logger.run_dir / 'Adams_Township').glob('*_raw.pdf')).read_bytes() == b'%PDF-1.4\xe2'
+
+    def test_bad_content_rejected_without_stalling_writer(self, tmp_path):
+        """Unencodable content raises in the caller; a bad queued item doesn't stop later writes or flush()"""
+        logger = DebugLogger(base_dir=str(tmp_path))
+        with pytest.raises(AttributeError):
+            logger.log_page_fetch('Adams Township', 'https://a.org/staff', '<html>hi</html>', None, _RESULT)
+        debug_logger._WRITE_QUEUE.put((tmp_path / 'bad.txt', None, False))
+        logger.log_page_fetch('Adams Township', 'https://a.org/staff', '<html>hi</html>', 'hi', _RESULT)
+        logger.flush()
+
+        assert debug_logger._WRITE_QUEUE.unfinished_tasks == 0
+        assert list((logger.run_dir / 'Adams_Township').glob('*_extraction.json'))
+
+    def test_int_keys_serialized_like_json(self, tmp_path):
+        """Dicts keyed by non-strings are logged (keys become strings) rather than dropped"""
+        logger = DebugLogger(base_dir=str(tmp_path))
+        logger.log_llm_call('Adams Township', 'url_filtering', 'sys', 'user', {0: 'https://a.org', 3: 'https://a.org/b'})
+        logger.flush()
+
+        data = json.loads(next((logger.run_dir / 'Adams_Township').glob('*_llm.json')).read_text())
+        assert data['llm_response'] == {'0': 'https://a.org', '3': 'https://a.org/b'}
+
+    def test_file_names_sanitized(self):
+        """URL tails keep alphanumerics (non-ASCII letters too) and -_; everything else becomes _"""
+        assert debug_logger._file_safe('staff.php?id=3&x') == 'staff_php_id_3_x'
+        assert debug_logger._file_safe('équipe-2…') == 'équipe-2_'
+        assert debug_logger._slugify('Adams / Township') == 'Adams___Township'
@@ -0,0 +1,33 @@
+"""Tests for sitemap/homepage URL discovery."""
+
+import httpx
+
+from tasks import discovery
+
+_HOMEPAGE = ('<html><body><a href="/staff">Staff</a><a href="https://other.org/x">Elsewhere</a>'
+             '<a href="/board.pdf">Minutes</a></body></html>')
+
+
+def _mock_client(monkeypatch, handler):
+    """Serve discovery's requests from handler instead of the network"""
+    client = httpx.Client(transport=httpx.MockTransport(handler), follow_redirects=True)
+    monkeypatch.setattr(discovery, 'http_client', lambda verify=True: client)
+
+
+def test_sitemap_urls_used_when_present(monkeypatch):
+    """Same-site <loc> entries from sitemap.xml are returned without scraping the homepage"""
+    sitemap = ('<?xml version="1.0"?><urlset><url><loc>https://a.org/about</loc></url>'
+               '<url><loc>https://b.org/x</loc></url></urlset>')
+    requested = []
+    _mock_client(monkeypatch, lambda request: requested.append(request.url.path) or httpx.Response(200, text=sitemap))
+
+    assert discovery.discover_urls('a.org') == ['https://a.org/about']
+    assert requested == ['/sitemap.xml']
+
+
+def test_homepage_links_when_no_sitemap(monkeypatch):
+    """A missing sitemap falls back to same-site homepage links"""
+    _mock_client(monkeypatch, lambda request: (httpx.Response(404) if request.url.path == '/sitemap.xml'
+                                               else httpx.Response(200, text=_HOMEPAGE)))
+
+    assert discovery.discover_urls('https://a.org') == ['https://a.org/staff']
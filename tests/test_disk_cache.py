@@ -0,0 +1,36 @@
+"""Tests for the SQLite-backed response cache."""
+
+from utils.disk_cache import DiskCache, content_key
+
+
+class TestDiskCache:
+    """Test persistence and key hashing"""
+
+    def test_round_trip(self, tmp_path):
+        """Stored values come back identical, misses return None"""
+        cache = DiskCache(tmp_path / 'cache.db')
+        value = {'name': 'Phil Jankowski', 'is_empty': False, 'plans': [1, 2]}
+
+        assert cache.get('missing') is None
+        assert cache.set('key', value) == value
+        assert cache.get('key') == value
+
+    def test_persists_across_instances(self, tmp_path):
+        """A new cache on the same path sees earlier writes"""
+        DiskCache(tmp_path / 'cache.db').set('key', {'url': None})
+        assert DiskCache(tmp_path / 'cache.db').get('key') == {'url': None}
+
+    def test_blob_round_trip(self, tmp_path):
+        """Binary payloads keep their bytes and metadata"""
+        cache = DiskCache(tmp_path / 'cache.db')
+        body = bytes(range(256))
+
+        assert cache.get_blob('asset') is None
+        cache.set_blob('asset', {'status': 200, 'headers': {'content-type': 'font/woff2'}}, body)
+        assert cache.get_blob('asset') == ({'status': 200, 'headers': {'content-type': 'font/woff2'}}, body)
+
+    def test_content_key_is_order_sensitive(self):
+        """Keys differ when the same parts are combined differently"""
+        assert content_key('text', 'district') == content_key('text', 'district')
+        assert content_key('text', 'district') != content_key('district', 'text')
+        assert len(content_key('text')) == 32
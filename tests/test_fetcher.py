@@ -0,0 +1,245 @@
+"""Tests for fetch_page request coalescing, caching, and browser detection."""
+
+import threading
+import time
+
+from tasks import fetcher
+
+
+def _stub_fetch(calls, status='success', delay=0.0):
+    """Build a fake uncached fetch that records each call"""
+    def fetch(url):
+        calls.append(url)
+        time.sleep(delay)
+        return {'url': url, 'html': '<html></html>', 'content_type': 'html',
+                'status': status, 'error_message': None}
+    return fetch
+
+
+class TestFetchCoalescing:
+    """Test in-flight deduplication and TTL caching"""
+
+    def setup_method(self):
+        fetcher._FETCH_CACHE.clear()
+
+    def test_concurrent_fetches_share_one_request(self, monkeypatch):
+        """Threads fetching the same URL at once trigger a single fetch"""
+        calls = []
+        monkeypatch.setattr(fetcher, '_fetch_page_uncached', _stub_fetch(calls, delay=0.2))
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(fetcher.fetch_page('https://a.org')))
+                   for _ in range(5)]
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+
+        assert calls == ['https://a.org']
+        assert len(results) == 5 and all(r['status'] == 'success' for r in results)
+        assert fetcher._INFLIGHT == {}
+
+    def test_success_is_cached(self, monkeypatch):
+        """Repeat fetches of a successful URL are served from cache"""
+        calls = []
+        monkeypatch.setattr(fetcher, '_fetch_page_uncached', _stub_fetch(calls))
+        fetcher.fetch_page('https://a.org')
+        fetcher.fetch_page('https://a.org')
+        assert calls == ['https://a.org']
+
+    def test_callers_get_their_own_dicts(self, monkeypatch):
+        """Mutating a returned result doesn't change what later cache hits see"""
+        monkeypatch.setattr(fetcher, '_fetch_page_uncached', _stub_fetch([]))
+        fetcher.fetch_page('https://a.org')['html'] = 'mutated'
+        hit = fetcher.fetch_page('https://a.org')
+        hit['status'] = 'mutated'
+        assert fetcher.fetch_page('https://a.org')['html'] == '<html></html>'
+        assert fetcher.fetch_page('https://a.org')['status'] == 'success'
+
+    def test_errors_are_not_cached(self, monkeypatch):
+        """Failed fetches are retried on the next call"""
+        calls = []
+        monkeypatch.setattr(fetcher, '_fetch_page_uncached', _stub_fetch(calls, status='error'))
+        fetcher.fetch_page('https://a.org')
+        fetcher.fetch_page('https://a.org')
+        assert len(calls) == 2
+
+
+class TestNeedsBrowser:
+    """Test the JS-rendered page heuristic that gates the Playwright fallback"""
+
+    def test_script_shell_needs_browser(self):
+        """A page that is only a mount point plus scripts needs rendering"""
+        html = '<html><head><script src="app.js"></script></head><body><div id="root"></div></body></html>'
+        assert fetcher._needs_browser(html + ' ' * 200)
+
+    def test_static_page_does_not(self):
+        """A page with real body text is usable even if it has scripts"""
+        html = f"<html><body><p>{'Superintendent Jane Smith ' * 10}</p><script>track()</script></body></html>"
+        assert not fetcher._needs_browser(html)
+
+    def test_empty_page_needs_browser(self):
+        """Empty or tiny responses always fall through to the browser"""
+        assert fetcher._needs_browser('') and fetcher._needs_browser('<html></html>')
+
+
+class TestPdfDetection:
+    """Test PDF detection by URL suffix and Content-Type"""
+
+    def test_url_suffix_any_case(self):
+        """Any casing of .pdf matches; near misses do not"""
+        assert fetcher._is_pdf_url('https://a.org/Salary.PDF') and fetcher._is_pdf_url('https://a.org/b.PdF')
+        assert not fetcher._is_pdf_url('https://a.org/pdf') and not fetcher._is_pdf_url('https://a.org/x.pdfx')
+
+    def test_content_type(self):
+        """Content-Type matches case-insensitively, with parameters"""
+        assert fetcher._is_pdf_content('Application/PDF; charset=binary', False)
+        assert not fetcher._is_pdf_content('text/html', False) and fetcher._is_pdf_content('text/html', True)
+
+
+class TestFetchPages:
+    """Test the async batch fetch against a local HTTP server"""
+
+    def test_batch_order_and_dedupe(self, tmp_path):
+        """Results follow input order and duplicate URLs are fetched once"""
+        import asyncio
+        from functools import partial
+        from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+        hits = []
+
+        class Handler(SimpleHTTPRequestHandler):
+            def log_message(self, *args):
+                hits.append(self.path)
+
+        for name in ('a', 'b'):
+            (tmp_path / f'{name}.html').write_text(f"<html><body><p>{name * 200}</p></body></html>")
+        server = ThreadingHTTPServer(('127.0.0.1', 0), partial(Handler, directory=str(tmp_path)))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        fetcher._FETCH_CACHE.clear()
+        try:
+            base = f'http://127.0.0.1:{server.server_port}'
+            urls = [f'{base}/a.html', f'{base}/b.html', f'{base}/a.html']
+            results = asyncio.run(fetcher.fetch_pages(urls, concurrency=2))
+        finally:
+            server.shutdown()
+
+        assert [r['url'] for r in results] == urls
+        assert all(r['status'] == 'success' and r['content_type'] == 'html' for r in results)
+        assert sorted(hits) == ['/a.html', '/b.html']
+
+    def test_browser_fallbacks_share_one_session(self, monkeypatch):
+        """Pages that need rendering reuse the batch's browser context"""
+        import asyncio
+
+        sessions = []
+
+        async def no_http(client, url, verify=True):
+            return False
+
+        async def render(url, wait_until='networkidle', session=None):
+            sessions.append(session)
+            return f"<html><body><p>{'rendered ' * 50}</p></body></html>"
+
+        monkeypatch.setattr(fetcher, '_try_http_async', no_http)
+        monkeypatch.setattr(fetcher, '_try_curl_cffi', lambda url: None)
+        monkeypatch.setattr(fetcher, 'arender_page', render)
+        fetcher._FETCH_CACHE.clear()
+
+        results = asyncio.run(fetcher.fetch_pages(['https://a.org/x', 'https://a.org/y']))
+        assert [r['status'] for r in results] == ['success', 'success']
+        assert len(sessions) == 2 and sessions[0] is sessions[1] is not None
+
+
+class TestPdfStreaming:
+    """Test streamed PDF downloads and the size cap"""
+
+    def setup_method(self):
+        from functools import partial
+        from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+        class Handler(SimpleHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+        import tempfile
+        self.directory = tempfile.mkdtemp()
+        self.body = b'%PDF-1.4\n' + b'x' * 200_000
+        with open(f'{self.directory}/report.pdf', 'wb') as f:
+            f.write(self.body)
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), partial(Handler, directory=self.directory))
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}/report.pdf'
+
+    def teardown_method(self):
+        self.server.shutdown()
+
+    def test_pdf_is_read_in_full(self):
+        """A PDF under the cap comes back as the exact bytes"""
+        result = fetcher._try_http(self.url)
+        assert result['status'] == 'success' and result['content_type'] == 'pdf'
+        assert result['html'] == self.body
+
+    def test_oversized_pdf_is_an_error(self, monkeypatch):
+        """A PDF over the cap is refused, sync and async"""
+        import asyncio
+        import httpx
+        monkeypatch.setattr(fetcher, 'MAX_PDF_BYTES', 1024)
+
+        async def _fetch_async():
+            async with httpx.AsyncClient() as client:
+                return await fetcher._try_http_async(client, self.url)
+
+        for result in (fetcher._try_http(self.url), asyncio.run(_fetch_async())):
+            assert result['status'] == 'error' and result['html'] == ''
+            assert 'limit' in result['error_message']
+
+
+class TestSslRetry:
+    """Test TLS failures are recognized so the unverified retry runs"""
+
+    def setup_method(self):
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+        # Plain HTTP behind an https:// URL: the handshake fails with WRONG_VERSION_NUMBER
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'https://127.0.0.1:{self.server.server_port}/'
+
+    def teardown_method(self):
+        self.server.shutdown()
+
+    def test_handshake_failure_is_ssl_error(self):
+        """A non-certificate handshake error is found down the exception chain"""
+        import httpx
+        try:
+            fetcher._CLIENT.get(self.url)
+        except httpx.ConnectError as e:
+            assert fetcher._is_ssl_error(e)
+        else:
+            raise AssertionError('handshake should fail')
+
+    def test_verified_attempt_asks_for_retry(self):
+        """_try_http returns None (retry unverified) on TLS failure, False once unverified"""
+        assert fetcher._try_http(self.url, verify=True) is None
+        assert fetcher._try_http(self.url, verify=False) is False
+
+    def test_curl_cffi_verifies_unless_tls_fails(self, monkeypatch):
+        """The impersonating fallback only drops verification after a TLS error, not after e.g. a 403"""
+        import pytest
+        from types import SimpleNamespace
+        pytest.importorskip('curl_cffi')
+
+        calls = []
+
+        def get(url, impersonate, timeout, verify):
+            calls.append(verify)
+            raise error
+        monkeypatch.setattr(fetcher, 'curl_requests', SimpleNamespace(get=get))
+
+        for error, expected in ((RuntimeError('403 Forbidden'), [True]),
+                                (fetcher.CurlSSLError('handshake failed'), [True, False])):
+            calls.clear()
+            assert fetcher._try_curl_cffi(self.url) is None
+            assert calls == expected
@@ -0,0 +1,233 @@
+"""Tests for concurrent transparency-link discovery (browser and LLM patched out)."""
+
+import asyncio
+
+from tasks import health_plan_discovery as discovery
+
+_dom_links = lambda url: [
+    {'text': 'Budget Transparency', 'alt': '', 'raw_href': '/transparency', 'href': f'{url}/transparency'},
+    {'text': 'Staff', 'alt': '', 'raw_href': '/staff', 'href': f'{url}/staff'},
+]
+
+
+_static_result = lambda url, html: (
+    {'url': url, 'html': html, 'content_type': 'html', 'status': 'success', 'error_message': None} if html
+    else {'url': url, 'html': '', 'content_type': 'html', 'status': 'error', 'error_message': 'Page needs JavaScript rendering'}
+)
+
+
+def _patch_render(monkeypatch, active, peak):
+    """Replace the Playwright link render with a sleep that records concurrency"""
+    async def render(url, wait_until='domcontentloaded', with_html=False, session=None):
+        active.append(url)
+        peak.append(len(active))
+        await asyncio.sleep(0.05)
+        active.remove(url)
+        return {'links': _dom_links(url), 'html': '<html></html>' if with_html else None}
+    monkeypatch.setattr(discovery, 'arender_links', render)
+    monkeypatch.setattr(discovery, '_DOMAIN_RESULTS', discovery.LRUCache(maxsize=16))
+    monkeypatch.setattr(discovery, 'fetch_page_static', lambda url: _static_result(url, None))
+    monkeypatch.setattr(discovery, 'fetch_links_streaming', lambda url: {**_static_result(url, None), 'links': []})
+    monkeypatch.setattr(discovery, '_llm_identify_transparency_link',
+                        lambda links, *args: {'url': links[0]['href'], 'reasoning': 'Budget link'})
+
+
+class TestTransparencyBatch:
+    """Test batch discovery ordering and the concurrency cap"""
+
+    def test_results_in_input_order(self, monkeypatch):
+        """Each domain gets its own result, in the order given"""
+        _patch_render(monkeypatch, [], [])
+        domains = ['a.k12.mi.us', 'b.k12.mi.us', 'c.k12.mi.us']
+        results = asyncio.run(discovery.find_transparency_links_batch(domains))
+        assert [r['url'] for r in results] == [f'https://{d}/transparency' for d in domains]
+
+    def test_concurrency_capped(self, monkeypatch):
+        """No more than `concurrency` homepages render at once"""
+        peak = []
+        _patch_render(monkeypatch, [], peak)
+        asyncio.run(discovery.find_transparency_links_batch([f'd{i}.org' for i in range(6)], concurrency=2))
+        assert max(peak) == 2
+
+    def test_sync_wrapper(self, monkeypatch):
+        """find_transparency_link keeps its synchronous API"""
+        _patch_render(monkeypatch, [], [])
+        result = discovery.find_transparency_link('a.k12.mi.us', 'Adams')
+        assert result['url'] == 'https://a.k12.mi.us/transparency' and len(result['all_links']) == 2
+
+
+class TestFetchMode:
+    """Test plain-HTTP homepage loading and the Playwright fallback"""
+
+    def test_static_homepage_skips_browser(self, monkeypatch):
+        """A server-rendered homepage is parsed without rendering"""
+        rendered = []
+        _patch_render(monkeypatch, rendered, [])
+        about = {'text': 'About', 'alt': '', 'raw_href': '/about', 'href': 'https://a.k12.mi.us/about'}
+        monkeypatch.setattr(discovery, 'fetch_links_streaming', lambda url: {
+            **_static_result(url, '<html></html>'), 'html': '', 'links': _dom_links(url) + [about]})
+        result = discovery.find_transparency_link('a.k12.mi.us')
+        assert result['url'] == 'https://a.k12.mi.us/transparency' and rendered == []
+
+    def test_sparse_static_homepage_renders(self, monkeypatch):
+        """Too few static anchors (a JS-built menu) falls back to the browser"""
+        peak = []
+        _patch_render(monkeypatch, [], peak)
+        monkeypatch.setattr(discovery, 'fetch_links_streaming', lambda url: {
+            **_static_result(url, '<html></html>'), 'html': '', 'links': _dom_links(url)[1:]})
+        assert discovery.find_transparency_link('a.k12.mi.us')['url'] == 'https://a.k12.mi.us/transparency'
+        assert len(peak) == 1
+
+    def test_js_homepage_falls_back_to_browser(self, monkeypatch):
+        """'auto' renders pages plain HTTP could not use; 'http' never does"""
+        peak = []
+        _patch_render(monkeypatch, [], peak)
+        assert discovery.find_transparency_link('a.k12.mi.us')['url'] == 'https://a.k12.mi.us/transparency'
+        assert len(peak) == 1
+
+        result = discovery.find_transparency_link('b.k12.mi.us', fetch_mode='http')
+        assert result['url'] is None and 'JavaScript' in result['reasoning'] and len(peak) == 1
+
+
+class TestExtractLinks:
+    """Test homepage link extraction filters and text handling"""
+
+    def test_links_extracted_and_filtered(self):
+        """Relative links resolve, image alts append, junk links drop, words in nested tags stay apart"""
+        html = ('<html><body>'
+                '<a href="/budget"> Budget &amp; <b>Salary</b>\n  Transparency </a><a href="/staff">Staff<br>Directory</a>'
+                '<a href="#">Top</a><a href="mailto:info@adams.org">Email</a><a>No href</a>'
+                '<a href="/logo"><img src="x.png" alt="Transparency Reporting"></a>'
+                '<a href="/files/plan.pdf"></a><a href="/empty"></a>'
+                '</body></html>')
+        assert discovery._extract_links_from_homepage(html, 'https://adams.org') == [
+            {'text': 'Budget & Salary Transparency', 'href': 'https://adams.org/budget'},
+            {'text': 'Staff Directory', 'href': 'https://adams.org/staff'},
+            {'text': 'Transparency Reporting', 'href': 'https://adams.org/logo'},
+            {'text': '[No text]', 'href': 'https://adams.org/files/plan.pdf'},
+        ]
+
+    def test_empty_html(self):
+        """Empty pages yield no links instead of raising"""
+        assert discovery._extract_links_from_homepage('', 'https://adams.org') == []
+
+
+class TestPatternMatch:
+    """Test the keyword fast path that skips the LLM"""
+
+    def test_text_match(self):
+        """Standard link titles match case-insensitively"""
+        links = [{'text': 'Staff', 'href': 'https://a.org/staff'},
+                 {'text': 'Budget and Salary/Compensation Transparency Reporting', 'href': 'https://a.org/t'}]
+        assert discovery._pattern_match_transparency_link(links) == 'https://a.org/t'
+
+    def test_url_match(self):
+        """A transparency URL about budget/salary matches even with generic text"""
+        links = [{'text': 'Click here', 'href': 'https://a.org/Budget-Transparency'}]
+        assert discovery._pattern_match_transparency_link(links) == 'https://a.org/Budget-Transparency'
+
+    def test_no_match_falls_back(self):
+        """Unrelated links leave the decision to the LLM"""
+        links = [{'text': 'Transparency', 'href': 'https://a.org/about'}, {'text': 'Budget', 'href': 'https://a.org/b'}]
+        assert discovery._pattern_match_transparency_link(links) is None
+
+
+class TestLinkIdentificationCache:
+    """Test that repeat link lists reuse the LLM's answer"""
+
+    def test_second_call_served_from_cache(self, monkeypatch, tmp_path):
+        """Identical (district, links) skip the LLM; provenance records the cache hit"""
+        from models.extraction_results import TransparencyLinkResult
+        from utils.disk_cache import DiskCache
+        from utils.semantic_cache import SemanticCache
+
+        calls, saved = [], []
+        cache = DiskCache(str(tmp_path / 'links.db'))
+        monkeypatch.setattr(discovery, '_link_cache', lambda: cache)
+        monkeypatch.setattr(discovery, '_template_cache', lambda: SemanticCache(str(tmp_path / 'templates.db')))
+        monkeypatch.setattr(discovery, 'llm_identify_link', lambda links, name: calls.append(name) or
+                            TransparencyLinkResult(url=links[0]['href'], reasoning='Budget link'))
+        monkeypatch.setattr(discovery, '_save_link_identification',
+                            lambda *args, from_cache=False, **kwargs: saved.append(from_cache))
+
+        links = [{'text': 'Finance', 'href': 'https://a.org/finance'}]
+        results = [discovery._llm_identify_transparency_link(links, 'Adams', object(), object()) for _ in range(2)]
+        discovery._llm_identify_transparency_link(links, 'Baker', object(), object())
+
+        assert results[0] == results[1] == {'url': 'https://a.org/finance', 'reasoning': 'Budget link'}
+        assert calls == ['Adams', 'Baker'] and saved == [False, True, False]
+
+
+    def test_matching_template_reuses_pick(self, monkeypatch, tmp_path):
+        """Another homepage with the same navigation gets the same link, re-resolved on its own domain"""
+        from models.extraction_results import TransparencyLinkResult
+        from utils.disk_cache import DiskCache
+        from utils.semantic_cache import SemanticCache
+
+        calls = []
+        monkeypatch.setattr(discovery, '_link_cache', lambda: DiskCache(str(tmp_path / 'links.db')))
+        monkeypatch.setattr(discovery, '_template_cache', lambda: SemanticCache(str(tmp_path / 'templates.db')))
+        monkeypatch.setattr(discovery, 'llm_identify_link', lambda links, name: calls.append(name) or
+                            TransparencyLinkResult(url=links[0]['href'], reasoning='Finance page'))
+
+        nav = ['Home', 'About Us', 'Board of Education', 'Calendar', 'Departments', 'Enrollment', 'Food Service',
+               'Human Resources', 'Staff Directory', 'Athletics', 'Contact']
+        homepage = lambda domain, page_id: [{'text': 'Finance', 'href': f'https://{domain}/page/{page_id}'}] + [
+            {'text': text, 'href': f'https://{domain}/{i}'} for i, text in enumerate(nav)]
+
+        first = discovery._llm_identify_transparency_link(homepage('a.org', 11), 'Adams')
+        second = discovery._llm_identify_transparency_link(homepage('b.org', 97), 'Baker')
+        unrelated = discovery._llm_identify_transparency_link(
+            [{'text': 'Finance', 'href': 'https://c.org/f'}] + [{'text': f'Page {i}', 'href': f'https://c.org/{i}'}
+                                                                for i in range(12)], 'Carver')
+
+        assert first['url'] == 'https://a.org/page/11' and second['url'] == 'https://b.org/page/97'
+        assert calls == ['Adams', 'Carver'] and unrelated['url'] == 'https://c.org/f'
+
+
+class TestLinkRanking:
+    """Test the keyword ranking that trims the LLM's link list"""
+
+    def test_promising_links_first_and_capped(self):
+        """Keyword hits rank first, ties keep page order, the list is capped"""
+        filler = [{'text': f'Link {i}', 'href': f'https://a.org/{i}'} for i in range(30)]
+        finance = {'text': 'Finance', 'href': 'https://a.org/business-office'}
+        ranked = discovery._top_links(filler + [finance])
+        assert ranked[0] == finance
+        assert ranked[1:] == filler[:discovery._LLM_LINK_LIMIT - 1]
+
+
+class TestDomainMemo:
+    """Test that districts sharing a domain reuse one homepage decision per run"""
+
+    def test_same_domain_loaded_once(self, monkeypatch):
+        """Scheme, www. and trailing-slash variants share one load and LLM pick"""
+        peak = []
+        _patch_render(monkeypatch, [], peak)
+        first = discovery.find_transparency_link('a.k12.mi.us', 'Adams')
+        second = discovery.find_transparency_link('https://www.A.k12.mi.us/', 'Adams Elementary')
+        assert first == second and len(peak) == 1
+
+    def test_reuse_tracked_per_district(self, monkeypatch):
+        """A tracked reuse still records the district's homepage fetch and link pick"""
+        _patch_render(monkeypatch, [], [])
+        saved, identified = [], []
+        repo = type('Repo', (), {'create_page': lambda self, *args, **kwargs: args,
+                                 'save_page': lambda self, page: saved.append(page[0]) or page})()
+        monkeypatch.setattr(discovery, '_save_link_identification',
+                            lambda repo, page, links, url, reasoning, from_cache=False, **kwargs: identified.append(from_cache))
+
+        discovery.find_transparency_link('a.k12.mi.us', 'Adams', 1, repo)
+        discovery.find_transparency_link('a.k12.mi.us', 'Adams ISD', 2, repo)
+        assert saved == [1, 2] and identified == [False, True]
+
+    def test_llm_failure_not_reused(self, monkeypatch):
+        """A failed LLM pick is retried by the next district on the domain"""
+        _patch_render(monkeypatch, [], [])
+        calls = []
+        monkeypatch.setattr(discovery, '_pattern_match_transparency_link', lambda links: None)
+        monkeypatch.setattr(discovery, '_llm_identify_transparency_link', lambda links, *args: calls.append(1) or
+                            {'url': None, 'reasoning': 'LLM identification failed: rate limited'})
+        discovery.find_transparency_link('a.k12.mi.us')
+        discovery.find_transparency_link('a.k12.mi.us')
+        assert len(calls) == 2
@@ -0,0 +1,82 @@
+"""Tests for health plan extraction pre-checks and plan cleanup (LLM patched out)."""
+
+from types import SimpleNamespace
+
+from tasks import health_plan_extraction as extraction
+
+
+class TestPlanContentGate:
+    """Test the keyword gate in front of the LLM"""
+
+    def test_unrelated_page_skips_llm(self, monkeypatch):
+        """Pages without carriers or plan types never reach the LLM"""
+        monkeypatch.setattr(extraction, 'llm_extract_plans', lambda *args: (_ for _ in ()).throw(AssertionError('called')))
+        result = extraction.extract_health_plans('Varsity football schedule: home games Friday at 7pm. ' * 5, 'Adams')
+        assert result[0]['is_empty'] and result[0]['reasoning'] == 'No plan-related tokens in content'
+
+    def test_plan_words_match(self):
+        """Either a carrier or a plan type is enough to call the LLM"""
+        assert extraction._mentions_plans('Employees may enroll with Blue Cross')
+        assert extraction._mentions_plans('Dental coverage begins after 30 days')
+        assert not extraction._mentions_plans('Happy holidays from the Messages team')
+
+
+class TestStandardization:
+    """Test carrier and plan-type normalization"""
+
+    def test_provider_priority_and_fallback(self):
+        """Earlier carriers win, HAP only matches whole names, unknowns pass through stripped"""
+        standardize = extraction._standardize_provider_name
+        assert standardize('Blue Cross via MESSA') == 'MESSA'
+        assert standardize('bcbsm') == 'Blue Cross Blue Shield'
+        assert standardize('Health Priority') == 'Priority Health'
+        assert standardize('Health Alliance Plan') == 'HAP' and standardize('HAP Senior Plus') == 'HAP Senior Plus'
+        assert standardize(' Cigna ') == 'Cigna'
+
+    def test_plan_types(self):
+        """Plan types map to canonical labels in priority order"""
+        standardize = extraction._standardize_plan_type
+        assert [standardize(t) for t in ['health', 'Dental PPO', 'LTC', 'Term Life', ' Accident ']] == [
+            'Medical', 'Dental', 'Long-Term Care', 'Life Insurance', 'Accident']
+
+
+class TestRelevantText:
+    """Test that the LLM sees only the text around plan keywords"""
+
+    def test_llm_receives_filtered_text(self, monkeypatch):
+        sent = []
+        monkeypatch.setattr(extraction, 'llm_extract_plans', lambda text, name: sent.append(text) or
+                            type('Result', (), {'plans': [], 'reasoning': 'none'})())
+        boilerplate = 'Board policy section applies to all staff members and visitors. ' * 300
+        extraction.extract_health_plans(f'{boilerplate} Employees enroll in MESSA Choices. {boilerplate}', 'Adams')
+
+        assert len(sent) == 1 and 'MESSA Choices' in sent[0]
+        assert len(sent[0]) <= 2 * extraction.HEALTH_PLAN_WINDOW_CHARS + 100
+
+
+class TestPlanResults:
+    """Test the result of LLM plans after validation"""
+
+    _text = 'Employees enroll in MESSA Choices medical coverage through the district. ' * 3
+
+    def _run(self, monkeypatch, plans):
+        monkeypatch.setattr(extraction, 'llm_extract_plans', lambda text, name: SimpleNamespace(
+            plans=[SimpleNamespace(coverage_details=None, source_url=None, **p) for p in plans], reasoning='Found plans'))
+        return extraction.extract_health_plans(self._text, 'Adams')
+
+    def test_valid_plans_returned(self, monkeypatch):
+        result = self._run(monkeypatch, [
+            {'plan_name': 'Choices', 'provider': 'messa', 'plan_type': 'medical plan', 'is_empty': False},
+            {'plan_name': None, 'provider': 'Aetna', 'plan_type': 'Dental', 'is_empty': False},
+        ])
+        assert [(p['provider'], p['plan_type'], p['is_empty']) for p in result] == [
+            ('MESSA', 'Medical', False), ('Aetna', 'Dental', True)]
+
+    def test_only_invalid_plans_is_empty_result(self, monkeypatch):
+        result = self._run(monkeypatch, [{'plan_name': None, 'provider': None, 'plan_type': None, 'is_empty': False}])
+        assert len(result) == 1 and result[0]['is_empty'] and result[0]['reasoning'] == 'Found plans'
+
+    def test_empty_results_are_independent(self):
+        first, second = extraction._empty_result('a'), extraction._empty_result('b')
+        first[0]['plan_name'] = 'mutated'
+        assert second[0] == {**extraction._EMPTY_PLAN, 'reasoning': 'b'} and extraction._EMPTY_PLAN['plan_name'] is None
@@ -0,0 +1,134 @@
+"""Tests for the pipelined bulk health plan check."""
+
+import threading
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import workflows.health_plans as workflow
+
+_DISTRICTS = {1: 'Alpha', 2: 'Beta', 3: 'Gamma', 4: 'Delta'}
+
+
+class _FakeRepo:
+    get_district = lambda self, district_id: (
+        SimpleNamespace(id=district_id, name=_DISTRICTS[district_id], domain=f'd{district_id}.org')
+        if district_id in _DISTRICTS else None)
+
+
+@contextmanager
+def _transaction():
+    yield _FakeRepo()
+
+
+def _patch(monkeypatch, fetch_and_extract):
+    saved_on = []
+    monkeypatch.setattr(workflow.HealthPlanRepository, 'transaction', staticmethod(_transaction))
+    monkeypatch.setattr('utils.debug_logger.get_logger', lambda: SimpleNamespace(run_dir='logs'))
+    monkeypatch.setattr(workflow, 'discover_transparency_page', lambda repo, district: (
+        {'transparency_url': None, 'plans': [], 'status': 'no_link', 'error_message': None} if district.id == 3
+        else {'transparency_url': f'https://{district.domain}/t', 'plans': [], 'status': None, 'error_message': None}))
+    monkeypatch.setattr(workflow, 'fetch_and_extract_plans', fetch_and_extract)
+
+    def save(repo, district, url, extracted):
+        saved_on.append(threading.current_thread().name)
+        return {'transparency_url': url, 'plans': extracted['plans'], 'status': 'success', 'error_message': None}
+    monkeypatch.setattr(workflow, 'save_health_plans', save)
+    return saved_on
+
+
+def test_pipeline_keeps_order_and_overlaps_extraction(monkeypatch):
+    """Fetch/extract runs concurrently; saves happen on the calling thread in district order"""
+    barrier = threading.Barrier(2, timeout=5)
+
+    def fetch_and_extract(url, district_name):
+        if district_name in ('Alpha', 'Beta'):
+            barrier.wait()  # Deadlocks unless both districts are in flight at once
+        return {'plans': [{'provider': district_name}]}
+
+    saved_on = _patch(monkeypatch, fetch_and_extract)
+    results = workflow.run_bulk_health_plan_check([1, 2, 3, 4, 99], workers=2)
+
+    assert [r['district_id'] for r in results] == [1, 2, 3, 4, 99]
+    assert [r['status'] for r in results] == ['success', 'success', 'no_link', 'success', 'error']
+    assert [r['district_name'] for r in results] == ['Alpha', 'Beta', 'Gamma', 'Delta', 'Unknown']
+    assert results[1]['plans'] == [{'provider': 'Beta'}] and results[1]['plans_found'] == 1
+    assert set(saved_on) == {threading.current_thread().name}
+
+
+def test_worker_failure_is_isolated(monkeypatch):
+    """An exception in one district's fetch/extract becomes that district's error result"""
+    def fetch_and_extract(url, district_name):
+        if district_name == 'Beta':
+            raise RuntimeError('llm down')
+        return {'plans': []}
+
+    _patch(monkeypatch, fetch_and_extract)
+    results = workflow.run_bulk_health_plan_check([1, 2, 4], workers=3)
+
+    assert [r['status'] for r in results] == ['success', 'error', 'success']
+    assert results[1]['error_message'] == 'llm down'
+
+
+def test_shared_url_fetched_and_parsed_once(monkeypatch):
+    """Districts sharing a transparency URL reuse one fetch + parse within a run"""
+    import tasks.health_plan_processor as processor
+
+    fetches = []
+    monkeypatch.setattr(processor, '_URL_CONTENT_CACHE', processor.LRUCache(maxsize=4))
+    monkeypatch.setattr(processor, 'fetch_with_playwright', lambda url: fetches.append(url) or {
+        'url': url, 'html': '<p>MESSA Choices PPO</p>', 'content_type': 'html', 'status': 'success', 'error_message': None})
+    monkeypatch.setattr(processor, 'extract_health_plans', lambda text, district_name: [{'text': text}])
+
+    first = processor.fetch_and_extract_plans('https://messa.org/plans', 'Alpha')
+    second = processor.fetch_and_extract_plans('https://messa.org/plans', 'Beta')
+
+    assert fetches == ['https://messa.org/plans']
+    assert first['text_content'] == second['text_content'] and 'MESSA Choices PPO' in second['text_content']
+    assert second['plans'] == [{'text': second['text_content']}]
+
+
+def test_failed_fetch_not_memoized(monkeypatch):
+    """A failed fetch is retried by the next district with the same URL"""
+    import tasks.health_plan_processor as processor
+
+    fetches = []
+    monkeypatch.setattr(processor, '_URL_CONTENT_CACHE', processor.LRUCache(maxsize=4))
+    monkeypatch.setattr(processor, 'fetch_with_playwright', lambda url: fetches.append(url) or {
+        'url': url, 'html': None, 'content_type': 'html', 'status': 'timeout', 'error_message': 'timed out'})
+
+    assert processor.fetch_and_extract_plans('https://bcbsm.com/x', 'Alpha')['plans'] is None
+    processor.fetch_and_extract_plans('https://bcbsm.com/x', 'Beta')
+    assert len(fetches) == 2
+
+
+def test_deferred_writes_share_one_transaction(monkeypatch):
+    """defer_writes saves every district in one transaction after all fetch/extract work"""
+    _patch(monkeypatch, lambda url, district_name: {'plans': [{'provider': district_name}]})
+    repos = []
+    monkeypatch.setattr(workflow, 'save_health_plans', lambda repo, district, url, extracted: repos.append(repo) or {
+        'transparency_url': url, 'plans': extracted['plans'], 'status': 'success', 'error_message': None})
+
+    results = workflow.run_bulk_health_plan_check([1, 2, 3, 4], workers=2, defer_writes=True)
+
+    assert [r['status'] for r in results] == ['success', 'success', 'no_link', 'success']
+    assert [r['plans'] for r in results] == [[{'provider': 'Alpha'}], [{'provider': 'Beta'}], [], [{'provider': 'Delta'}]]
+    assert len(repos) == 3 and len(set(map(id, repos))) == 1
+
+
+def test_deferred_batch_failure_falls_back_per_district(monkeypatch, capsys):
+    """A failing save rolls back the batch; districts are then saved one transaction each, the failure logged once"""
+    _patch(monkeypatch, lambda url, district_name: {'plans': []})
+    attempts = []
+
+    def save(repo, district, url, extracted):
+        attempts.append(district.name)
+        if district.name == 'Beta':
+            raise RuntimeError('constraint failed')
+        return {'transparency_url': url, 'plans': [], 'status': 'success', 'error_message': None}
+    monkeypatch.setattr(workflow, 'save_health_plans', save)
+
+    results = workflow.run_bulk_health_plan_check([1, 2, 4], workers=2, defer_writes=True)
+
+    assert attempts == ['Alpha', 'Beta', 'Alpha', 'Beta', 'Delta']
+    assert [r['status'] for r in results] == ['success', 'error', 'success']
+    assert capsys.readouterr().out.count('constraint failed') == 1
@@ -5,6 +5,7 @@ Usage:
     python test_health_plans.py              # Test single district (ID 1)
     python test_health_plans.py 5            # Test specific district
     python test_health_plans.py 1 2 3 4 5   # Test multiple districts
+    python test_health_plans.py --parallel 8 1 2 3 4 5   # Fetch/extract up to 8 districts at once
 """
 
 import sys
@@ -17,8 +18,20 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from dotenv import load_dotenv
 load_dotenv()
 
-from models.database import init_db
-from workflows.health_plans import extract_district_health_plans, run_bulk_health_plan_check
+from config import HEALTH_PLAN_PIPELINE_WORKERS
+
+
+# Plan fields printed only when set: (label, key)
+_OPTIONAL_PLAN_FIELDS = (('Details', 'coverage_details'), ('Empty', 'is_empty'), ('Reasoning', 'reasoning'))
+
+
+def _format_plan(plan):
+    """One plan's detail block as a single string (one write per plan)"""
+    get = plan.get
+    lines = [f"\n  Plan: {get('plan_name', 'N/A')}", f"  Provider: {get('provider', 'N/A')}",
+             f"  Type: {get('plan_type', 'N/A')}"]
+    lines += [f"  {label}: {value}" for label, key in _OPTIONAL_PLAN_FIELDS if (value := get(key))]
+    return '\n'.join(lines)
 
 
 def main():
@@ -28,21 +41,27 @@ def main():
     print("HEALTH PLAN EXTRACTION TEST")
     print("=" * 60)
     
-    # Parse district IDs from command line
-    if len(sys.argv) > 1:
-        try:
-            district_ids = [int(arg) for arg in sys.argv[1:]]
-        except ValueError:
-            print("Error: All arguments must be district IDs (integers)")
-            print("Usage: python test_health_plans.py [district_id1] [district_id2] ...")
-            sys.exit(1)
-    else:
-        # Default to district 1
-        district_ids = [1]
+    # Parse --parallel N and district IDs from command line
+    args = sys.argv[1:]
+    try:
+        workers = HEALTH_PLAN_PIPELINE_WORKERS
+        if '--parallel' in args:
+            flag = args.index('--parallel')
+            workers = int(args[flag + 1])
+            args = args[:flag] + args[flag + 2:]
+        district_ids = [int(arg) for arg in args] or [1]  # Default to district 1
+    except (ValueError, IndexError):
+        print("Error: All arguments must be district IDs (integers); --parallel takes a worker count")
+        print("Usage: python test_health_plans.py [--parallel N] [district_id1] [district_id2] ...")
+        sys.exit(1)
     
     print(f"\nTesting {len(district_ids)} district(s): {district_ids}")
     print("=" * 60 + "\n")
     
+    # Heavy imports (SQLAlchemy, workflows, LLM client) only once the arguments are valid
+    from models.database import init_db
+    from workflows.health_plans import extract_district_health_plans, run_bulk_health_plan_check
+
     # Initialize database
     init_db()
     
@@ -61,18 +80,11 @@ def main():
         if result['plans']:
             print("\nExtracted Plans:")
             for plan in result['plans']:
-                print(f"\n  Plan: {plan.get('plan_name', 'N/A')}")
-                print(f"  Provider: {plan.get('provider', 'N/A')}")
-                print(f"  Type: {plan.get('plan_type', 'N/A')}")
-                if plan.get('coverage_details'):
-                    print(f"  Details: {plan['coverage_details']}")
-                if plan.get('is_empty'):
-                    print(f"  Empty: {plan['is_empty']}")
-                if plan.get('reasoning'):
-                    print(f"  Reasoning: {plan['reasoning']}")
+                print(_format_plan(plan))
         print("=" * 60)
     else:
-        results = run_bulk_health_plan_check(district_ids)
+        # One commit for the whole run; a failed batch falls back to per-district saves
+        results = run_bulk_health_plan_check(district_ids, workers=workers, defer_writes=True)
         
         # Print detailed results for districts with plans
         print("\n" + "=" * 60)
@@ -0,0 +1,27 @@
+"""Tests for HTML compression."""
+
+import re
+
+from utils.html_compressor import compress_html
+
+
+def _reference(html):
+    """The original three-pass regex compression"""
+    html = re.sub(r'<!--.*?-->', '', html, flags=re.DOTALL)
+    return re.sub(r'>\s+<', '><', re.sub(r'\s+', ' ', html)).strip()
+
+
+def test_matches_regex_passes():
+    """Comments, whitespace runs (including Unicode spaces) and inter-tag gaps are handled as before"""
+    samples = [
+        '<html>\n  <body>\n    <p>Jane   Smith</p>\n  </body>\n</html>',
+        'a <!-- x --> b', 'x> <!--c--> <y', '<!--a--><!--b-->', 'a<!--x-->b',
+        '<!-- unterminated < b', '>\n<!--\nmulti\nline\n-->\n<', ' > < <> <',
+        '<td> Plan A　</td>\x1c<td>', '   ', '\t<p>\r\n</p>\f',
+    ]
+    for html in samples:
+        assert compress_html(html) == _reference(html), repr(html)
+
+
+def test_empty_input_returned_as_is():
+    assert compress_html('') == '' and compress_html(None) is None
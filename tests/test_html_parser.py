@@ -0,0 +1,112 @@
+"""Tests for the HTML-to-text parsers."""
+
+from utils.html_parser import stream_html_links, url_resolver
+
+_PAGE = (b'<html><head><title>Staff</title><script>track()</script></head><body>'
+         b'<nav>Home | About</nav>'
+         b'<h2>Superintendent <a href="mailto:jane@adams.k12.mi.us">Jane Smith</a></h2>'
+         b'<p>Welcome to <b>Adams</b> schools</p>'
+         b'<ul><li>Office</li><li><a href="tel:555-123-4567">Call us</a></li></ul>'
+         b'</body></html>')
+
+
+class TestStreamHtmlLinks:
+    """Test streamed anchor collection"""
+
+    def test_anchors_collected_in_order(self):
+        """Nav links count, hrefs resolve, image alts are captured, chunking is irrelevant"""
+        page = _PAGE.replace(b'<nav>Home | About</nav>', b'<nav><a href="/budget">Budget <b>Transparency</b></a></nav>'
+                             b'<a href="/logo"><img src="l.png" alt="Logo"></a>')
+        chunks = [page[i:i + 5] for i in range(0, len(page), 5)]
+        links = stream_html_links(chunks, 'https://adams.org/')
+        assert links == stream_html_links([page], 'https://adams.org/')
+        assert [(l['text'], l['alt'], l['href']) for l in links[:2]] == [
+            ('Budget Transparency', '', 'https://adams.org/budget'), ('', 'Logo', 'https://adams.org/logo')]
+        assert links[2]['raw_href'] == 'mailto:jane@adams.k12.mi.us'
+
+    def test_bounded_links(self):
+        """Collection stops at max_links"""
+        assert len(stream_html_links([_PAGE] * 20, 'https://adams.org/', max_links=3)) == 3
+
+
+def test_url_resolver_matches_urljoin():
+    """Fast paths resolve exactly as urljoin would"""
+    from urllib.parse import urljoin
+    base = 'https://adams.org/district/about'
+    resolve = url_resolver(base)
+    for href in ['/budget', 'https://b.org/x', '//cdn.org/a.js', 'plan.pdf', '../up', '?q=1', '#top', 'mailto:a@b.org', '']:
+        assert resolve(href) == urljoin(base, href)
+
+
+def test_parse_html_to_text_memoized():
+    """Re-parsing the same page with the same options is served from the cache"""
+    from utils.html_parser import parse_html_to_text
+
+    html = '<html><body><h2>Administration</h2><p>Superintendent Jane Smith</p></body></html>'
+    parse_html_to_text.cache_clear()
+    first = parse_html_to_text(html)
+    assert parse_html_to_text(html) is first and parse_html_to_text.cache_info().hits == 1
+    assert parse_html_to_text(html, preserve_document_links=True) == first
+    assert parse_html_to_text.cache_info().misses == 2
+
+
+def test_parse_html_to_text_structure():
+    """Headings, contact and document links, list items and table rows survive; chrome and comments do not"""
+    from utils.html_parser import parse_html_to_text
+
+    html = ('<html><body><header>Top</header><!-- hidden --><h2>Superintendent<br>'
+            '<a href="mailto:jane@adams.org">Jane Smith</a></h2><p>Call <a href="tel:555-1234">the office</a></p>'
+            '<ul><li>Budget <a href="docs/budget.pdf">Budget PDF</a></li><li>Plain</li></ul>'
+            '<table><tr><th>Role</th><td>Name</td></tr><tr><td>Supt</td><td>Jane</td></tr></table>'
+            '<script>x()</script></body></html>')
+    text = parse_html_to_text(html, preserve_document_links=True, base_url='https://adams.org/t/')
+    assert text.startswith('## Superintendent   Jane Smith (Email: jane@adams.org) Call the office (Phone: 555-1234)')
+    assert '• Budget Budget PDF (URL: https://adams.org/t/docs/budget.pdf) • Plain' in text
+    assert text.endswith('Role | Name Supt | Jane')
+    assert not any(chrome in text for chrome in ('Top', 'hidden', 'x()'))
+
+
+def test_parse_xml_feed_to_text():
+    """Sitemaps are read as XML, down to their text"""
+    from utils.html_parser import parse_html_to_text
+
+    sitemap = ('<?xml version="1.0"?><urlset><url><loc>https://a.org/x</loc></url>'
+               '<url><loc>https://a.org/y</loc></url></urlset>')
+    assert parse_html_to_text(sitemap) == 'https://a.org/x https://a.org/y'
+
+
+def test_parse_deeply_nested_html():
+    """Nesting far past the recursion limit still parses (the tree walk keeps its own stack)"""
+    from utils.html_parser import parse_html_to_text
+
+    html = '<div>' * 5000 + '<p>Jane Smith</p><ul><li>' + '<span>' * 5000 + 'Budget</li></ul>' + '</div>' * 5000
+    assert parse_html_to_text(html) == 'Jane Smith  • Budget'
+
+
+def test_join_sections_truncates():
+    """Sections are '---'-separated with blank lines between lines; long text is cut at MAX_TEXT_LENGTH"""
+    from config import MAX_TEXT_LENGTH
+    from utils.html_parser import _join_sections
+
+    assert _join_sections(['## A  \n\n b', ' c ']) == '## A\n\nb\n\n---\n\nc'
+    text = _join_sections(['x' * 100] * (MAX_TEXT_LENGTH // 50))
+    assert text.endswith('\n\n[Text truncated...]')
+    assert len(text) == MAX_TEXT_LENGTH + len('\n\n[Text truncated...]')
+
+
+def test_tree_walk_stops_once_text_overflows(monkeypatch):
+    """Nodes past MAX_TEXT_LENGTH are never walked, and the text matches the truncated full walk"""
+    from selectolax.lexbor import LexborHTMLParser
+    from utils import html_parser
+
+    limit = html_parser.MAX_TEXT_LENGTH
+    count = limit // 5
+    html = ''.join(f'<h2>Item {i}</h2><p>text</p>' for i in range(count))
+    assert len(html_parser._tree_sections(LexborHTMLParser(html).body, False, None)) < count
+    text = html_parser.parse_html_to_text.__wrapped__(html)
+
+    # Unbounded walk of the same page, truncated afterwards
+    monkeypatch.setattr(html_parser, 'MAX_TEXT_LENGTH', 10 ** 9)
+    full = html_parser.parse_html_to_text.__wrapped__(html)
+    assert len(full) > limit and len(text) == limit + len('\n\n[Text truncated...]')
+    assert text.startswith(full[:limit]) and text.endswith('\n\n[Text truncated...]')
@@ -0,0 +1,114 @@
+"""Tests for LLMClient prompt rendering (no API calls)."""
+
+from utils.llm_client import LLMClient
+
+_VARIABLES = {
+    'superintendent_extraction': {'text': 'Superintendent Jane Smith', 'district_name': 'Adams'},
+    'health_plan_extraction': {'text': 'Blue Cross PPO', 'district_name': 'Adams'},
+    'url_filtering': {'urls': ['https://a.org/staff'], 'district_name': 'Adams'},
+    'link_identification': {'links': [{'text': 'Transparency', 'href': '/budget'}], 'district_name': None},
+}
+
+
+class TestPromptRendering:
+    """Test cached system prompts match a full template render"""
+
+    def test_matches_full_render(self):
+        """Split-once rendering produces the same prompts as rendering the whole file"""
+        client = LLMClient()
+        for name, variables in _VARIABLES.items():
+            full = client.split_prompts(client.env.get_template(f'{name}.txt').render(**variables))
+            assert client.render_prompts(name, **variables) == full
+
+    def test_system_prompt_reused(self):
+        """The same system prompt object is sent on every call"""
+        client = LLMClient()
+        first, _ = client.render_prompts('superintendent_extraction', text='a', district_name='A')
+        second, _ = client.render_prompts('superintendent_extraction', text='b', district_name='B')
+        assert first is second
+
+    def test_variables_trail_static_text(self):
+        """User prompts open with the fixed instruction, so the shared prefix runs past the system prompt"""
+        client = LLMClient()
+        for name, variables in _VARIABLES.items():
+            other = {key: ['https://b.org/x'] if isinstance(value, list) and name == 'url_filtering'
+                     else [{'text': 'Budget', 'href': '/b'}] if isinstance(value, list) else 'Other'
+                     for key, value in variables.items()}
+            first, second = client.render_prompts(name, **variables)[1], client.render_prompts(name, **other)[1]
+            assert first.splitlines()[0] == second.splitlines()[0] != ''
+
+    def test_plain_templates_skip_jinja(self):
+        """Slot-only user templates are partially evaluated; loops and conditionals keep Jinja"""
+        from utils.llm_client import _SlotTemplate
+
+        client = LLMClient()
+        kinds = {name: type(client._prompt_template(name)[1]) for name in _VARIABLES}
+        assert kinds['superintendent_extraction'] is kinds['health_plan_extraction'] is _SlotTemplate
+        assert _SlotTemplate not in (kinds['url_filtering'], kinds['link_identification'])
+        source = 'District: {{ district_name }}\n{{text}} / {{ missing }}.'
+        assert (_SlotTemplate(source).render(district_name=None, text=7)
+                == client.env.from_string(source).render(district_name=None, text=7))
+
+    def test_usage_accumulates(self):
+        """Token usage sums across calls, including cached prompt tokens"""
+        client = LLMClient()
+        client._record_usage(100, 80, 10)
+        client._record_usage(50, None, 5)
+        assert dict(client.usage) == {'prompt': 150, 'cached_prompt': 80, 'completion': 15}
+
+
+class TestCallMany:
+    """Test concurrent batch calls (call() patched out)"""
+
+    def test_order_errors_and_concurrency(self, monkeypatch):
+        """Results keep input order, failures come back in place, calls overlap"""
+        import time
+        import threading
+
+        client = LLMClient()
+        active, peak, lock = [0], [0], threading.Lock()
+
+        def call(template_name, response_model, text, district_name):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            if text == 'bad': raise ValueError('bad page')
+            return f'{district_name}:{text}'
+        monkeypatch.setattr(client, 'call', call)
+
+        texts = ['a', 'bad', 'c', 'd', 'e']
+        results = client.call_many('superintendent_extraction', None,
+                                   [{'text': t, 'district_name': 'A'} for t in texts], concurrency=3)
+        assert results[0] == 'A:a' and results[2:] == ['A:c', 'A:d', 'A:e']
+        assert isinstance(results[1], ValueError)
+        assert peak[0] == 3
+        assert client.call_many('superintendent_extraction', None, []) == []
+
+    def test_iter_many_yields_before_batch_finishes(self, monkeypatch):
+        """The first result is handed over while a slower later call is still running"""
+        import threading
+
+        client = LLMClient()
+        release = threading.Event()
+        monkeypatch.setattr(client, 'call', lambda template_name, response_model, text:
+                            text if text == 'fast' else release.wait(5) and text)
+
+        results = client.iter_many('t', None, [{'text': 'fast'}, {'text': 'slow'}])
+        assert next(results) == 'fast' and not release.is_set()
+        release.set()
+        assert list(results) == ['slow']
+
+    def test_costly_bin_starts_first(self, monkeypatch):
+        """With costs, the longest bin is submitted first; results still keep input order"""
+        client = LLMClient()
+        started = []
+        monkeypatch.setattr(client, 'call', lambda template_name, response_model, text: started.append(text) or text)
+
+        texts = ['short', 'x' * 7000, 'mid' * 1000, 'tiny', 'y' * 9000]
+        results = client.call_many('t', None, [{'text': t} for t in texts], concurrency=1,
+                                   costs=[len(t) for t in texts])
+        assert results == texts
+        assert started == [texts[1], texts[4], texts[2], texts[0], texts[3]]
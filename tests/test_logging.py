@@ -0,0 +1,27 @@
+"""Tests for the queue-backed logger"""
+import logging
+
+from utils import logging as log_utils
+
+
+class _Collect(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_records_reach_listener(monkeypatch):
+    """Records logged from any module are written by the shared listener"""
+    collector = _Collect()
+    monkeypatch.setattr(log_utils._LISTENER, 'handlers', (collector,))
+
+    logger = log_utils.get_queue_logger('tests.queue_logger')
+    assert log_utils.get_queue_logger('tests.queue_logger') is logger and len(logger.handlers) == 1
+    logger.info("[TEST] %d links", 3)
+
+    log_utils._LISTENER.stop()  # drains the queue
+    log_utils._LISTENER.start()
+    assert collector.messages == ['[TEST] 3 links']
@@ -3,7 +3,9 @@ Fast iteration test for HTML PDF link extraction.
 Copies parsed output to clipboard for quick inspection.
 """
 
+import re
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Add parent directory to path
@@ -13,10 +15,8 @@ from utils.html_parser import parse_html_to_text
 import pyperclip  # pip install pyperclip
 
 
-def test_pdf_links():
-    """Test PDF link extraction from transparency page."""
-    
-    html = """
+# Built once at import rather than on every call
+_TRANSPARENCY_HTML = """
     <html>
     <body>
         <div class="transparency-section">
@@ -65,8 +65,26 @@ def test_pdf_links():
     </body>
     </html>
     """
-    
-    base_url = "https://example.misd.net/transparency"
+
+_BASE_URL = "https://example.misd.net/transparency"
+
+_EXPECTED_LINKS = [
+    "Medical_Plan_BCBS_1500_3000_Info_Support_Staff.pdf",
+    "Medical_Plan_BCBS_3000_6000_Support_Staff.pdf",
+    "Medical_Plan_BCBS_3000_6000_Info_Support_Staff.pdf",
+    "Vision_Admin.pdf",
+    "Dental_Plan_Info.pdf"
+]
+
+# All expected links found in one scan of the output: the lookahead tries every
+# position, so links that overlap or sit inside one another are each reported
+# (only a link that is a prefix of another at the same spot would be masked)
+_EXPECTED_LINK_RE = re.compile('(?=(%s))' % '|'.join(
+    map(re.escape, sorted(_EXPECTED_LINKS, key=len, reverse=True))))
+
+
+def test_pdf_links():
+    """Test PDF link extraction from transparency page."""
     
     print("=" * 60)
     print("PDF LINK EXTRACTION TEST")
@@ -75,47 +93,32 @@ def test_pdf_links():
     # Test WITHOUT preserve_document_links
     print("\n1. WITHOUT preserve_document_links:")
     print("-" * 60)
-    result1 = parse_html_to_text(html, preserve_document_links=False)
+    result1 = parse_html_to_text(_TRANSPARENCY_HTML, preserve_document_links=False)
     print(result1)
     
     # Test WITH preserve_document_links
     print("\n\n2. WITH preserve_document_links:")
     print("-" * 60)
-    result2 = parse_html_to_text(html, preserve_document_links=True, base_url=base_url)
+    result2 = parse_html_to_text(_TRANSPARENCY_HTML, preserve_document_links=True, base_url=_BASE_URL)
     print(result2)
     
-    # Copy to clipboard
-    try:
-        pyperclip.copy(result2)
-        print("\n✓ Parsed output copied to clipboard!")
-    except Exception as e:
-        print(f"\n✗ Failed to copy to clipboard: {e}")
+    # Copy to clipboard in the background (spawns xclip/pbcopy) while verification runs
+    clip_pool = ThreadPoolExecutor(max_workers=1)
+    clip = clip_pool.submit(pyperclip.copy, result2)
+    clip_pool.shutdown(wait=False)
     
     # Verification
     print("\n" + "=" * 60)
     print("VERIFICATION")
     print("=" * 60)
     
-    expected_links = [
-        "Medical_Plan_BCBS_1500_3000_Info_Support_Staff.pdf",
-        "Medical_Plan_BCBS_3000_6000_Support_Staff.pdf",
-        "Medical_Plan_BCBS_3000_6000_Info_Support_Staff.pdf",
-        "Vision_Admin.pdf",
-        "Dental_Plan_Info.pdf"
-    ]
-    
-    found = 0
-    missing = []
+    found_set = set(_EXPECTED_LINK_RE.findall(result2))
+    missing = [link for link in _EXPECTED_LINKS if link not in found_set]
     
-    for link in expected_links:
-        if link in result2:
-            found += 1
-            print(f"✓ Found: {link}")
-        else:
-            missing.append(link)
-            print(f"✗ Missing: {link}")
+    for link in _EXPECTED_LINKS:
+        print(f"✓ Found: {link}" if link in found_set else f"✗ Missing: {link}")
     
-    print(f"\n{found}/{len(expected_links)} PDF links extracted")
+    print(f"\n{len(_EXPECTED_LINKS) - len(missing)}/{len(_EXPECTED_LINKS)} PDF links extracted")
     
     if missing:
         print("\nMissing links:")
@@ -127,6 +130,12 @@ def test_pdf_links():
         print("\n✓ URLs converted to absolute")
     else:
         print("\n✗ URLs still relative (not converted to absolute)")
+    
+    try:
+        clip.result(timeout=2)
+        print("\n✓ Parsed output copied to clipboard!")
+    except Exception as e:
+        print(f"\n✗ Failed to copy to clipboard: {e}")
 
 
 if __name__ == "__main__":
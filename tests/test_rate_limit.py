@@ -0,0 +1,43 @@
+"""Tests for the token-bucket rate limiter."""
+
+import asyncio
+
+from utils.rate_limit import TokenBucket, per_minute
+
+
+class TestTokenBucket:
+    """Test burst capacity and pacing"""
+
+    def test_burst_up_to_capacity_is_free(self):
+        """Calls within capacity never wait"""
+        bucket = TokenBucket(rate_per_sec=1, capacity=3)
+        assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+
+    def test_deficit_is_paced(self):
+        """Once empty, queued reservations wait progressively longer"""
+        bucket = TokenBucket(rate_per_sec=100, capacity=1)
+        assert bucket._reserve(1) == 0.0
+        assert 0.009 < bucket._reserve(1) <= 0.01
+        assert 0.019 < bucket._reserve(1) <= 0.02
+
+    def test_oversized_request_capped_at_capacity(self):
+        """A request larger than capacity drains the bucket instead of deadlocking"""
+        bucket = TokenBucket(rate_per_sec=1000, capacity=10)
+        assert bucket.acquire(500) == 0.0
+        assert bucket.acquire(10) <= 0.01
+
+    def test_async_acquire(self):
+        """aacquire paces like acquire without blocking the loop"""
+        bucket = TokenBucket(rate_per_sec=100, capacity=1)
+        delays = asyncio.run(_gather(bucket, 3))
+        assert delays[0] == 0.0 and delays[-1] > delays[1] > 0
+
+    def test_per_minute(self):
+        """per_minute converts an RPM/TPM limit to a bucket"""
+        bucket = per_minute(30)
+        assert bucket.rate == 0.5 and bucket.capacity == 30
+
+
+async def _gather(bucket, n):
+    """Acquire n tokens concurrently"""
+    return await asyncio.gather(*[bucket.aacquire() for _ in range(n)])
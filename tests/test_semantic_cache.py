@@ -0,0 +1,33 @@
+"""Tests for the near-duplicate document cache."""
+
+import random
+
+from utils.semantic_cache import SemanticCache, simhash
+
+_VOCABULARY = ('MESSA Choices PPO Essentials HMO Blue Cross Priority Health medical dental vision deductible '
+               'copay coinsurance premium employee spouse family coverage network annual maximum plan tier').split()
+_DOC = ' '.join(random.Random(7).choice(_VOCABULARY) for _ in range(800))
+
+
+class TestSemanticCache:
+    """Test exact, near-duplicate, and unrelated lookups"""
+
+    def test_exact_and_near_duplicate_hit(self, tmp_path):
+        """Identical and lightly edited documents return the stored value"""
+        cache = SemanticCache(tmp_path / 'plans.db')
+        cache.set(_DOC, {'plans': [{'plan_name': 'Choices'}]})
+
+        assert cache.get(_DOC) == {'plans': [{'plan_name': 'Choices'}]}
+        assert cache.get(_DOC.replace('deductible', 'deductibles', 1)) == {'plans': [{'plan_name': 'Choices'}]}
+
+    def test_unrelated_miss(self, tmp_path):
+        """A different document misses"""
+        cache = SemanticCache(tmp_path / 'plans.db')
+        cache.set(_DOC, {'plans': []})
+        assert cache.get('Varsity football schedule: home games Friday at 7pm against Baker High. ' * 20) is None
+
+    def test_persists_and_fingerprint_is_stable(self, tmp_path):
+        """Entries survive a reopen; fingerprints are deterministic 64-bit values"""
+        SemanticCache(tmp_path / 'plans.db').set(_DOC, {'plans': [1]})
+        assert SemanticCache(tmp_path / 'plans.db').get(_DOC) == {'plans': [1]}
+        assert simhash(_DOC) == simhash(_DOC) < 1 << 64
@@ -0,0 +1,21 @@
+"""Tests for the superintendent workflow summary."""
+
+from types import SimpleNamespace
+
+from models.enums import WorkflowMode
+from tasks.summary import build_summary
+
+_contact = lambda name=None: SimpleNamespace(name=name, email=None, title=None)
+
+
+def test_counts():
+    """Fetch errors, empty contacts, and real contacts are each counted once"""
+    results = [
+        {'fetch_result': {'status': 'success'}, 'contact': _contact('Jane Smith')},
+        {'fetch_result': {'status': 'success'}, 'contact': _contact()},
+        {'fetch_result': {'status': 'timeout'}, 'contact': None},
+        {'fetch_result': {'status': 'error'}},
+    ]
+    summary = build_summary(7, WorkflowMode.DISCOVERY, results)
+    assert summary == {'district_id': 7, 'mode': 'discovery', 'urls_checked': 4, 'pages_fetched': 4,
+                       'successful_extractions': 1, 'empty_extractions': 1, 'errors': 2}
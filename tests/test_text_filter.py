@@ -0,0 +1,37 @@
+"""Tests for keyword-window text filtering."""
+
+import re
+
+from utils.text_filter import extract_relevant_windows
+
+_PATTERN = re.compile(r'\b(?:messa|dental)\b', re.IGNORECASE)
+_filler = lambda word, count: ' '.join([word] * count)
+
+
+class TestExtractRelevantWindows:
+    """Test window selection, merging, and the size cap"""
+
+    def test_keeps_only_text_near_matches(self):
+        """Boilerplate far from any keyword is dropped; windows are joined in order"""
+        text = f"{_filler('intro', 100)} MESSA Choices plan {_filler('legal', 200)} Delta Dental {_filler('outro', 100)}"
+        result = extract_relevant_windows(text, _PATTERN, window=20)
+        first, second = result.split('\n...\n')
+        assert 'MESSA Choices plan' in first and 'legal legal' in first and 'Dental' not in first
+        assert 'Delta Dental' in second
+        assert len(result) < 200
+
+    def test_windows_never_split_words_or_urls(self):
+        """Window edges widen to the nearest whitespace"""
+        text = f"{_filler('x', 50)} summaryinfo MESSA https://example.org/benefits/messa-summary.pdf {_filler('y', 50)}"
+        result = extract_relevant_windows(text, _PATTERN, window=8)
+        assert result.split()[0] == 'summaryinfo'
+        assert 'https://example.org/benefits/messa-summary.pdf' in result
+
+    def test_overlapping_windows_merge(self):
+        result = extract_relevant_windows('MESSA dental and MESSA vision', _PATTERN, window=10)
+        assert result == 'MESSA dental and MESSA vision'
+
+    def test_max_chars_and_no_match(self):
+        text = ' '.join(f'MESSA plan {i}' for i in range(500))
+        assert len(extract_relevant_windows(text, _PATTERN, window=50, max_chars=300)) == 300
+        assert extract_relevant_windows('Varsity football schedule', _PATTERN) == ''
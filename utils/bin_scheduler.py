@@ -0,0 +1,20 @@
+"""
+Cost-binned scheduling for concurrent LLM batches.
+
+With a fixed number of requests in flight, a batch finishes when its slowest
+call does. Starting the predicted-longest calls first (by coarse bin, so
+similar-cost calls run together) keeps one long call from starting last and
+dragging out the whole batch.
+"""
+from bisect import bisect_right
+from typing import List, Sequence
+
+# Cost bin edges (prompt characters): short < 2000 <= medium < 6000 <= long
+DEFAULT_BIN_EDGES = (2000, 6000)
+
+cost_bin = lambda cost, edges=DEFAULT_BIN_EDGES: bisect_right(edges, cost)
+
+
+def bin_order(costs: Sequence[float], edges: Sequence[float] = DEFAULT_BIN_EDGES) -> List[int]:
+    """Indices grouped by cost bin, longest bin first; input order is kept within a bin"""
+    return sorted(range(len(costs)), key=lambda i: -cost_bin(costs[i], edges))
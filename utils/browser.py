@@ -0,0 +1,194 @@
+"""
+Process-wide shared Chromium browser.
+
+Launching a browser costs seconds; opening a context costs milliseconds. One
+browser is launched lazily and every render gets a fresh, isolated context
+(or, inside abrowser_session, a page on the batch's shared context).
+
+Playwright objects are bound to the event loop that created them, so the
+driver lives on a dedicated daemon thread with its own loop. Sync callers
+(any thread) and async callers (any loop) submit work to it and wait on the
+result, which makes the shared browser safe to use from anywhere.
+
+Images, fonts, media, and stylesheets are blocked outright (they never
+affect extracted text or links); scripts are served from an on-disk cache
+(honoring Cache-Control) so repeat renders skip re-downloading them.
+"""
+import re
+import time
+import atexit
+import asyncio
+import threading
+from functools import lru_cache
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright
+from config import (
+    REQUEST_TIMEOUT, USER_AGENT,
+    CACHE_BROWSER_ASSETS, BROWSER_CACHE_PATH, BROWSER_CACHE_DEFAULT_TTL
+)
+from utils.disk_cache import DiskCache, content_key
+
+_STATE = {'loop': None, 'playwright': None, 'browser': None, 'lock': None}
+_START_LOCK = threading.Lock()
+
+
+def _browser_loop() -> asyncio.AbstractEventLoop:
+    """Get or start the event loop thread that owns the Playwright driver"""
+    with _START_LOCK:
+        if _STATE['loop'] is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='playwright-browser', daemon=True).start()
+            _STATE['loop'] = loop
+    return _STATE['loop']
+
+_submit = lambda coro: asyncio.run_coroutine_threadsafe(coro, _browser_loop())
+
+
+async def _get_browser():
+    """Launch Chromium on first use (or after a crash); runs on the browser loop"""
+    _STATE['lock'] = _STATE['lock'] or asyncio.Lock()
+    async with _STATE['lock']:
+        if _STATE['browser'] is None or not _STATE['browser'].is_connected():
+            _STATE['playwright'] = _STATE['playwright'] or await async_playwright().start()
+            _STATE['browser'] = await _STATE['playwright'].chromium.launch(headless=True)
+    return _STATE['browser']
+
+
+# Request routing: block heavy resources, cache scripts, never cache documents we extract from
+_asset_cache = lru_cache(maxsize=1)(lambda: DiskCache(BROWSER_CACHE_PATH))
+_BLOCKED_TYPES = frozenset(['image', 'font', 'media', 'stylesheet'])
+_CACHEABLE_TYPES = frozenset(['script'])
+_MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+_UNCACHEABLE_DIRECTIVES = ('no-store', 'no-cache', 'private')
+_DROPPED_HEADERS = frozenset(['content-encoding', 'content-length', 'transfer-encoding'])
+
+def _cache_ttl(headers: dict) -> int:
+    """Seconds a response may be reused per its Cache-Control header (0 = don't cache)"""
+    cache_control = headers.get('cache-control', '').lower()
+    if any(directive in cache_control for directive in _UNCACHEABLE_DIRECTIVES): return 0
+    max_age = _MAX_AGE_RE.search(cache_control)
+    return int(max_age.group(1)) if max_age else BROWSER_CACHE_DEFAULT_TTL
+
+
+async def _route(route):
+    """Abort blocked resource types; serve cacheable GETs from disk, otherwise fetch and persist them"""
+    request = route.request
+    if request.resource_type in _BLOCKED_TYPES:
+        return await route.abort()
+    if not CACHE_BROWSER_ASSETS or request.method != 'GET' or request.resource_type not in _CACHEABLE_TYPES:
+        return await route.continue_()
+
+    key = content_key('asset', request.url)
+    hit = _asset_cache().get_blob(key)
+    if hit and hit[0]['expires'] > time.time():
+        return await route.fulfill(status=hit[0]['status'], headers=hit[0]['headers'], body=hit[1])
+
+    try:
+        response = await route.fetch()
+        body = await response.body()
+    except Exception:
+        return await route.abort()
+
+    ttl = _cache_ttl(response.headers) if response.ok else 0
+    if ttl:
+        headers = {name: value for name, value in response.headers.items() if name not in _DROPPED_HEADERS}
+        _asset_cache().set_blob(key, {'status': response.status, 'headers': headers, 'expires': time.time() + ttl}, body)
+    await route.fulfill(response=response, body=body)
+
+
+# Anchors as {text, alt, raw_href, href} collected in-page (href is already absolute),
+# so only the link list crosses the Playwright IPC instead of the whole DOM
+_LINKS_JS = """() => Array.from(document.querySelectorAll('a[href]'), a => {
+    const img = a.querySelector('img[alt]');
+    return {text: a.textContent.replace(/\\s+/g, ' ').trim(), alt: img ? img.getAttribute('alt') : '',
+            raw_href: a.getAttribute('href'), href: a.href};
+})"""
+
+
+async def _new_context():
+    """Open a routed context on the shared browser"""
+    context = await (await _get_browser()).new_context(user_agent=USER_AGENT, ignore_https_errors=True)
+    await context.route('**/*', _route)
+    return context
+
+
+class BrowserSession:
+    """One context shared by a batch of renders: opened on first render, pages closed per render"""
+
+    def __init__(self):
+        self._context = None
+        self._lock = None
+
+    async def _get_context(self):
+        """Open the context on first use; runs on the browser loop"""
+        self._lock = self._lock or asyncio.Lock()
+        async with self._lock:
+            if self._context is None:
+                self._context = await _new_context()
+        return self._context
+
+    async def _close(self):
+        if self._context: await self._context.close()
+        self._context = None
+
+
+async def _on_page(url: str, wait_until: str, action, session: BrowserSession = None):
+    """Load url in a fresh context (or a page on the session's context) and return await action(page)"""
+    context = await session._get_context() if session else await _new_context()
+    page = None
+    try:
+        page = await context.new_page()
+        await page.goto(url, timeout=REQUEST_TIMEOUT * 1000, wait_until=wait_until)
+        return await action(page)
+    finally:
+        if not session: await context.close()
+        elif page: await page.close()
+
+_page_html = lambda page: page.content()
+
+async def _page_links(page, with_html: bool) -> dict:
+    """Collect anchors in one evaluate round-trip; rendered HTML only when asked for"""
+    return {'links': await page.evaluate(_LINKS_JS), 'html': await page.content() if with_html else None}
+
+
+# Public API: same render from sync or async code
+render_page = lambda url, wait_until='networkidle': _submit(_on_page(url, wait_until, _page_html)).result()
+arender_page = lambda url, wait_until='networkidle', session=None: asyncio.wrap_future(
+    _submit(_on_page(url, wait_until, _page_html, session))
+)
+arender_links = lambda url, wait_until='domcontentloaded', with_html=False, session=None: asyncio.wrap_future(
+    _submit(_on_page(url, wait_until, lambda page: _page_links(page, with_html), session))
+)
+
+
+@asynccontextmanager
+async def abrowser_session():
+    """
+    Share one browser context across a batch of arender_page/arender_links calls (pass session=).
+
+    Context setup and Playwright's HTTP/TLS caches are paid once per batch
+    instead of once per URL; nothing is launched unless something renders.
+    """
+    session = BrowserSession()
+    try:
+        yield session
+    finally:
+        if session._context: await asyncio.wrap_future(_submit(session._close()))
+
+
+async def _shutdown():
+    """Close the browser and stop the Playwright driver"""
+    if _STATE['browser']: await _STATE['browser'].close()
+    if _STATE['playwright']: await _STATE['playwright'].stop()
+    _STATE['browser'] = _STATE['playwright'] = None
+
+
+@atexit.register
+def close_browser():
+    """Shut down the shared browser if one was started"""
+    if _STATE['loop'] is None: return
+    try:
+        _submit(_shutdown()).result(timeout=10)
+    except Exception:
+        pass
+    _STATE['loop'].call_soon_threadsafe(_STATE['loop'].stop)
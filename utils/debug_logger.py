@@ -1,19 +1,87 @@
 import os
+import orjson
+import queue
+import atexit
+import hashlib
+import itertools
+import threading
 from pathlib import Path
 from datetime import datetime
-import json
 from functools import lru_cache
+from config import DEBUG_RAW_HTML, DEBUG_COMPRESS_RAW
+
+# Optional: zstd for raw page dumps (plain files are written without it)
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 # Helper functions
-_slugify = lambda name: name.replace(' ', '_').replace('/', '_')
+_SLUG_CHARS = str.maketrans({' ': '_', '/': '_'})
+_slugify = lambda name: name.translate(_SLUG_CHARS)
+# Every ASCII char that isn't alphanumeric or -_ becomes _ in one C-level pass;
+# non-ASCII text keeps the per-char scan (isalnum() accepts non-ASCII letters)
+_FILE_SAFE_CHARS = str.maketrans({c: '_' for c in map(chr, range(0x80)) if not (c.isalnum() or c in '-_')})
+_file_safe = lambda text: (text.translate(_FILE_SAFE_CHARS) if text.isascii()
+                           else ''.join(c if c.isalnum() or c in '-_' else '_' for c in text))
 _log_file_path = lambda run_dir, slug, suffix: run_dir / f"{slug}_{suffix}.json"
+_as_bytes = lambda content: content if isinstance(content, bytes) else content.encode('utf-8', errors='ignore')
+_raw_digest = lambda content: {'raw_blake2b': hashlib.blake2b(_as_bytes(content)).hexdigest()}
+
+# Background writer: log calls only serialize and enqueue, a daemon thread
+# drains up to _WRITE_BATCH_SIZE files at a time off the extraction hot path
+_WRITE_QUEUE = queue.Queue(maxsize=1024)
+_WRITE_BATCH_SIZE = 32
+
+# Only ever used from the writer thread (a ZstdCompressor isn't safe to share across threads)
+_ZSTD = zstandard.ZstdCompressor(level=3) if zstandard else None
+
+def _write_file(file_path, content):
+    """Write str or bytes content to file in one write() (no fsync: debug logs don't need durability)"""
+    payload = _as_bytes(content)
+    # Buffer at least as large as the payload so the whole file is flushed in a single syscall
+    try:
+        f = open(file_path, 'wb', buffering=max(1 << 16, len(payload)))
+    except FileNotFoundError:  # First file in a district folder: create the folder here, off the hot path
+        file_path.parent.mkdir(exist_ok=True)
+        f = open(file_path, 'wb', buffering=max(1 << 16, len(payload)))
+    with f:
+        f.write(payload)
+
+def _drain_writes():
+    """Consume queued (path, bytes, compress) writes in batches forever"""
+    while True:
+        batch = [_WRITE_QUEUE.get()]
+        while len(batch) < _WRITE_BATCH_SIZE and not _WRITE_QUEUE.empty():
+            batch.append(_WRITE_QUEUE.get_nowait())
+        for file_path, payload, compress in batch:
+            # One bad item must not kill the writer: join() (atexit, flush) waits on every task_done()
+            try:
+                _write_file(file_path, _ZSTD.compress(payload) if compress else payload)
+            except Exception as e:
+                print(f"[DEBUG] Failed to write {file_path}: {e}")
+            finally:
+                _WRITE_QUEUE.task_done()
 
-def _write_json(file_path, data):
-    """Write JSON data to file"""
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2)
+threading.Thread(target=_drain_writes, name='debug-log-writer', daemon=True).start()
+atexit.register(_WRITE_QUEUE.join)
+
+def _enqueue_write(file_path, content, compress=False):
+    """Queue content (str/bytes) for the background writer; returns path"""
+    # Encoded here so bad content (e.g. None) raises in the caller, not on the writer thread
+    _WRITE_QUEUE.put((file_path, _as_bytes(content), compress))
     return file_path
 
+def _enqueue_raw(file_path, content):
+    """Queue a raw page dump, zstd-compressed to <name>.zst when enabled and available; returns path"""
+    if DEBUG_COMPRESS_RAW and _ZSTD:
+        return _enqueue_write(file_path.with_name(file_path.name + '.zst'), content, compress=True)
+    return _enqueue_write(file_path, content)
+
+# OPT_NON_STR_KEYS: int-keyed dicts (e.g. results by URL index) serialize like stdlib json instead of raising
+_dump_json = lambda data: orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+_write_json = lambda file_path, data: _enqueue_write(file_path, _dump_json(data))
+
 @lru_cache(maxsize=1)
 def get_logger():
     """Get or create debug logger (cached singleton)"""
@@ -21,16 +89,27 @@ def get_logger():
 
 class DebugLogger:
     """Logger for debugging scraping process."""
-    
+
     def __init__(self, base_dir: str = "debug_logs"):
         self.base_dir = Path(base_dir)
         self.base_dir.mkdir(exist_ok=True)
-        
+
         # Create timestamped run directory
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         self.run_dir = self.base_dir / timestamp
         self.run_dir.mkdir(exist_ok=True)
-    
+
+        # Per-run sequence for file names: ordered, and unique even for two logs in the same second
+        self._seq = itertools.count()
+
+    def flush(self):
+        """Block until all queued log files are written"""
+        _WRITE_QUEUE.join()
+
+    def _district_dir(self, district_name: str) -> Path:
+        """Per-district log folder (the writer thread creates it with the first file)"""
+        return self.run_dir / _slugify(district_name)
+
     def log_discovery(self, district_name: str, domain: str, all_urls: list,
                      filtered_urls: list, llm_reasoning: str = None):
         """Log URL discovery and filtering."""
@@ -51,152 +130,122 @@ class DebugLogger:
         print(f"[DEBUG] URLs after LLM filter: {len(filtered_urls)}")
         if llm_reasoning:
             print(f"[DEBUG] LLM reasoning: {llm_reasoning[:200]}...")
-    
-    def log_page_fetch(self, district_name: str, url: str, raw_html: str, 
+
+    def log_page_fetch(self, district_name: str, url: str, raw_html: str,
                        parsed_text: str, extraction_result: dict):
         """Log fetched page, parsing, and extraction."""
-        district_slug = district_name.replace(' ', '_').replace('/', '_')
-        
-        # Create district folder
-        district_dir = self.run_dir / district_slug
-        district_dir.mkdir(exist_ok=True)
-        
+        district_dir = self._district_dir(district_name)
+
         # Generate filename from URL
-        url_slug = url.split('/')[-1][:50] or 'homepage'
-        url_slug = ''.join(c if c.isalnum() or c in '-_' else '_' for c in url_slug)
-        
-        base_name = f"{url_slug}_{datetime.now().strftime('%H%M%S')}"
-        
-        # Save raw HTML
+        url_slug = _file_safe(url.split('/')[-1][:50] or 'homepage')
+
+        base_name = f"{url_slug}_{next(self._seq):06d}"
+
+        # Save raw HTML (or just its digest when DEBUG_RAW_HTML is off)
         html_file = district_dir / f"{base_name}_raw.html"
-        with open(html_file, 'w', encoding='utf-8', errors='ignore') as f:
-            f.write(raw_html)
-        
+        if DEBUG_RAW_HTML:
+            html_file = _enqueue_raw(html_file, raw_html)
+
         # Save parsed text
-        parsed_file = district_dir / f"{base_name}_parsed.txt"
-        with open(parsed_file, 'w', encoding='utf-8') as f:
-            f.write(parsed_text)
-        
+        parsed_file = _enqueue_write(district_dir / f"{base_name}_parsed.txt", parsed_text)
+
         # Save extraction result
-        extraction_file = district_dir / f"{base_name}_extraction.json"
-        data = {
+        extraction_file = _write_json(district_dir / f"{base_name}_extraction.json", {
             'url': url,
             'timestamp': datetime.now().isoformat(),
             'raw_html_length': len(raw_html),
+            **({} if DEBUG_RAW_HTML else _raw_digest(raw_html)),
             'parsed_text_length': len(parsed_text),
             'extraction': extraction_result
-        }
-        with open(extraction_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
-        
+        })
+
         print(f"[DEBUG] Saved to: {district_dir}/{base_name}_*")
-        print(f"[DEBUG]   → {html_file.name} ({len(raw_html)} chars)")
+        if DEBUG_RAW_HTML:
+            print(f"[DEBUG]   → {html_file.name} ({len(raw_html)} chars)")
         print(f"[DEBUG]   → {parsed_file.name} ({len(parsed_text)} chars)")
         print(f"[DEBUG]   → {extraction_file.name}")
         print(f"[DEBUG]   Found: {extraction_result.get('name', 'None')}")
         if extraction_result.get('llm_reasoning'):
             print(f"[DEBUG]   Reasoning: {extraction_result['llm_reasoning'][:100]}...")
 
-    def log_transparency_discovery(self, district_name: str, domain: str, 
-                                   found_url: str, all_links: list, 
+    def log_transparency_discovery(self, district_name: str, domain: str,
+                                   found_url: str, all_links: list,
                                    llm_reasoning: str = None):
         """Log transparency link discovery."""
-        district_slug = district_name.replace(' ', '_').replace('/', '_')
-        log_file = self.run_dir / f"{district_slug}_transparency_discovery.json"
-        
-        data = {
-            'district': district_name,
-            'domain': domain,
-            'timestamp': datetime.now().isoformat(),
-            'transparency_url': found_url,
-            'total_links_found': len(all_links),
-            'all_links': all_links,
-            'llm_reasoning': llm_reasoning
-        }
-        
-        with open(log_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
-        
+        log_file = _write_json(
+            _log_file_path(self.run_dir, _slugify(district_name), 'transparency_discovery'),
+            {
+                'district': district_name,
+                'domain': domain,
+                'timestamp': datetime.now().isoformat(),
+                'transparency_url': found_url,
+                'total_links_found': len(all_links),
+                'all_links': all_links,
+                'llm_reasoning': llm_reasoning
+            }
+        )
+
         print(f"\n[DEBUG] Transparency discovery logged to: {log_file}")
         print(f"[DEBUG] Total links found: {len(all_links)}")
         print(f"[DEBUG] Selected URL: {found_url}")
         if llm_reasoning:
             print(f"[DEBUG] LLM reasoning: {llm_reasoning[:200]}...")
 
-    def log_health_plan_fetch(self, district_name: str, url: str, 
-                             raw_content: str, parsed_text: str, 
+    def log_health_plan_fetch(self, district_name: str, url: str,
+                             raw_content: bytes | str, parsed_text: str,
                              extraction_result: dict, content_type: str = 'html'):
-        """Log health plan page fetch and extraction."""
-        district_slug = district_name.replace(' ', '_').replace('/', '_')
-        
-        # Create district folder
-        district_dir = self.run_dir / district_slug
-        district_dir.mkdir(exist_ok=True)
-        
+        """Log health plan page fetch and extraction (PDF content must be the raw bytes)."""
+        if content_type == 'pdf' and not isinstance(raw_content, bytes):
+            raise ValueError("PDF content must be passed as bytes")
+        district_dir = self._district_dir(district_name)
+
         # Generate filename
-        base_name = f"transparency_{datetime.now().strftime('%H%M%S')}"
-        
-        # Save raw content (HTML or PDF)
-        if content_type == 'pdf':
-            raw_file = district_dir / f"{base_name}_raw.pdf"
-            with open(raw_file, 'wb') as f:
-                f.write(raw_content if isinstance(raw_content, bytes) else raw_content.encode('latin-1'))
-        else:
-            raw_file = district_dir / f"{base_name}_raw.html"
-            with open(raw_file, 'w', encoding='utf-8', errors='ignore') as f:
-                f.write(raw_content if isinstance(raw_content, str) else raw_content.decode('utf-8', errors='ignore'))
-        
+        base_name = f"transparency_{next(self._seq):06d}"
+
+        # Save raw content (HTML or PDF) as bytes, or just its digest when DEBUG_RAW_HTML is off
+        raw_file = district_dir / f"{base_name}_raw.{'pdf' if content_type == 'pdf' else 'html'}"
+        if DEBUG_RAW_HTML:
+            # HTML is encoded once here; PDFs are already deflate-compressed internally, so only HTML goes through zstd
+            raw_file = (_enqueue_write(raw_file, raw_content) if content_type == 'pdf'
+                        else _enqueue_raw(raw_file, _as_bytes(raw_content)))
+
         # Save parsed text
-        parsed_file = district_dir / f"{base_name}_parsed.txt"
-        with open(parsed_file, 'w', encoding='utf-8') as f:
-            f.write(parsed_text)
-        
+        parsed_file = _enqueue_write(district_dir / f"{base_name}_parsed.txt", parsed_text)
+
         # Save extraction result
-        extraction_file = district_dir / f"{base_name}_health_plans.json"
-        data = {
+        extraction_file = _write_json(district_dir / f"{base_name}_health_plans.json", {
             'url': url,
             'content_type': content_type,
             'timestamp': datetime.now().isoformat(),
             'raw_content_length': len(raw_content),
+            **({} if DEBUG_RAW_HTML else _raw_digest(raw_content)),
             'parsed_text_length': len(parsed_text),
             'extraction': extraction_result
-        }
-        with open(extraction_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
-        
+        })
+
         print(f"[DEBUG] Saved to: {district_dir}/{base_name}_*")
-        print(f"[DEBUG]   → {raw_file.name} ({len(raw_content)} chars/bytes)")
+        if DEBUG_RAW_HTML:
+            print(f"[DEBUG]   → {raw_file.name} ({len(raw_content)} chars/bytes)")
         print(f"[DEBUG]   → {parsed_file.name} ({len(parsed_text)} chars)")
         print(f"[DEBUG]   → {extraction_file.name}")
-        
+
         plans = extraction_result.get('plans', [])
         valid_plans = [p for p in plans if not p.get('is_empty', True)]
         print(f"[DEBUG]   Found: {len(valid_plans)} health plan(s)")
-        
+
         if extraction_result.get('reasoning'):
             print(f"[DEBUG]   Reasoning: {extraction_result['reasoning'][:100]}...")
 
-    def log_llm_call(self, district_name: str, prompt_type: str, 
-                    system_prompt: str, user_prompt: str, 
+    def log_llm_call(self, district_name: str, prompt_type: str,
+                    system_prompt: str, user_prompt: str,
                     llm_response: dict):
         """Log LLM prompt and response."""
-        district_slug = district_name.replace(' ', '_').replace('/', '_')
-        
-        district_dir = self.run_dir / district_slug
-        district_dir.mkdir(exist_ok=True)
-        
-        timestamp = datetime.now().strftime('%H%M%S')
-        log_file = district_dir / f"{prompt_type}_{timestamp}_llm.json"
-        
-        data = {
+        log_file = _write_json(self._district_dir(district_name) / f"{prompt_type}_{next(self._seq):06d}_llm.json", {
             'prompt_type': prompt_type,
             'timestamp': datetime.now().isoformat(),
             'system_prompt': system_prompt,
             'user_prompt': user_prompt,
             'llm_response': llm_response
-        }
-        
-        with open(log_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
-        
-        print(f"[DEBUG] LLM call logged to: {log_file}")
\ No newline at end of file
+        })
+
+        print(f"[DEBUG] LLM call logged to: {log_file}")
@@ -0,0 +1,52 @@
+"""SQLite-backed key/value cache for expensive, deterministic results"""
+import json
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+# blake2b is ~3x faster than sha256 on CPUs without SHA extensions
+content_key = lambda *parts: hashlib.blake2b(
+    b'|'.join(str(part).encode('utf-8', 'ignore') for part in parts), digest_size=16
+).hexdigest()
+
+
+class DiskCache:
+    """Thread-safe persistent cache mapping string keys to JSON-serializable values"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS blobs (key TEXT PRIMARY KEY, meta TEXT NOT NULL, body BLOB NOT NULL)')
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return cached value or None on miss"""
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM cache WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any) -> Any:
+        """Store value and return it (for chaining)"""
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)', (key, json.dumps(value)))
+            self._conn.commit()
+        return value
+
+    def get_blob(self, key: str) -> Optional[Tuple[Any, bytes]]:
+        """Return (meta, body) for a cached binary payload, or None on miss"""
+        with self._lock:
+            row = self._conn.execute('SELECT meta, body FROM blobs WHERE key = ?', (key,)).fetchone()
+        return (json.loads(row[0]), bytes(row[1])) if row else None
+
+    def set_blob(self, key: str, meta: Any, body: bytes) -> bytes:
+        """Store a binary payload with JSON-serializable metadata; returns body"""
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO blobs (key, meta, body) VALUES (?, ?, ?)',
+                               (key, json.dumps(meta), sqlite3.Binary(body)))
+            self._conn.commit()
+        return body
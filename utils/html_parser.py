@@ -1,7 +1,11 @@
-from bs4 import BeautifulSoup, NavigableString, Tag
-from typing import Optional
-from urllib.parse import urljoin
-from config import MAX_TEXT_LENGTH
+import re
+from functools import lru_cache
+from bs4 import BeautifulSoup
+from selectolax.lexbor import LexborHTMLParser
+from lxml import etree
+from typing import Iterable, Optional
+from urllib.parse import urljoin, urlsplit
+from config import MAX_TEXT_LENGTH, STREAM_LINK_LIMIT
 
 # Link handling helpers
 _DOC_EXTENSIONS = ('.pdf', '.doc', '.docx', '.xlsx', '.xls')
@@ -9,6 +13,21 @@ _make_absolute = lambda href, base_url: (urljoin(base_url, href)
                                          if base_url and not href.startswith(('http://', 'https://', 'mailto:', 'tel:', 'javascript:', '#'))
                                          else href)
 
+def url_resolver(base_url: str):
+    """
+    Build an href -> absolute URL function for one page.
+
+    The base is parsed once; absolute and root-relative hrefs (most links on a
+    page) are resolved by concatenation, everything else goes through urljoin.
+    """
+    base = urlsplit(base_url)
+    origin = f"{base.scheme}://{base.netloc}"
+    return lambda href: (
+        href if href.startswith(('http://', 'https://'))
+        else origin + href if href.startswith('/') and not href.startswith('//')
+        else urljoin(base_url, href)
+    )
+
 def _format_link_text(href: str, text: str, preserve_document_links: bool) -> Optional[str]:
     """Format link text based on href type"""
     if href.startswith('mailto:'):
@@ -21,155 +40,232 @@ def _format_link_text(href: str, text: str, preserve_document_links: bool) -> Op
         return f"{text} (URL: {href})" if text else f"Document: {href}"
     return text if text else None
 
-def parse_html_to_text(html: str, preserve_document_links: bool = False, base_url: str = None) -> str:
+
+# Tree walk for parse_html_to_text (selectolax/lexbor nodes)
+_SKIP_SELECTOR = 'script, style, nav, footer, header, iframe, noscript'  # One CSS query instead of one per tag
+_HEADINGS = frozenset(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
+_PARAGRAPH_ENDS = frozenset(['p', 'article', 'section'])
+_LISTS = frozenset(['ul', 'ol'])
+_CELLS = frozenset(['td', 'th'])
+_PARAGRAPH_END = object()  # Stack marker: a paragraph's children are done
+_flat_text = lambda node: node.text(deep=True, separator='', strip=True)
+_href = lambda node: node.attributes.get('href') or ''
+_is_document = lambda href, preserve_document_links: preserve_document_links and any(
+    href.lower().endswith(ext) for ext in _DOC_EXTENSIONS)
+
+
+def _tree_sections(root, preserve_document_links: bool, base_url: Optional[str]) -> list:
     """
-    Convert raw HTML to structured text for LLM.
-    
-    Args:
-        html: Raw HTML string
-        preserve_document_links: If True, preserve PDF/doc links in format "text (URL: link)"
-        base_url: Base URL for converting relative links to absolute
-    
-    Returns:
-        Cleaned text preserving headings and structure
+    Walk the tree into text sections (split at headings); comments are skipped.
+
+    Stops early once the sections already join to more than MAX_TEXT_LENGTH:
+    later nodes only add text after that point, which is truncated anyway.
     """
-    # Detect if this is XML content
-    html_lower = html[:200].lower()
-    is_xml = (
-        html.strip().startswith('<?xml') or 
-        '<urlset' in html_lower or 
-        '<rss' in html_lower or
-        '<sitemap' in html_lower
-    )
-    
-    soup = BeautifulSoup(html, 'xml' if is_xml else 'html.parser')
-    
-    # Remove unwanted elements
-    for tag in soup(['script', 'style', 'nav', 'footer', 'header', 'iframe', 'noscript']):
-        tag.decompose()
-    
     sections = []
     current_section = []
-    
-    def process_element(element, depth=0):
-        """Recursively process HTML elements"""
-        if isinstance(element, NavigableString):
-            text = str(element).strip()
-            if text:
-                current_section.append(text)
-            return
-        
-        if not isinstance(element, Tag):
-            return
-        
-        # Handle links
-        if element.name == 'a':
-            href = _make_absolute(element.get('href', ''), base_url)
-            text = element.get_text(strip=True)
-            formatted = _format_link_text(href, text, preserve_document_links)
-            if formatted:
-                current_section.append(formatted)
-            return
-        
-        # Handle headings
-        if element.name in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
+    collected = 0  # Chars added so far, before whitespace cleanup
+    check_at = MAX_TEXT_LENGTH  # Next collected size at which to test for overflow
+
+    def add(text):
+        nonlocal collected
+        current_section.append(text)
+        collected += len(text)
+
+    link_text = lambda node: _format_link_text(_make_absolute(_href(node), base_url), _flat_text(node),
+                                               preserve_document_links)
+    # Children go on the stack last-first so they pop in document order
+    children = lambda node: reversed(list(node.iter(include_text=True)))
+
+    def heading_part(child):
+        tag = child.tag
+        if tag == '-text':
+            return child.text_content.strip() or None
+        if tag[0] == '-':
+            return None
+        return link_text(child) if tag == 'a' else ' ' if tag == 'br' else _flat_text(child) or None
+
+    def li_parts(node):
+        """List item text; links keep their text (and URL, for documents) but not mailto/tel formatting"""
+        parts = []
+        stack = [*children(node)]
+        while stack:
+            child = stack.pop()
+            tag = child.tag
+            if tag == '-text':
+                if text := child.text_content.strip():
+                    parts.append(text)
+            elif tag == 'a':
+                href, text = _href(child), _flat_text(child)
+                href = href and _make_absolute(href, base_url)
+                if href and _is_document(href, preserve_document_links):
+                    parts.append(f"{text} (URL: {href})" if text else f"Document: {href}")
+                elif text:
+                    parts.append(text)
+            elif tag[0] != '-':
+                stack.extend(children(child))
+        return parts
+
+    # Explicit stack instead of recursion: no per-node call overhead and no
+    # recursion limit on deeply nested pages. _PARAGRAPH_END is pushed under a
+    # paragraph's children so the blank line lands after all of them.
+    stack = [root]
+    while stack:
+        if collected >= check_at:
+            if _overflows(sections + [' '.join(current_section)] if current_section else sections):
+                break
+            check_at = collected + MAX_TEXT_LENGTH
+        node = stack.pop()
+        if node is _PARAGRAPH_END:
+            if current_section and current_section[-1] != '':
+                current_section.append('')
+            continue
+        tag = node.tag
+        if tag == '-text':
+            if text := node.text_content.strip():
+                add(text)
+        elif tag[0] == '-':
+            continue
+        elif tag == 'a':
+            if formatted := link_text(node):
+                add(formatted)
+        elif tag in _HEADINGS:
             if current_section:
                 sections.append(' '.join(current_section))
                 current_section.clear()
-            
-            # Process heading content recursively to catch mailto links
-            def _process_heading_child(child):
-                if isinstance(child, NavigableString):
-                    return str(child).strip() or None
-                if isinstance(child, Tag):
-                    if child.name == 'a':
-                        href = _make_absolute(child.get('href', ''), base_url)
-                        return _format_link_text(href, child.get_text(strip=True), preserve_document_links)
-                    elif child.name == 'br':
-                        return ' '
-                    return child.get_text(strip=True) or None
-                return None
-
-            heading_parts = [part for child in element.children if (part := _process_heading_child(child))]
-            
+            heading_parts = [part for child in node.iter(include_text=True) if (part := heading_part(child))]
             if heading_parts:
-                current_section.append(f"## {' '.join(heading_parts)}")
-        
-        # Handle paragraphs and divs
-        elif element.name in ['p', 'div', 'article', 'section', 'main']:
-            for child in element.children:
-                process_element(child, depth + 1)
-            if element.name in ['p', 'article', 'section']:
-                if current_section and current_section[-1] != '':
-                    current_section.append('')
-        
-        # Handle lists
-        elif element.name == 'ul' or element.name == 'ol':
-            for li in element.find_all('li', recursive=False):
-                li_parts = []
-                
-                def process_li_content(elem):
-                    """Process list item content recursively"""
-                    if isinstance(elem, NavigableString):
-                        text = str(elem).strip()
-                        if text:
-                            li_parts.append(text)
-                    elif isinstance(elem, Tag):
-                        if elem.name == 'a':
-                            href = elem.get('href', '')
-                            text = elem.get_text(strip=True)
-                            
-                            # Convert relative URL to absolute
-                            if href and base_url and not href.startswith(('http://', 'https://', 'mailto:', 'tel:', 'javascript:', '#')):
-                                href = urljoin(base_url, href)
-                            
-                            if preserve_document_links and href and any(href.lower().endswith(ext) for ext in ['.pdf', '.doc', '.docx', '.xlsx', '.xls']):
-                                if text:
-                                    li_parts.append(f"{text} (URL: {href})")
-                                else:
-                                    li_parts.append(f"Document: {href}")
-                            elif text:
-                                li_parts.append(text)
-                        else:
-                            # Recurse into nested tags (like <p> inside <li>)
-                            for child in elem.children:
-                                process_li_content(child)
-                
-                for child in li.children:
-                    process_li_content(child)
-                
-                if li_parts:
-                    current_section.append(f"• {' '.join(li_parts)}")
-        
-        # Handle tables
-        elif element.name == 'table':
-            for row in element.find_all('tr'):
-                cells = [td.get_text(strip=True) for td in row.find_all(['td', 'th'])]
-                if cells:
-                    current_section.append(' | '.join(cells))
-        
-        # Recurse for other elements
+                add(f"## {' '.join(heading_parts)}")
+        elif tag in _LISTS:
+            for li in node.iter():
+                if li.tag == 'li' and (parts := li_parts(li)):
+                    add(f"• {' '.join(parts)}")
+        elif tag == 'table':
+            # One selector query per table; a row's cells come from walking it (cheaper than a query per row)
+            for row in node.css('tr'):
+                if cells := [_flat_text(cell) for cell in row.traverse() if cell.tag in _CELLS]:
+                    add(' | '.join(cells))
         else:
-            for child in element.children:
-                process_element(child, depth + 1)
-    
-    # Process the body or entire document
-    body = soup.find('body') or soup
-    process_element(body)
-    
-    # Add any remaining content
+            if tag in _PARAGRAPH_ENDS:
+                stack.append(_PARAGRAPH_END)
+            stack.extend(children(node))
+
     if current_section:
         sections.append(' '.join(current_section))
+    return sections
+
+
+def _join_sections(sections: list) -> str:
+    """
+    Sections -> '---'-separated, blank-line-spaced text, capped at MAX_TEXT_LENGTH.
+
+    One pass over the section lines (stripped, empty ones dropped) that stops as
+    soon as the text is known to need truncating.
+    """
+    lines = []
+    length = -2  # '\n\n'.join adds 2 chars per line after the first
+    for i, section in enumerate(sections):
+        for line in (['---'] if i else []) + section.split('\n'):
+            if line := line.strip():
+                lines.append(line)
+                length += len(line) + 2
+                if length > MAX_TEXT_LENGTH:
+                    return '\n\n'.join(lines)[:MAX_TEXT_LENGTH] + "\n\n[Text truncated...]"
+    return '\n\n'.join(lines)
+
+
+# Sniffed in place (pos/endpos bounds, IGNORECASE) instead of on stripped/lowercased copies of the page
+_XML_PROLOG_RE = re.compile(r'\s*<\?xml')
+_HTML_TAG_RE = re.compile(r'<html', re.IGNORECASE)
+_FEED_TAG_RE = re.compile(r'<(?:urlset|rss|sitemap)', re.IGNORECASE)
+
+_overflows = lambda sections: len(_join_sections(sections)) > MAX_TEXT_LENGTH
+
+
+def _is_xml_feed(html: str) -> bool:
+    """Sitemaps and RSS/Atom feeds (XHTML pages with an XML prolog are still HTML)"""
+    return bool((_XML_PROLOG_RE.match(html) and not _HTML_TAG_RE.search(html, 0, 200))
+                or _FEED_TAG_RE.search(html, 0, 200))
+
+
+@lru_cache(maxsize=64)  # Same page parsed again in a run (fetch cache hits, repeat checks) is free
+def parse_html_to_text(html: str, preserve_document_links: bool = False, base_url: str = None) -> str:
+    """
+    Convert raw HTML to structured text for LLM.
     
-    # Join sections with separator
-    full_text = '\n---\n'.join(sections)
+    HTML is parsed with lexbor (selectolax's C engine); sitemaps and feeds have
+    no page structure and are parsed as XML to their text.
     
-    # Clean up whitespace
-    lines = [line.strip() for line in full_text.split('\n') if line.strip()]
-    full_text = '\n\n'.join(lines)
+    Args:
+        html: Raw HTML string
+        preserve_document_links: If True, preserve PDF/doc links in format "text (URL: link)"
+        base_url: Base URL for converting relative links to absolute
     
-    # Limit to max length
-    if len(full_text) > MAX_TEXT_LENGTH:
-        full_text = full_text[:MAX_TEXT_LENGTH] + "\n\n[Text truncated...]"
+    Returns:
+        Cleaned text preserving headings and structure
+    """
+    if _is_xml_feed(html):
+        sections = [' '.join(BeautifulSoup(html, 'xml').stripped_strings)]
+    else:
+        tree = LexborHTMLParser(html)
+        # Reverse document order removes nested matches before their ancestors are freed
+        for node in reversed(tree.css(_SKIP_SELECTOR)):
+            node.decompose()
+        sections = _tree_sections(tree.body or tree.root, preserve_document_links, base_url)
     
-    return full_text
\ No newline at end of file
+    return _join_sections(sections)
+
+
+# Link streaming keeps nav/header/footer (where transparency links usually live)
+_LINK_SKIP_TAGS = frozenset(['script', 'style', 'noscript', 'template'])
+
+class _StreamingLinkTarget:
+    """lxml parser target collecting anchors as {text, alt, raw_href, href} up to a link limit"""
+
+    def __init__(self, max_links: int, base_url: str):
+        self.links = []
+        self.max_links = max_links
+        self.resolve = url_resolver(base_url)
+        self.skip_depth = 0
+        self.link = None  # anchor being built, text as a list of parts
+
+    is_full = property(lambda self: len(self.links) >= self.max_links)
+
+    def start(self, tag, attrib):
+        if tag in _LINK_SKIP_TAGS:
+            self.skip_depth += 1
+        elif self.skip_depth or self.is_full:
+            return
+        elif tag == 'a' and 'href' in attrib:
+            href = attrib['href']
+            self.link = {'text': [], 'alt': '', 'raw_href': href, 'href': self.resolve(href)}
+        elif tag == 'img' and self.link and not self.link['alt']:
+            self.link['alt'] = attrib.get('alt', '')
+
+    def end(self, tag):
+        if tag in _LINK_SKIP_TAGS:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag == 'a' and self.link:
+            self.links.append({**self.link, 'text': ' '.join(''.join(self.link['text']).split())})
+            self.link = None
+
+    def data(self, text):
+        if self.link and not self.skip_depth: self.link['text'].append(text)
+
+    def close(self):
+        return self.links
+
+
+def stream_html_links(chunks: Iterable[bytes], base_url: str, max_links: int = STREAM_LINK_LIMIT,
+                      encoding: str = None) -> list:
+    """
+    Incrementally collect anchors from HTML byte chunks, stopping after max_links.
+
+    Returns the same {text, alt, raw_href, href} dicts the browser's link
+    collector produces (href resolved against base_url), without building a tree.
+    """
+    target = _StreamingLinkTarget(max_links, base_url)
+    parser = etree.HTMLParser(target=target, encoding=encoding)
+    for chunk in chunks:
+        parser.feed(chunk)
+        if target.is_full: break
+    return parser.close()[:max_links]
@@ -1,20 +1,61 @@
-import json
-import requests
+import re
+import sys
+import httpx
+import orjson
+import threading
+from collections import Counter
 from pathlib import Path
-from typing import TypeVar, Type
+from typing import TypeVar, Type, List, Dict, Iterator, Optional, Union
+from concurrent.futures import ThreadPoolExecutor
 from jinja2 import Environment, FileSystemLoader
 from groq import Groq
 from tenacity import retry, stop_after_attempt, wait_exponential
 from pydantic import BaseModel, ValidationError
 from config import (
     LLM_PROVIDER,
-    GROQ_API_KEY, GROQ_MODEL, GROQ_TEMPERATURE,
+    GROQ_API_KEY, GROQ_MODEL, GROQ_TEMPERATURE, GROQ_RPM, GROQ_TPM,
     OLLAMA_URL, OLLAMA_MODEL, OLLAMA_TEMPERATURE,
-    SSH_TUNNEL_ENABLED
+    LLM_MAX_TOKENS, LLM_DEFAULT_MAX_TOKENS, LLM_BATCH_CONCURRENCY,
+    SSH_TUNNEL_ENABLED,
+    CACHE_LLM, LLM_CACHE_PATH
 )
+from utils.disk_cache import DiskCache, content_key
+from utils.rate_limit import per_minute
+from utils.bin_scheduler import bin_order
 
 T = TypeVar('T', bound=BaseModel)
 
+# Persistent pooled connection shared by all calls (HTTP/2 where the server
+# supports it) so each LLM request skips TCP/TLS setup
+_HTTP = httpx.Client(http2=True, timeout=120.0, limits=httpx.Limits(max_keepalive_connections=50))
+
+# Rough prompt size estimate (~4 chars/token) for TPM budgeting
+_estimate_tokens = lambda *texts: sum(len(text) for text in texts) // 4
+
+# User templates that are plain text plus bare {{ name }} slots (no tags or filters)
+_SLOT_RE = re.compile(r'{{\s*(\w+)\s*}}')
+
+
+class _SlotTemplate:
+    """
+    Partially evaluated user template: the literal text between slots is split
+    out once, so rendering is a join instead of a Jinja render.
+    """
+
+    def __init__(self, source: str):
+        parts = _SLOT_RE.split(source)
+        self.literals, self.names = parts[::2], parts[1::2]
+
+    def render(self, **variables) -> str:
+        pieces = [self.literals[0]]
+        for name, literal in zip(self.names, self.literals[1:]):
+            pieces += (str(variables[name]) if name in variables else '', literal)  # Undefined renders empty, as in Jinja
+        return ''.join(pieces)
+
+    is_plain = staticmethod(lambda source: '{%' not in source and '{#' not in source
+                            and source.count('{{') == len(_SLOT_RE.findall(source)))
+
+
 class LLMClient:
     """Generic LLM client with template-based prompts and Pydantic validation"""
 
@@ -23,6 +64,10 @@ class LLMClient:
         self.env = Environment(loader=FileSystemLoader('prompts'))
         self.tunnel = None
         self.tunneled_url = None
+        self.cache = DiskCache(LLM_CACHE_PATH) if CACHE_LLM else None
+        self._prompt_templates = {}
+        self.usage = Counter()  # prompt/cached_prompt/completion tokens across all calls
+        self._usage_lock = threading.Lock()
 
         # Initialize SSH tunnel if enabled
         if SSH_TUNNEL_ENABLED:
@@ -32,13 +77,15 @@ class LLMClient:
 
         # Initialize provider-specific client
         if self.provider == 'groq':
-            self.client = Groq(api_key=GROQ_API_KEY) if GROQ_API_KEY else None
+            self.client = Groq(api_key=GROQ_API_KEY, http_client=_HTTP) if GROQ_API_KEY else None
             self.model = GROQ_MODEL
             self.temperature = GROQ_TEMPERATURE
+            self.request_bucket, self.token_bucket = per_minute(GROQ_RPM), per_minute(GROQ_TPM)
         elif self.provider == 'ollama':
             self.client = None  # Ollama uses direct HTTP
             self.model = OLLAMA_MODEL
             self.temperature = OLLAMA_TEMPERATURE
+            self.request_bucket = self.token_bucket = None  # Self-hosted, no provider caps
         else:
             raise ValueError(f"Unsupported LLM provider: {self.provider}")
 
@@ -51,14 +98,34 @@ class LLMClient:
                 pass
 
     # Core operations
-    load_template = lambda self, name: self.env.get_template(f'{name}.txt').render
-
     split_prompts = lambda self, rendered: (
         lambda parts: (parts[0].strip(), parts[1].strip())
     )(rendered.split('---USER_PROMPT---'))
 
+    def _prompt_template(self, name: str) -> tuple[str, object]:
+        """
+        Split template once into (static system prompt, compiled user template).
+
+        The system prompt is rendered once and interned so every call sends the
+        identical prefix (cheaper to build, and eligible for provider prompt caching).
+        User templates with only bare {{ name }} slots skip Jinja at render time.
+        """
+        if name not in self._prompt_templates:
+            source = self.env.loader.get_source(self.env, f'{name}.txt')[0]
+            system_source, user_source = self.split_prompts(source)
+            self._prompt_templates[name] = (
+                sys.intern(self.env.from_string(system_source).render()),
+                _SlotTemplate(user_source) if _SlotTemplate.is_plain(user_source)
+                else self.env.from_string(user_source)
+            )
+        return self._prompt_templates[name]
+
+    render_prompts = lambda self, name, **variables: (
+        lambda system_prompt, user_template: (system_prompt, user_template.render(**variables).strip())
+    )(*self._prompt_template(name))
+
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
-    def _call_groq(self, system_prompt: str, user_prompt: str) -> dict:
+    def _call_groq(self, system_prompt: str, user_prompt: str, max_tokens: int = LLM_DEFAULT_MAX_TOKENS) -> dict:
         """Call Groq API with retry logic"""
         if not self.client:
             raise ValueError("GROQ_API_KEY not set")
@@ -70,12 +137,17 @@ class LLMClient:
                 {"role": "user", "content": user_prompt}
             ],
             temperature=self.temperature,
+            max_tokens=max_tokens,
             response_format={"type": "json_object"}
         )
-        return json.loads(response.choices[0].message.content)
+        usage = response.usage
+        if usage:
+            self._record_usage(usage.prompt_tokens, getattr(usage.prompt_tokens_details, 'cached_tokens', 0),
+                               usage.completion_tokens)
+        return orjson.loads(response.choices[0].message.content)
 
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
-    def _call_ollama(self, system_prompt: str, user_prompt: str) -> dict:
+    def _call_ollama(self, system_prompt: str, user_prompt: str, max_tokens: int = LLM_DEFAULT_MAX_TOKENS) -> dict:
         """Call Ollama API with retry logic"""
         # Combine system and user prompts for Ollama
         full_prompt = f"{system_prompt}\n\n{user_prompt}\n\nRespond with valid JSON only:"
@@ -86,16 +158,18 @@ class LLMClient:
             "stream": False,
             "format": "json",
             "options": {
-                "temperature": self.temperature
+                "temperature": self.temperature,
+                "num_predict": max_tokens
             }
         }
 
         # Use tunneled URL if SSH tunnel is enabled, otherwise use configured OLLAMA_URL
         url = self.tunneled_url if self.tunneled_url else OLLAMA_URL
-        response = requests.post(url, json=payload, timeout=120)
+        response = _HTTP.post(url, json=payload)
         response.raise_for_status()
 
-        result = response.json()
+        result = orjson.loads(response.content)
+        self._record_usage(result.get('prompt_eval_count', 0), 0, result.get('eval_count', 0))
         # Ollama returns response in 'response' field, sometimes 'thinking' field for reasoning models
         response_text = result.get('response', '') or result.get('thinking', '')
         if not response_text:
@@ -103,23 +177,36 @@ class LLMClient:
 
         # Try to parse as JSON, if that fails try to extract JSON from markdown code blocks
         try:
-            return json.loads(response_text)
-        except json.JSONDecodeError:
+            return orjson.loads(response_text)
+        except orjson.JSONDecodeError:
             # Try to extract JSON from markdown code blocks
             import re
             json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', response_text, re.DOTALL)
             if json_match:
-                return json.loads(json_match.group(1))
+                return orjson.loads(json_match.group(1))
             # Last resort: assume the text itself is JSON-like and try again
             raise
 
+    def _record_usage(self, prompt_tokens: int, cached_tokens: int, completion_tokens: int):
+        """Accumulate token usage; cached_tokens shows how often the static prompt prefix hit the provider cache"""
+        with self._usage_lock:
+            self.usage.update(prompt=prompt_tokens or 0, cached_prompt=cached_tokens or 0,
+                              completion=completion_tokens or 0)
+
+    def _acquire_rate_limit(self, system_prompt: str, user_prompt: str, max_tokens: int):
+        """Wait for RPM/TPM budget so calls pace under the provider cap instead of hitting 429s"""
+        if self.request_bucket:
+            self.request_bucket.acquire()
+            self.token_bucket.acquire(_estimate_tokens(system_prompt, user_prompt) + max_tokens)
+
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
-    def _call_api(self, system_prompt: str, user_prompt: str) -> dict:
-        """Route to appropriate provider"""
+    def _call_api(self, system_prompt: str, user_prompt: str, max_tokens: int = LLM_DEFAULT_MAX_TOKENS) -> dict:
+        """Route to appropriate provider (rate limited; 429s still back off via retry)"""
+        self._acquire_rate_limit(system_prompt, user_prompt, max_tokens)
         if self.provider == 'groq':
-            return self._call_groq(system_prompt, user_prompt)
+            return self._call_groq(system_prompt, user_prompt, max_tokens)
         elif self.provider == 'ollama':
-            return self._call_ollama(system_prompt, user_prompt)
+            return self._call_ollama(system_prompt, user_prompt, max_tokens)
         else:
             raise ValueError(f"Unsupported provider: {self.provider}")
 
@@ -140,18 +227,26 @@ class LLMClient:
                                 SuperintendentExtraction,
                                 text=html,
                                 district_name=name)
+
+        When CACHE_LLM is enabled, responses are cached on disk keyed by a hash
+        of the rendered prompts, so identical inputs skip the API entirely.
         """
         try:
-            # Load and render template
-            render = self.load_template(template_name)
-            rendered = render(**variables)
-            system_prompt, user_prompt = self.split_prompts(rendered)
+            # Render user prompt against the cached system prompt
+            system_prompt, user_prompt = self.render_prompts(template_name, **variables)
 
-            # Call API
-            raw_response = self._call_api(system_prompt, user_prompt)
+            # Serve from cache, otherwise call API
+            cache_key = self.cache and content_key(self.provider, self.model, template_name, system_prompt, user_prompt)
+            cached_response = self.cache and self.cache.get(cache_key)
+            raw_response = cached_response or self._call_api(
+                system_prompt, user_prompt, LLM_MAX_TOKENS.get(template_name, LLM_DEFAULT_MAX_TOKENS)
+            )
 
-            # Validate and return
-            return response_model(**raw_response)
+            # Validate, cache fresh responses, and return
+            result = response_model(**raw_response)
+            if self.cache and not cached_response:
+                self.cache.set(cache_key, raw_response)
+            return result
 
         except ValidationError as e:
             print(f"[LLM VALIDATION ERROR] Response doesn't match {response_model.__name__}: {e}")
@@ -160,7 +255,46 @@ class LLMClient:
             print(f"[LLM ERROR] {type(e).__name__}: {str(e)}")
             raise
 
+    def call_many(self, template_name: str, response_model: Type[T], variables_list: List[Dict],
+                  concurrency: int = LLM_BATCH_CONCURRENCY,
+                  costs: Optional[List[float]] = None) -> List[Union[T, Exception]]:
+        """
+        Run call() for each variables dict with up to `concurrency` requests in flight.
+
+        Each document is its own request (no cross-document context), so wall
+        time approaches the slowest call rather than the sum. Given predicted
+        costs, the costliest bin of calls starts first so a long call doesn't
+        trail the batch. Results keep input order; a failed call yields its
+        exception in place instead of raising.
+        """
+        return list(self.iter_many(template_name, response_model, variables_list, concurrency, costs))
+
+    def iter_many(self, template_name: str, response_model: Type[T], variables_list: List[Dict],
+                  concurrency: int = LLM_BATCH_CONCURRENCY,
+                  costs: Optional[List[float]] = None) -> Iterator[Union[T, Exception]]:
+        """
+        call_many, yielding each result (in input order) as soon as it is ready.
+
+        Every call is submitted before this returns, so the whole batch is in
+        flight while the caller handles earlier results.
+        """
+        def _call(variables):
+            try:
+                return self.call(template_name, response_model, **variables)
+            except Exception as e:
+                return e
+
+        if not variables_list: return iter(())
+        order = bin_order(costs) if costs else range(len(variables_list))
+        pool = ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(variables_list))))
+        futures = {i: pool.submit(_call, variables_list[i]) for i in order}
+        pool.shutdown(wait=False)  # Queued calls still run; workers exit once the batch is done
+        return (futures[i].result() for i in range(len(variables_list)))
+
 
 # Singleton instance
 _client = None
 get_client = lambda: globals().__setitem__('_client', LLMClient()) or _client if _client is None else _client
+
+# Token usage so far (empty if no LLM call was made this run)
+get_usage = lambda: dict(_client.usage) if _client else {}
@@ -1,3 +1,30 @@
+import sys
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener
+
+# Log records are handed to a queue and written to stderr by one listener
+# thread, so concurrent workers never contend on the stdio lock or block
+# the event loop on a write() syscall
+_LOG_QUEUE = queue.SimpleQueue()
+_stderr_handler = logging.StreamHandler(sys.stderr)
+_stderr_handler.setFormatter(logging.Formatter('%(message)s'))
+_LISTENER = QueueListener(_LOG_QUEUE, _stderr_handler)
+_LISTENER.start()
+atexit.register(_LISTENER.stop)
+
+
+def get_queue_logger(name: str) -> logging.Logger:
+    """Get an INFO-level logger whose records go through the shared log queue"""
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        logger.addHandler(QueueHandler(_LOG_QUEUE))
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
 def print_header(str):
         print(f"\n{'='*60}")
         print(str)
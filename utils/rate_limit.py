@@ -0,0 +1,44 @@
+"""Token-bucket rate limiting for provider RPM/TPM caps"""
+import time
+import asyncio
+import threading
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket that refills at rate_per_sec up to capacity.
+
+    Callers reserve tokens immediately (the balance may go negative) and then
+    sleep off the deficit, so concurrent callers are paced in arrival order.
+    """
+
+    def __init__(self, rate_per_sec: float, capacity: float):
+        self.rate = rate_per_sec
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        """Take tokens now and return seconds to wait before using them"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= min(tokens, self.capacity)
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self, tokens: float = 1) -> float:
+        """Block until tokens are available; returns seconds waited"""
+        delay = self._reserve(tokens)
+        if delay: time.sleep(delay)
+        return delay
+
+    async def aacquire(self, tokens: float = 1) -> float:
+        """Async variant of acquire (sleeps without blocking the event loop)"""
+        delay = self._reserve(tokens)
+        if delay: await asyncio.sleep(delay)
+        return delay
+
+
+per_minute = lambda limit: TokenBucket(limit / 60, limit)
@@ -0,0 +1,70 @@
+"""
+Near-duplicate result cache keyed by text.
+
+Many district sites are built from the same (or lightly edited) templates.
+Each text gets a 64-bit SimHash over word shingles; a lookup hits on the
+exact text or on any stored fingerprint within a few bits, so repeat
+templates skip the LLM without an embedding model.
+"""
+import re
+import json
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Optional
+
+_WORD_RE = re.compile(r'\w+')
+_SHINGLE_SIZE = 4
+_FINGERPRINT_CHARS = 8000  # Leading text fingerprinted; enough to tell documents apart
+
+_hash64 = lambda data: int.from_bytes(hashlib.blake2b(data.encode('utf-8', 'ignore'), digest_size=8).digest(), 'big')
+_text_hash = lambda text: hashlib.blake2b(text.encode('utf-8', 'ignore'), digest_size=16).hexdigest()
+_as_signed = lambda value: value - (1 << 64) if value >= (1 << 63) else value  # SQLite INTEGER is signed
+_hamming = lambda a, b: bin((a ^ b) & ((1 << 64) - 1)).count('1')
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash of lowercased word shingles from the start of text"""
+    words = _WORD_RE.findall(text[:_FINGERPRINT_CHARS].lower())
+    shingles = {' '.join(words[i:i + _SHINGLE_SIZE]) for i in range(max(1, len(words) - _SHINGLE_SIZE + 1))}
+    weights = [0] * 64
+    for shingle in shingles:
+        value = _hash64(shingle)
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+class SemanticCache:
+    """Thread-safe SQLite store of JSON results looked up by exact or near-duplicate text"""
+
+    def __init__(self, path: str, max_distance: int = 3):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute('CREATE TABLE IF NOT EXISTS documents '
+                           '(text_hash TEXT PRIMARY KEY, simhash INTEGER NOT NULL, value TEXT NOT NULL)')
+        self._conn.commit()
+
+    def get(self, text: str) -> Optional[Any]:
+        """Return the value stored for this text or a near-duplicate of it, else None"""
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM documents WHERE text_hash = ?', (_text_hash(text),)).fetchone()
+            rows = [] if row else self._conn.execute('SELECT simhash, value FROM documents').fetchall()
+        if row: return json.loads(row[0])
+
+        fingerprint = simhash(text)
+        distance, value = min(((_hamming(fingerprint, stored), value) for stored, value in rows),
+                              default=(self.max_distance + 1, None), key=lambda match: match[0])
+        return json.loads(value) if distance <= self.max_distance else None
+
+    def set(self, text: str, value: Any) -> Any:
+        """Store value for text and return it (for chaining)"""
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO documents (text_hash, simhash, value) VALUES (?, ?, ?)',
+                               (_text_hash(text), _as_signed(simhash(text)), json.dumps(value)))
+            self._conn.commit()
+        return value
@@ -0,0 +1,46 @@
+"""
+Keyword-window text filtering.
+
+Long documents (benefit PDFs especially) are mostly boilerplate; keeping only
+the text around keyword hits cuts what is sent to the LLM while leaving the
+sentences that mention what we're looking for intact.
+"""
+import re
+from typing import List, Pattern
+
+_WS_RE = re.compile(r'\s')
+_SEPARATOR = '\n...\n'
+
+
+def _keyword_spans(text: str, pattern: Pattern, window: int) -> List[List[int]]:
+    """Merged [start, end) spans of ±window chars around each match, widened to whitespace"""
+    spans = []
+    for match in pattern.finditer(text):
+        start = max(0, match.start() - window)
+        start = max(text.rfind(' ', 0, start), text.rfind('\n', 0, start)) + 1 if start else 0
+        after = _WS_RE.search(text, min(len(text), match.end() + window))
+        end = after.start() if after else len(text)
+        if spans and start <= spans[-1][1]:
+            spans[-1][1] = max(spans[-1][1], end)
+        else:
+            spans.append([start, end])
+    return spans
+
+
+def extract_relevant_windows(text: str, pattern: Pattern, window: int = 200, max_chars: int = 8000) -> str:
+    """
+    Keep only the text within window chars of a pattern match.
+
+    Overlapping windows are merged and never split a word (or URL); windows are
+    joined with an ellipsis line in document order, up to max_chars total.
+    Returns '' when nothing matches.
+    """
+    pieces, used = [], 0
+    for start, end in _keyword_spans(text, pattern, window):
+        piece = text[start:end].strip()
+        budget = max_chars - used - (len(_SEPARATOR) if pieces else 0)
+        if budget <= 0:
+            break
+        pieces.append(piece[:budget])
+        used += len(pieces[-1]) + (len(_SEPARATOR) if len(pieces) > 1 else 0)
+    return _SEPARATOR.join(pieces)
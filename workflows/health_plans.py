@@ -1,51 +1,161 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List
+from config import HEALTH_PLAN_PIPELINE_WORKERS
 from repositories import HealthPlanRepository
-from tasks.health_plan_processor import process_health_plans
+from tasks.health_plan_processor import (
+    process_health_plans, discover_transparency_page, fetch_and_extract_plans, save_health_plans
+)
 from utils.logging import print_header
+from utils.llm_client import get_usage
+
+
+def _district_result(district_id: int, district_name: str, result: Dict) -> Dict:
+    return {
+        'district_id': district_id,
+        'district_name': district_name,
+        'transparency_url': result['transparency_url'],
+        'plans_found': len(result['plans']),
+        'plans': result['plans'],
+        'status': result['status'],
+        'error_message': result.get('error_message')
+    }
+
+
+def _error_result(district_id: int, error: Exception) -> Dict:
+    from models.enums import ExtractionStatus
+    print(f"✗ Failed to check district {district_id}: {str(error)}")
+    return {
+        'district_id': district_id, 'district_name': 'Unknown',
+        'transparency_url': None, 'plans_found': 0, 'plans': [],
+        'status': ExtractionStatus.ERROR.value, 'error_message': str(error)
+    }
+
+
+def _get_district(repo, district_id: int):
+    district = repo.get_district(district_id)
+    if not district:
+        raise ValueError(f"District {district_id} not found")
+    return district
 
 
 def extract_district_health_plans(district_id: int) -> Dict:
     """Extract health plans for a district"""
     with HealthPlanRepository.transaction() as repo:
-        district = repo.get_district(district_id)
-        if not district:
-            raise ValueError(f"District {district_id} not found")
+        district = _get_district(repo, district_id)
+        print_header(f"HEALTH PLAN CHECK: {district.name} ({district.domain})")
+        return _district_result(district_id, district.name, process_health_plans(repo, district))
 
+
+def _discover(district_id: int, idx: int, total: int) -> Dict:
+    """Stage 1 for one district in its own short transaction"""
+    print(f"\n[{idx}/{total}] Processing district {district_id}...")
+    with HealthPlanRepository.transaction() as repo:
+        district = _get_district(repo, district_id)
         print_header(f"HEALTH PLAN CHECK: {district.name} ({district.domain})")
-        result = process_health_plans(repo, district)
+        return {'district_name': district.name, **discover_transparency_page(repo, district)}
 
-        return {
-            'district_id': district_id,
-            'district_name': district.name,
-            'transparency_url': result['transparency_url'],
-            'plans_found': len(result['plans']),
-            'plans': result['plans'],
-            'status': result['status'],
-            'error_message': result.get('error_message')
-        }
 
+def _save_district(repo, district_id: int, discovery: Dict, extracted: Dict) -> Dict:
+    district = _get_district(repo, district_id)
+    result = save_health_plans(repo, district, discovery['transparency_url'], extracted)
+    return _district_result(district_id, district.name, result)
 
-def _try_extract(district_id, idx, total):
-    """Safely extract health plans with error handling"""
-    from models.enums import ExtractionStatus
-    print(f"\n[{idx}/{total}] Processing district {district_id}...")
+
+def _save(district_id: int, discovery: Dict, extracted: Dict) -> Dict:
+    """Stage 3 for one district in its own short transaction"""
+    with HealthPlanRepository.transaction() as repo:
+        return _save_district(repo, district_id, discovery, extracted)
+
+
+def _save_deferred(deferred: List, results: List[Dict]):
+    """
+    Stage 3 for every buffered district in one transaction (one commit for the run).
+
+    If any save fails the batch is rolled back and each district is saved in its
+    own transaction instead, so one bad district can't drop the others' plans.
+    """
+    if not deferred:
+        return
+    try:
+        with HealthPlanRepository.transaction() as repo:
+            saved = [(index, _save_district(repo, district_id, discovery, extracted))
+                     for index, district_id, discovery, extracted in deferred]
+    except Exception:
+        # Not logged here: the retry below reports the district that fails
+        saved = [(index, _try(_save, district_id, discovery, extracted))
+                 for index, district_id, discovery, extracted in deferred]
+    for index, result in saved:
+        results[index] = result
+
+
+def _try(stage, district_id: int, *args) -> Dict:
+    """Run a pipeline stage, turning a failure into an error result for the district"""
     try:
-        return extract_district_health_plans(district_id)
+        return stage(district_id, *args)
     except Exception as e:
-        print(f"✗ Failed to check district {district_id}: {str(e)}")
-        return {
-            'district_id': district_id, 'district_name': 'Unknown',
-            'transparency_url': None, 'plans_found': 0, 'plans': [],
-            'status': ExtractionStatus.ERROR.value, 'error_message': str(e)
-        }
-
-def run_bulk_health_plan_check(district_ids: List[int]) -> List[Dict]:
-    """Run health plan checks for multiple districts"""
+        return _error_result(district_id, e)
+
+
+def _finish(pending: deque, results: List[Dict], wait: bool = False, deferred: List = None):
+    """
+    Save finished fetch/extract work from the front of the queue, keeping district order.
+
+    With a deferred list, work that needs saving is buffered there (its result
+    slot left as None) for _save_deferred instead of being saved now.
+    """
+    while pending and (wait or pending[0][2] is None or pending[0][2].done()):
+        district_id, discovery, future = pending.popleft()
+        if future is None:
+            results.append(discovery)
+            continue
+        try:
+            extracted = future.result()
+        except Exception as e:
+            results.append(_error_result(district_id, e))
+            continue
+        if deferred is None:
+            results.append(_try(_save, district_id, discovery, extracted))
+        else:
+            deferred.append((len(results), district_id, discovery, extracted))
+            results.append(None)
+
+
+def run_bulk_health_plan_check(district_ids: List[int], workers: int = HEALTH_PLAN_PIPELINE_WORKERS,
+                               defer_writes: bool = False) -> List[Dict]:
+    """
+    Run health plan checks for multiple districts as a pipeline.
+
+    Discovery and saves touch the database, so they run on this thread, each in
+    its own short transaction. Fetching, parsing and LLM extraction hold no DB
+    state and run on a worker pool, overlapping with the next districts'
+    discovery. Results are saved and returned in district_ids order.
+
+    With defer_writes, extracted results are held until every district is done
+    and saved in one transaction: one commit per run instead of one per
+    district, at the cost of keeping all fetched pages in memory until the end.
+    """
     from utils.debug_logger import get_logger
 
     logger = get_logger()
     _print_bulk_header(len(district_ids), logger.run_dir)
-    results = [_try_extract(d_id, idx, len(district_ids)) for idx, d_id in enumerate(district_ids, 1)]
+    results, pending, total = [], deque(), len(district_ids)
+    deferred = [] if defer_writes else None
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='health-plans') as pool:
+        for idx, district_id in enumerate(district_ids, 1):
+            discovery = _try(_discover, district_id, idx, total)
+            if discovery['status'] is not None:
+                final = discovery if 'plans_found' in discovery else _district_result(
+                    district_id, discovery['district_name'], discovery)
+                pending.append((district_id, final, None))
+            else:
+                pending.append((district_id, discovery, pool.submit(
+                    fetch_and_extract_plans, discovery['transparency_url'], discovery['district_name'])))
+            _finish(pending, results, deferred=deferred)
+        _finish(pending, results, wait=True, deferred=deferred)
+    _save_deferred(deferred, results)
+
     _print_bulk_summary(results, logger.run_dir)
     return results
 
@@ -77,6 +187,10 @@ def _print_bulk_summary(results: List[Dict], log_dir: str):
     print(f"  - Link found but no plans: {no_plans}")
     print(f"  ✗ Errors: {errors}")
     print(f"\nTotal plans extracted: {sum(r['plans_found'] for r in results)}")
+    usage = get_usage()
+    if usage:
+        print(f"LLM tokens: {usage.get('prompt', 0)} prompt ({usage.get('cached_prompt', 0)} cached), "
+              f"{usage.get('completion', 0)} completion")
     print(f"{'='*60}")
     print(f"\nDebug logs saved to: {log_dir}")
     print("Check the logs for detailed HTML and extraction information")